@@ -1,13 +1,130 @@
-from fastapi import APIRouter, Depends
+import base64
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import FileResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
 from app.api.v1.auth import require_admin
-from app.db.models import User
+from app.core.config import settings
+from app.core.exceptions import BadRequestError, NotFoundError
+from app.core.profiling import PROFILE_SUFFIX, profile_path
+from app.db.deps import get_db
+from app.db.models import AuditEvent, User
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+MAX_AUDIT_PAGE = 500
+
 
 @router.get("/stats")
 def admin_stats(_: User = Depends(require_admin)):
     return {
         "status": "ok",
         "message": "You are an admin and can access this route."
-    }
\ No newline at end of file
+    }
+
+
+def _utc_naive(value: datetime) -> datetime:
+    # created_at is stored as naive UTC, so compare against the same
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def encode_cursor(event: AuditEvent) -> str:
+    raw = f"{event.created_at.isoformat()},{event.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        stamp, _, event_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").rpartition(",")
+        return _utc_naive(datetime.fromisoformat(stamp)), int(event_id)
+    except ValueError:
+        raise BadRequestError("Invalid cursor")
+
+
+def _audit_payload(event: AuditEvent) -> dict:
+    return {
+        "id": event.id,
+        "user_id": event.user_id,
+        "action": event.action,
+        "item_id": event.item_id,
+        "detail": json.loads(event.detail) if event.detail else {},
+        "created_at": event.created_at.isoformat(),
+    }
+
+
+@router.get("/audit")
+def list_audit_events(
+    _: User = Depends(require_admin),
+    db: Session = Depends(get_db),
+    user: str | None = Query(None, description="user id or email"),
+    action: str | None = None,
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    limit: int = Query(50, ge=1, le=MAX_AUDIT_PAGE),
+    cursor: str | None = None,
+):
+    """
+    Newest first. Keyset pagination on (created_at, id): pass `next_cursor`
+    back as `cursor`, so each page is an index range scan whatever its depth.
+    """
+    q = select(AuditEvent)
+
+    if user is not None:
+        if user.isdigit():
+            user_id = int(user)
+        else:
+            user_id = db.query(User.id).filter(User.email == user.lower()).scalar()
+            if user_id is None:
+                return {"events": [], "next_cursor": None}
+        q = q.where(AuditEvent.user_id == user_id)
+    if action is not None:
+        q = q.where(AuditEvent.action == action)
+    if from_ is not None:
+        q = q.where(AuditEvent.created_at >= _utc_naive(from_))
+    if to is not None:
+        q = q.where(AuditEvent.created_at < _utc_naive(to))
+    if cursor is not None:
+        q = q.where(tuple_(AuditEvent.created_at, AuditEvent.id) < decode_cursor(cursor))
+
+    events = db.scalars(
+        q.order_by(AuditEvent.created_at.desc(), AuditEvent.id.desc()).limit(limit + 1)
+    ).all()
+
+    has_more = len(events) > limit
+    events = events[:limit]
+    return {
+        "events": [_audit_payload(e) for e in events],
+        "next_cursor": encode_cursor(events[-1]) if has_more else None,
+    }
+
+
+@router.get("/profiles")
+def list_profiles(_: User = Depends(require_admin)):
+    profile_dir = Path(settings.PROFILE_DIR)
+    paths = sorted(profile_dir.glob(f"*{PROFILE_SUFFIX}"), key=lambda p: p.stat().st_mtime, reverse=True)
+    return {
+        "profiles": [
+            {
+                "request_id": p.name[: -len(PROFILE_SUFFIX)],
+                "bytes": p.stat().st_size,
+                "created_at": datetime.fromtimestamp(p.stat().st_mtime, timezone.utc).isoformat(),
+            }
+            for p in paths
+        ]
+    }
+
+
+@router.get("/profiles/{request_id}")
+def download_profile(request_id: str, _: User = Depends(require_admin)):
+    """Folded stacks (`frame;frame;frame count`) for flamegraph.pl or speedscope."""
+    path = profile_path(request_id)
+    if not path.is_file():
+        raise NotFoundError("Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=path.name)
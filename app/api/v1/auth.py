@@ -1,13 +1,17 @@
 from fastapi import APIRouter, Depends, Header, Request, HTTPException, Response
 from pydantic import BaseModel, EmailStr, field_validator
 from sqlalchemy.orm import Session
-from app.core.security import hash_password, verify_password, create_access_token, decode_token
+from app.core.security import hash_password, verify_password, create_access_token, create_refresh_token, decode_token
 from app.core.exceptions import UnauthorizedError
 from app.core.redis_client import rate_limit_info
-from app.db.deps import get_db
+from app.core.revocation import claim, is_revoked, revoke
+from app.core.access_log import note_user
+from app.core.tracing import traced_dependency
+from app.db.deps import db_session, get_db
 from app.db.models import User
 import time
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 
 router = APIRouter()
 
@@ -37,6 +41,23 @@ class LoginRequest(BaseModel):
         return v
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+class LogoutRequest(BaseModel):
+    refresh_token: str | None = None
+
+
+def issue_tokens(email: str) -> dict:
+    return {
+        "status": "ok",
+        "access_token": create_access_token(email),
+        "refresh_token": create_refresh_token(email),
+        "token_type": "bearer",
+    }
+
+
 @router.post("/register")
 def register(payload: RegisterRequest, db: Session = Depends(get_db)):
     email = payload.email.lower()
@@ -96,15 +117,34 @@ async def login(payload: LoginRequest, request: Request, response: Response, db:
     if not user or not verify_password(payload.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    token = create_access_token(user.email)
-    return {"status": "ok", "access_token": token, "token_type": "bearer"}
+    return issue_tokens(user.email)
 
 
+@router.post("/refresh")
+async def refresh(payload: RefreshRequest):
+    # Rotation: each refresh token is single-use. Presenting one that was
+    # already rotated or logged out is rejected. The claim is atomic in
+    # Redis, not the Bloom filter check, so every worker sees it at once.
+    try:
+        claims = decode_token(payload.refresh_token)
+    except Exception:
+        raise UnauthorizedError("Invalid or expired refresh token")
+
+    if claims.get("type") != "refresh" or "jti" not in claims:
+        raise UnauthorizedError("Invalid or expired refresh token")
+    if not await claim(claims["jti"], claims["exp"]):
+        raise UnauthorizedError("Refresh token has been revoked")
+
+    return issue_tokens(claims["sub"].lower())
+
+
+@traced_dependency
+async def get_token_payload(request: Request, authorization: str = Header(None)) -> dict:
+    # sub-requests of POST /v1/batch carry the claims the batch already verified
+    verified = getattr(request.state, "token_payload", None)
+    if verified is not None:
+        return dict(verified)
 
-def get_current_user(
-    authorization: str = Header(None),
-    db: Session = Depends(get_db),
-) -> User:
     if not authorization or not authorization.lower().startswith("bearer "):
         raise UnauthorizedError("Missing bearer token")
 
@@ -112,22 +152,69 @@ def get_current_user(
 
     try:
         payload = decode_token(token)
-        email = payload["sub"].lower()
+        payload["sub"] = payload["sub"].lower()
     except Exception:
         raise UnauthorizedError("Invalid or expired token")
 
+    # tokens issued before refresh tokens existed carry no type/jti
+    if payload.get("type", "access") != "access":
+        raise UnauthorizedError("Invalid or expired token")
+    if "jti" in payload and await is_revoked(payload["jti"]):
+        raise UnauthorizedError("Token has been revoked")
+
+    return payload
+
+
+@traced_dependency
+def get_current_user(
+    payload: dict = Depends(get_token_payload),
+    db: Session = Depends(get_db),
+) -> User:
+    email = payload["sub"]
+
     user = db.query(User).filter(User.email == email).first()
     if not user:
         raise UnauthorizedError("User not found")
 
+    note_user(user.id)
     return user
 
 
-def require_admin(user: User = Depends(get_current_user)) -> User:
+def ensure_admin(user: User) -> User:
     if user.role != "admin":
         raise UnauthorizedError("Admin access required")
     return user
 
+
+@traced_dependency
+def require_admin(user: User = Depends(get_current_user)) -> User:
+    return ensure_admin(user)
+
+
+async def admin_from_request(request: Request) -> User:
+    """require_admin for code outside the dependency graph (e.g. middleware):
+    the same token checks, and a session from get_db or its override."""
+    payload = await get_token_payload(request, request.headers.get("authorization"))
+    async with db_session(request) as db:
+        user = await run_in_threadpool(get_current_user, payload, db)
+    return ensure_admin(user)
+
+@router.post("/logout")
+async def logout(payload: LogoutRequest | None = None, claims: dict = Depends(get_token_payload)):
+    if "jti" in claims:
+        await revoke(claims["jti"], claims["exp"])
+
+    if payload and payload.refresh_token:
+        try:
+            refresh_claims = decode_token(payload.refresh_token)
+        except Exception:
+            refresh_claims = {}
+        if refresh_claims.get("type") == "refresh" and refresh_claims.get("sub", "").lower() == claims["sub"]:
+            await revoke(refresh_claims["jti"], refresh_claims["exp"])
+
+    return {"status": "ok"}
+
+
 @router.get("/me")
 def me(user: User = Depends(get_current_user)):
     return {"email": user.email, "role": user.role}
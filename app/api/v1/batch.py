@@ -0,0 +1,177 @@
+"""
+POST /v1/batch: several API calls in one round trip.
+
+The bearer token is verified once for the whole batch. Sub-requests carry
+the verified claims in request.state (see get_token_payload) instead of
+decoding the token and checking revocation again. Each sub-request then
+runs in-process through the application's router with its own DB session
+and its route's own dependencies, so it counts against that route's rate
+limit exactly like a separate call. At most BATCH_CONCURRENCY sub-requests
+run at once.
+
+A header set on a sub-request replaces the batch request's header of the
+same name (e.g. its own Accept). JSON response bodies come back as JSON,
+text bodies as a string and anything else (e.g. MessagePack) as base64
+with `"body_encoding": "base64"`.
+
+Middleware (request id, idempotency, access log, concurrency limiter) runs
+once, for the batch as a whole. A batch retried with the same
+Idempotency-Key gets the first batch's responses back, unless one of them
+was an answer that is never stored on its own (a 5xx, 429, 401 or 403):
+then the retry runs the batch again.
+"""
+import asyncio
+import base64
+import json
+import logging
+from typing import Any, Literal
+from urllib.parse import urlsplit
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.middleware.asyncexitstack import AsyncExitStackMiddleware
+from pydantic import BaseModel, Field, field_validator
+
+from app.api.v1.auth import get_token_payload
+from app.core.config import settings
+from app.core.idempotency import is_storable, skip_storing
+from app.core.tracing import span
+
+router = APIRouter()
+logger = logging.getLogger("app.batch")
+
+# a stream never finishes and a batch must not contain itself
+EXCLUDED_PATHS = ("/v1/batch", "/v1/watchlists/stream")
+# not passed on from the batch request; the body and its length are the sub-request's own
+PARENT_HEADERS_DROPPED = {b"content-length", b"content-type", b"idempotency-key", b"x-request-id"}
+# the batch's credentials are the only ones used
+SUB_HEADERS_DROPPED = PARENT_HEADERS_DROPPED | {b"authorization", b"host"}
+
+
+class SubRequest(BaseModel):
+    id: str | None = None
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"] = "GET"
+    path: str  # with an optional query string, e.g. /v1/watchlists/?limit=5
+    headers: dict[str, str] = Field(default_factory=dict)
+    body: Any = None
+
+    @field_validator("path")
+    @classmethod
+    def check_path(cls, v: str) -> str:
+        path = urlsplit(v).path
+        if not path.startswith("/v1/"):
+            raise ValueError("path must start with /v1/")
+        if any(path.rstrip("/") == p or path.startswith(p + "/") for p in EXCLUDED_PATHS):
+            raise ValueError(f"{path} cannot be called from a batch")
+        return v
+
+
+class BatchRequest(BaseModel):
+    requests: list[SubRequest] = Field(min_length=1, max_length=settings.BATCH_MAX_REQUESTS)
+
+
+def _sub_scope(parent: dict, sub: SubRequest, index: int, claims: dict, body: bytes) -> dict:
+    target = urlsplit(sub.path)
+    own = [
+        (name.lower().encode("latin-1"), value.encode("latin-1"))
+        for name, value in sub.headers.items()
+        if name.lower().encode("latin-1") not in SUB_HEADERS_DROPPED
+    ]
+    overridden = PARENT_HEADERS_DROPPED | {k for k, _ in own}
+    headers = [(k, v) for k, v in parent["headers"] if k not in overridden] + own
+    if body:
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    parent_id = parent.get("state", {}).get("request_id")
+    return {
+        "type": "http",
+        "asgi": parent.get("asgi", {"version": "3.0"}),
+        "http_version": parent.get("http_version", "1.1"),
+        "method": sub.method,
+        "scheme": parent.get("scheme", "http"),
+        "server": parent.get("server"),
+        "client": parent.get("client"),
+        "root_path": parent.get("root_path", ""),
+        "path": target.path,
+        "raw_path": target.path.encode(),
+        "query_string": target.query.encode(),
+        "headers": headers,
+        "app": parent["app"],
+        # AppError/HTTPException handlers registered on the app
+        "starlette.exception_handlers": parent.get("starlette.exception_handlers"),
+        "state": {
+            "request_id": f"{parent_id}.{index}" if parent_id else None,
+            "token_payload": claims,
+        },
+    }
+
+
+def _decode_body(headers: dict[str, str], body: bytes) -> dict:
+    if not body:
+        return {"body": None}
+    content_type = headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        return {"body": json.loads(body)}
+    if content_type.startswith("text/"):
+        try:
+            return {"body": body.decode("utf-8")}
+        except UnicodeDecodeError:
+            pass
+    return {"body": base64.b64encode(body).decode("ascii"), "body_encoding": "base64"}
+
+
+async def run_sub_request(request: Request, sub: SubRequest, index: int, claims: dict) -> dict:
+    body = b"" if sub.body is None else json.dumps(sub.body).encode()
+    scope = _sub_scope(request.scope, sub, index, claims, body)
+    status, headers, chunks = 500, {}, []
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # the client stays connected for as long as the batch does
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status, headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in message.get("headers", ())}
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        with span(f"batch {sub.method} {scope['path']}"):
+            # the router below the middleware stack, plus the per-request exit
+            # stack FastAPI's own middleware would have set up
+            await AsyncExitStackMiddleware(request.app.router)(scope, receive, send)
+    except Exception:
+        logger.exception("batch sub-request %s %s failed", sub.method, scope["path"])
+        return {
+            "id": sub.id,
+            "status": 500,
+            "headers": {},
+            "body": {"error": {
+                "code": "INTERNAL_ERROR",
+                "message": "Internal server error",
+                "request_id": scope["state"]["request_id"],
+            }},
+        }
+
+    headers.pop("content-length", None)
+    return {"id": sub.id, "status": status, "headers": headers, **_decode_body(headers, b"".join(chunks))}
+
+
+@router.post("/batch")
+async def batch(payload: BatchRequest, request: Request, claims: dict = Depends(get_token_payload)):
+    """Run up to BATCH_MAX_REQUESTS API calls; responses come back in request order."""
+    slots = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+
+    async def run(index: int, sub: SubRequest) -> dict:
+        async with slots:
+            return await run_sub_request(request, sub, index, claims)
+
+    responses = await asyncio.gather(*(run(i, sub) for i, sub in enumerate(payload.requests)))
+    if not all(is_storable(resp["status"]) for resp in responses):
+        skip_storing(request)
+    return {"responses": responses}
@@ -1,15 +1,15 @@
 from fastapi import APIRouter
-import httpx
+from app.core.http_client import get_http_client
 
 router = APIRouter()
 
 @router.get("/github")
 async def github_status():
     # Simple external call to prove async httpx usage
-    async with httpx.AsyncClient(timeout=5.0) as client:
-        r = await client.get("https://api.github.com")
-        r.raise_for_status()
-        data = r.json()
+    client = get_http_client()
+    r = await client.get("https://api.github.com")
+    r.raise_for_status()
+    data = r.json()
 
     # Return a small, stable subset
     return {
@@ -3,7 +3,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 
 from app.db.deps import get_db
-from app.core.redis_client import rate_limit_info
+from app.core.redis_client import breaker, get_redis
+from app.core.concurrency import limiter
 
 router = APIRouter()
 
@@ -19,9 +20,9 @@ async def health_detailed(db: Session = Depends(get_db)):
     except Exception:
         db_ok = False
 
-    # Check Redis (by calling your existing redis code)
+    # Check Redis (fails at once while the circuit breaker is open)
     try:
-        await rate_limit_info(key="healthcheck", limit=1, window_seconds=1)
+        await get_redis().ping()
         redis_ok = True
     except Exception:
         redis_ok = False
@@ -34,4 +35,6 @@ async def health_detailed(db: Session = Depends(get_db)):
             "database": "ok" if db_ok else "down",
             "redis": "ok" if redis_ok else "down",
         },
+        "redis_breaker": breaker.snapshot(),
+        "concurrency": limiter.snapshot(),
     }
\ No newline at end of file
@@ -0,0 +1,46 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.access_log import access_log
+from app.core.concurrency import limiter
+from app.core.redis_client import CircuitBreaker, breaker
+from app.core.tracing import trace_exporter
+
+router = APIRouter()
+
+BREAKER_STATES = (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN)
+
+
+def _render(metrics: list[tuple[str, str, str, list[tuple[str, float]]]]) -> str:
+    lines = []
+    for name, kind, help_text, samples in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{labels} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Per-worker metrics in the Prometheus text format."""
+    redis = breaker.snapshot()
+    load = limiter.snapshot()
+    return _render([
+        ("redis_breaker_state", "gauge", "1 for the current Redis circuit breaker state",
+         [(f'{{state="{s}"}}', int(redis["state"] == s)) for s in BREAKER_STATES]),
+        ("redis_breaker_failures_total", "counter", "Redis calls failed by connection errors or timeouts",
+         [("", redis["failures_total"])]),
+        ("redis_breaker_opened_total", "counter", "Times the Redis circuit breaker opened",
+         [("", redis["opened_total"])]),
+        ("redis_breaker_rejected_total", "counter", "Redis calls failed fast while the breaker was open",
+         [("", redis["rejected_total"])]),
+        ("concurrency_limit", "gauge", "Current adaptive concurrency limit", [("", load["limit"])]),
+        ("concurrency_in_flight", "gauge", "Requests currently admitted", [("", load["in_flight"])]),
+        ("concurrency_queued", "gauge", "Requests waiting for a slot", [("", load["queued"])]),
+        ("concurrency_rejected_total", "counter", "Requests shed with 503", [("", load["rejected_total"])]),
+        ("access_log_dropped_total", "counter", "Access log lines dropped on a full queue",
+         [("", access_log.handler.dropped)]),
+        ("trace_dropped_total", "counter", "Sampled traces dropped on a full export queue",
+         [("", trace_exporter.handler.dropped)]),
+    ])
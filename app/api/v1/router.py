@@ -2,6 +2,8 @@ from fastapi import APIRouter
 from app.api.v1 import auth, watchlists, external
 from app.api.v1 import health
 from app.api.v1 import admin
+from app.api.v1 import metrics
+from app.api.v1 import batch
 
 api_router = APIRouter()
 
@@ -9,4 +11,6 @@ api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(watchlists.router, prefix="/watchlists", tags=["watchlists"])
 api_router.include_router(external.router, prefix="/external", tags=["external"])
 api_router.include_router(health.router, tags=["health"])
-api_router.include_router(admin.router)
\ No newline at end of file
+api_router.include_router(metrics.router, tags=["metrics"])
+api_router.include_router(admin.router)
+api_router.include_router(batch.router, tags=["batch"])
\ No newline at end of file
@@ -1,17 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from app.core.rate_limit import rate_limit
-from app.api.v1.auth import get_current_user, require_admin
+from app.api.v1.auth import get_current_user, get_token_payload, require_admin
 from app.db.deps import get_db
-from app.db.models import User, WatchlistItem
-from app.core.exceptions import NotFoundError
-import json
-from app.core.redis_client import redis_client, delete_pattern
-from fastapi import BackgroundTasks
-from app.core.audit import write_audit_log
+from app.db.models import User, WatchlistItem, utcnow
+from app.db.changes import changes_since
+from app.db.counters import adjust_counts, totals
+from app.db.queries import ITEM_FIELDS, get_item_rows, list_item_rows, page_from_snapshot, snapshot_items, snapshot_rows
+from app.db.positions import key_between, last_position, neighbour_position, rebalance
+from app.db.shards import MAIN_SHARD, commit_write, prepare_item_write, shard_map
+from app.core.exceptions import BadRequestError, NotFoundError
+from app.core.cache import cache_get, cache_set, cache_key, drop_snapshot, snapshot_key
+from app.core.config import settings
+from app.core.events import event_stream, get_broker, publish_event
+from app.core.jobs import enqueue
+from app.core.audit import record_audit
+from app.core.access_log import note_user
+from app.core.tracing import traced_dependency
+from app.core.negotiation import NegotiatedResponse, NegotiatedRoute
 
-router = APIRouter()
+# JSON, or MessagePack for clients that send Accept: application/msgpack
+router = APIRouter(route_class=NegotiatedRoute, default_response_class=NegotiatedResponse)
 
 class WatchlistItemCreate(BaseModel):
     title: str
@@ -21,121 +32,308 @@ class WatchlistItemUpdate(BaseModel):
     title: str | None = None
     type: str | None = None
 
+class WatchlistItemMove(BaseModel):
+    # place the item right after `after` and/or right before `before`
+    after: int | None = None
+    before: int | None = None
+
+
+MAX_MULTI_GET_IDS = 100
+
+
+def parse_fields(fields: str | None) -> list[str]:
+    if not fields:
+        return list(ITEM_FIELDS)
+    names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [n for n in names if n not in ITEM_FIELDS]
+    if unknown or not names:
+        raise BadRequestError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(ITEM_FIELDS)}")
+    return names
+
+
+def parse_ids(ids: str) -> list[int]:
+    try:
+        parsed = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise BadRequestError("ids must be a comma-separated list of integers")
+    if not parsed or len(parsed) > MAX_MULTI_GET_IDS:
+        raise BadRequestError(f"Pass between 1 and {MAX_MULTI_GET_IDS} ids")
+    return parsed
+
+
+def _row_to_item(row: list, fields: list[str]) -> dict:
+    return dict(zip(fields, row))
+
+
+def _item_payload(item: WatchlistItem) -> dict:
+    return {
+        "id": item.id,
+        "title": item.title,
+        "type": item.media_type,
+        "created_at": item.created_at.isoformat(),
+        "position": item.position,
+    }
+
+
+@traced_dependency
+def get_items_db(
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Session on the shard holding the user's items (the request session when that is main)."""
+    name = shard_map.shard_for(user)
+    if name == MAIN_SHARD:
+        yield db
+        return
+    items_db = shard_map.session(name)
+    try:
+        yield items_db
+    finally:
+        items_db.close()
+
+
+async def get_snapshot(user: User, items_db: Session) -> list[list] | None:
+    """
+    The user's full list from its single cache key, loaded from the DB on a
+    miss. None when the list is over CACHE_SNAPSHOT_MAX_ITEMS; callers then
+    query the DB directly (and cache nothing, since writes only clear the
+    snapshot key).
+    """
+    if user.item_count > settings.CACHE_SNAPSHOT_MAX_ITEMS:
+        return None
+    key = snapshot_key(user.id)
+    snapshot = await cache_get(key)
+    if snapshot is None:
+        snapshot = snapshot_rows(items_db, user.id, settings.CACHE_SNAPSHOT_MAX_ITEMS)
+        if snapshot is not None:
+            await cache_set(key, snapshot, settings.CACHE_SNAPSHOT_TTL_SECONDS)
+    return snapshot
+
+
+async def invalidate_after_write(user_id: int) -> None:
+    """
+    Call after commit_write. The snapshot is a single key, so it is deleted
+    right away and the next read sees the write. Page keys need a SCAN and
+    are cleared on the job worker, off the request path; the job also
+    deletes the snapshot again, in case a read that loaded it before the
+    commit stored it after the first delete.
+    """
+    if settings.CACHE_MODE == "snapshot":
+        await drop_snapshot(user_id)
+    await enqueue("cache.invalidate_user", user_id=user_id)
+
+
+def _list_response(user: User, skip: int, limit: int, type: str | None, rows: list[list], fields: list[str]) -> dict:
+    return {
+        "user": user.email,
+        "skip": skip,
+        "limit": limit,
+        **totals(user, type),
+        "watchlist": [_row_to_item(r, fields) for r in rows],
+    }
+
 
 @router.get("/", dependencies=[Depends(rate_limit("watchlists:list", 60, 60))])
 async def list_watchlist(
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    items_db: Session = Depends(get_items_db),
     skip: int = 0,
     limit: int = 10,
     type: str | None = None,
     sort: str = "created_at_desc",
+    fields: str | None = None,
 ):
-    cache_key = f"cache:watchlists:{user.email}:skip={skip}:limit={limit}:type={type}:sort={sort}"
+    selected = parse_fields(fields)
 
+    if settings.CACHE_MODE == "snapshot":
+        snapshot = await get_snapshot(user, items_db)
+        if snapshot is not None:
+            rows = page_from_snapshot(snapshot, selected, type, sort, skip, limit)
+        else:
+            rows = list_item_rows(items_db, user.id, selected, type, sort, skip, limit)
+        return _list_response(user, skip, limit, type, rows, selected)
 
-    cached = None
-    try:
-        cached = await redis_client.get(cache_key)
-    except Exception:
-        cached = None
+    key = cache_key(user.id, skip=skip, limit=limit, type=type, sort=sort, fields=",".join(selected))
 
-    if cached:
-        return json.loads(cached)
+    # cached pages hold rows only; the user's email is added back on read
+    rows = await cache_get(key)
+    if rows is None:
+        # column tuples straight from the cursor; no ORM instances for reads
+        rows = list_item_rows(items_db, user.id, selected, type, sort, skip, limit)
+        await cache_set(key, rows, settings.CACHE_TTL_SECONDS)
 
-    q = db.query(WatchlistItem).filter(WatchlistItem.user_id == user.id)
+    return _list_response(user, skip, limit, type, rows, selected)
 
-    if type:
-        q = q.filter(WatchlistItem.media_type == type)
 
-    if sort == "created_at_asc":
-        q = q.order_by(WatchlistItem.created_at.asc())
+@router.get("/items", dependencies=[Depends(rate_limit("watchlists:list", 60, 60))])
+async def get_items(
+    ids: str,
+    user: User = Depends(get_current_user),
+    items_db: Session = Depends(get_items_db),
+    fields: str | None = None,
+):
+    wanted = parse_ids(ids)
+    selected = parse_fields(fields)
+
+    if settings.CACHE_MODE == "snapshot":
+        snapshot = await get_snapshot(user, items_db)
+        if snapshot is not None:
+            found = snapshot_items(snapshot, wanted, selected)
+        else:
+            found = get_item_rows(items_db, user.id, wanted, selected)
     else:
-        q = q.order_by(WatchlistItem.created_at.desc())
+        key = cache_key(user.id, ids=",".join(map(str, sorted(wanted))), fields=",".join(selected))
+        found = await cache_get(key)
+        if found is None:
+            # keyed by id so the cached entry serves any ordering of the same ids
+            found = get_item_rows(items_db, user.id, wanted, selected)
+            await cache_set(key, found, settings.CACHE_TTL_SECONDS)
+
+    by_id = {item_id: row for item_id, row in found}
+    return {
+        "items": [_row_to_item(by_id[i], selected) for i in wanted if i in by_id],
+        "missing": [i for i in wanted if i not in by_id],
+    }
+
+
+@router.get("/export", dependencies=[Depends(rate_limit("watchlists:export", 10, 60))])
+async def export_watchlist(
+    user: User = Depends(get_current_user),
+    items_db: Session = Depends(get_items_db),
+    type: str | None = None,
+    sort: str = "created_at_desc",
+    fields: str | None = None,
+):
+    """The user's whole list in one response, for bulk consumers."""
+    selected = parse_fields(fields)
 
-    items = q.offset(skip).limit(limit).all()
+    if settings.CACHE_MODE == "snapshot":
+        snapshot = await get_snapshot(user, items_db)
+        if snapshot is not None:
+            rows = page_from_snapshot(snapshot, selected, type, sort, 0, -1)
+        else:
+            rows = list_item_rows(items_db, user.id, selected, type, sort, 0, None)
+    else:
+        key = cache_key(user.id, export=1, type=type, sort=sort, fields=",".join(selected))
+        rows = await cache_get(key)
+        if rows is None:
+            rows = list_item_rows(items_db, user.id, selected, type, sort, 0, None)
+            await cache_set(key, rows, settings.CACHE_TTL_SECONDS)
 
-    response = {
+    return {
         "user": user.email,
-        "skip": skip,
-        "limit": limit,
-        "watchlist": [
-            {
-                "id": i.id,
-                "title": i.title,
-                "type": i.media_type,
-                "created_at": i.created_at.isoformat(),
-            }
-            for i in items
-        ],
+        **totals(user, type),
+        "fields": selected,
+        "items": rows,
     }
 
+
+@router.get("/changes", dependencies=[Depends(rate_limit("watchlists:list", 60, 60))])
+async def get_changes(
+    since: str | None = None,
+    limit: int = 500,
+    user: User = Depends(get_current_user),
+    items_db: Session = Depends(get_items_db),
+):
+    """Items changed and ids deleted since the `next_token` of a previous call.
+
+    Without `since` this returns the whole list; a 410 means the token is too
+    old and the client should refetch the list and start over.
+    """
+    if limit < 1 or limit > 1000:
+        raise BadRequestError("limit must be between 1 and 1000")
+    return changes_since(items_db, user.id, since, limit)
+
+
+
+@traced_dependency
+def get_stream_user_id(
+    payload: dict = Depends(get_token_payload),
+    # function scope: the session is closed before streaming starts, so idle
+    # SSE connections do not pin pooled DB connections
+    db: Session = Depends(get_db, scope="function"),
+) -> int:
+    user_id = db.query(User.id).filter(User.email == payload["sub"]).scalar()
+    if user_id is None:
+        raise NotFoundError("User not found")
+    note_user(user_id)
+    return user_id
+
+
+@router.get("/stream")
+async def stream_changes(
+    user_id: int = Depends(get_stream_user_id),
+    last_event_id: str | None = Header(None),
+):
     try:
-        await redis_client.setex(cache_key, 30, json.dumps(response))
-    except Exception:
-        pass
-    return response
+        resume_from = int(last_event_id) if last_event_id else None
+    except ValueError:
+        resume_from = None
 
+    broker = await get_broker()
+    return StreamingResponse(
+        event_stream(broker, user_id, resume_from, settings.EVENTS_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/items", status_code=201, dependencies=[Depends(rate_limit("watchlists:write", 30, 60))])
 async def add_item(
     payload: WatchlistItemCreate,
-    background_tasks: BackgroundTasks,
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
+    items_db: Session = Depends(get_items_db),
 ):
     item = WatchlistItem(
         user_id=user.id,
         title=payload.title,
         media_type=payload.type,
+        # new items go to the end of the manual order
+        position=key_between(last_position(items_db, user.id), None),
     )
-    db.add(item)
-    db.commit()
-    db.refresh(item)
+    prepare_item_write(user, item)
+    items_db.add(item)
+    items_db.flush()  # assigns the id when the database generates it
+    adjust_counts(db, user.id, added=item.media_type)
+    record_audit(db, user.id, "add", item.id, title=item.title, type=item.media_type)
+    commit_write(items_db, db)
+    items_db.refresh(item)
 
-    background_tasks.add_task(
-        write_audit_log,
-        f"user={user.email} action=add item_id={item.id} title={item.title} type={item.media_type}"
-    )
+    if len(item.position) > settings.POSITION_MAX_KEY_LENGTH:
+        await enqueue("watchlist.rebalance_positions", user_id=user.id)
+    await invalidate_after_write(user.id)
 
-    await delete_pattern(f"cache:watchlists:{user.email}:*")
+    data = _item_payload(item)
+    await publish_event(user.id, "item.added", data)
 
-    return {
-        "status": "ok",
-        "item": {
-            "id": item.id,
-            "title": item.title,
-            "type": item.media_type,
-            "created_at": item.created_at.isoformat(),
-        },
-    }
+    return {"status": "ok", "item": data}
 
 
 @router.delete("/items/{item_id}", status_code=204, dependencies=[Depends(rate_limit("watchlists:write", 30, 60))])
 async def remove_item(
     item_id: int,
-    background_tasks: BackgroundTasks,
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
+    items_db: Session = Depends(get_items_db),
 ):
     item = (
-        db.query(WatchlistItem)
-        .filter(WatchlistItem.id == item_id, WatchlistItem.user_id == user.id)
+        items_db.query(WatchlistItem)
+        .filter(WatchlistItem.id == item_id, WatchlistItem.user_id == user.id, WatchlistItem.deleted_at.is_(None))
         .first()
     )
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     
+    prepare_item_write(user)
     deleted_title = item.title
-    db.delete(item)
-    db.commit()
-    background_tasks.add_task(
-        write_audit_log,
-        f"user={user.email} action=delete item_id={item_id} title={deleted_title}"
-    )
-
-    await delete_pattern(f"cache:watchlists:{user.email}:*")
+    # tombstone, so the change feed can report the delete
+    item.deleted_at = utcnow()
+    adjust_counts(db, user.id, removed=item.media_type)
+    record_audit(db, user.id, "delete", item_id, title=deleted_title)
+    commit_write(items_db, db)
+    await invalidate_after_write(user.id)
+    await publish_event(user.id, "item.deleted", {"id": item_id})
 
     return
 
@@ -144,38 +342,94 @@ async def remove_item(
 async def update_item(
     item_id: int,
     payload: WatchlistItemUpdate,
-    background_tasks: BackgroundTasks,
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
+    items_db: Session = Depends(get_items_db),
 ):
     item = (
-        db.query(WatchlistItem)
-        .filter(WatchlistItem.id == item_id, WatchlistItem.user_id == user.id)
+        items_db.query(WatchlistItem)
+        .filter(WatchlistItem.id == item_id, WatchlistItem.user_id == user.id, WatchlistItem.deleted_at.is_(None))
         .first()
     )
     if not item:
         raise NotFoundError("Item not found")
 
+    prepare_item_write(user)
     if payload.title is not None:
         item.title = payload.title
-    if payload.type is not None:
+    if payload.type is not None and payload.type != item.media_type:
+        adjust_counts(db, user.id, added=payload.type, removed=item.media_type)
         item.media_type = payload.type
 
-    db.commit()
-    db.refresh(item)
-    background_tasks.add_task(
-        write_audit_log,
-        f"user={user.email} action=update item_id={item.id} title={item.title} type={item.media_type}"
+    record_audit(db, user.id, "update", item.id, title=item.title, type=item.media_type)
+    commit_write(items_db, db)
+    items_db.refresh(item)
+    await invalidate_after_write(user.id)
+
+    data = _item_payload(item)
+    await publish_event(user.id, "item.updated", data)
+
+    return {"status": "ok", "item": data}
+
+
+def _get_own_item(items_db: Session, user: User, item_id: int) -> WatchlistItem:
+    item = (
+        items_db.query(WatchlistItem)
+        .filter(WatchlistItem.id == item_id, WatchlistItem.user_id == user.id, WatchlistItem.deleted_at.is_(None))
+        .first()
     )
+    if not item:
+        raise NotFoundError("Item not found")
+    return item
 
-    await delete_pattern(f"cache:watchlists:{user.email}:*")
 
-    return {
-        "status": "ok",
-        "item": {
-            "id": item.id,
-            "title": item.title,
-            "type": item.media_type,
-            "created_at": item.created_at.isoformat(),
-        },
-    }
\ No newline at end of file
+def _move_bounds(items_db: Session, user: User, item: WatchlistItem, payload: WatchlistItemMove):
+    after = _get_own_item(items_db, user, payload.after) if payload.after is not None else None
+    before = _get_own_item(items_db, user, payload.before) if payload.before is not None else None
+    if item in (after, before):
+        raise BadRequestError("An item cannot be moved relative to itself")
+
+    if after is not None and before is not None:
+        return after.position, before.position
+    if after is not None:
+        return after.position, neighbour_position(items_db, user.id, after.position, True, item.id)
+    return neighbour_position(items_db, user.id, before.position, False, item.id), before.position
+
+
+@router.post("/items/{item_id}/move", dependencies=[Depends(rate_limit("watchlists:write", 30, 60))])
+async def move_item(
+    item_id: int,
+    payload: WatchlistItemMove,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    items_db: Session = Depends(get_items_db),
+):
+    """Reorder one item. Only the moved item's row is written."""
+    if payload.after is None and payload.before is None:
+        raise BadRequestError("Pass an `after` and/or `before` item id")
+
+    item = _get_own_item(items_db, user, item_id)
+    prepare_item_write(user)
+
+    low, high = _move_bounds(items_db, user, item, payload)
+    if low is not None and high is not None and low >= high:
+        if payload.after is not None and payload.before is not None and low > high:
+            raise BadRequestError("`after` must come before `before` in the current order")
+        # equal keys (two concurrent appends): respace this user's keys once
+        rebalance(items_db, user.id)
+        items_db.expire_all()
+        low, high = _move_bounds(items_db, user, item, payload)
+
+    item.position = key_between(low, high)
+    record_audit(db, user.id, "move", item.id, position=item.position)
+    commit_write(items_db, db)
+
+    if len(item.position) > settings.POSITION_MAX_KEY_LENGTH:
+        await enqueue("watchlist.rebalance_positions", user_id=user.id)
+    await invalidate_after_write(user.id)
+
+    data = _item_payload(item)
+    await publish_event(user.id, "item.moved", data)
+
+    return {"status": "ok", "item": data}
+
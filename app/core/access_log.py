@@ -0,0 +1,210 @@
+"""
+Structured, sampled access logs.
+
+One JSON line per logged request: method, route template, status,
+latency, request id, user id, cache hit/miss and time spent in SQL.
+The request path only builds a dict and puts the record on a bounded
+in-memory queue (QueueHandler). A QueueListener thread does the JSON
+encoding and the write to stdout, so a slow or blocked stdout never
+stalls the event loop. When the queue is full, records are dropped and
+counted instead of waiting.
+
+Sampling is per status class (ACCESS_LOG_SAMPLE_RATES, e.g.
+"2xx=0.01,5xx=1"). Requests slower than ACCESS_LOG_SLOW_MS are always
+logged. Each line carries the sample rate it was kept at, so counts
+can be scaled back up.
+"""
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.access")
+
+
+@dataclass
+class RequestStats:
+    user_id: int | None = None
+    cache_hit: bool | None = None
+    db_seconds: float = 0.0
+    db_queries: int = 0
+
+
+_stats: ContextVar[RequestStats | None] = ContextVar("access_log_stats", default=None)
+
+
+def note_user(user_id: int) -> None:
+    stats = _stats.get()
+    if stats is not None:
+        stats.user_id = user_id
+
+
+def note_cache(hit: bool) -> None:
+    stats = _stats.get()
+    if stats is not None:
+        # a request is a hit only if every lookup it made hit
+        stats.cache_hit = hit if stats.cache_hit is None else stats.cache_hit and hit
+
+
+# Sync endpoints and dependencies run in the threadpool with a copy of the
+# request context, so the RequestStats object is the same one either way.
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["access_log_started"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("access_log_started", None)
+    stats = _stats.get()
+    if stats is not None and started is not None:
+        stats.db_seconds += time.perf_counter() - started
+        stats.db_queries += 1
+
+
+def parse_sample_rates(spec: str) -> dict[int, float]:
+    """"2xx=0.01,5xx=1" -> {2: 0.01, 5: 1.0}; unlisted classes are always logged."""
+    rates = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, rate = part.partition("=")
+        name = name.strip().lower()
+        if len(name) != 3 or not name.endswith("xx") or not name[0].isdigit():
+            raise ValueError(f"bad status class {name!r} in ACCESS_LOG_SAMPLE_RATES")
+        rates[int(name[0])] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "logger": record.name,
+        }
+        entry.update(getattr(record, "access", None) or {"message": record.getMessage()})
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller: a full queue drops the record."""
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # formatting is left to the listener thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AccessLog:
+    def __init__(self, stream=None, queue_size: int = 10_000):
+        self.handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter())
+        self.listener = QueueListener(self.handler.queue, output, respect_handler_level=False)
+        self._running = False
+
+    def start(self) -> None:
+        # per process: call after fork (app lifespan), never at import
+        if not self._running:
+            logger.addHandler(self.handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            self.listener.start()
+            self._running = True
+
+    def stop(self) -> None:
+        """Flush what is queued and stop the listener thread."""
+        if self._running:
+            self.listener.stop()
+            logger.removeHandler(self.handler)
+            self._running = False
+
+
+access_log = AccessLog(queue_size=settings.ACCESS_LOG_QUEUE_SIZE)
+
+
+def route_template(scope) -> str | None:
+    """Full route template, e.g. /v1/watchlists/items/{item_id}.
+
+    The matched route only knows its path within its own router, so the
+    router prefixes are taken from the front of the request path."""
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return None
+    concrete = template
+    for name, value in scope.get("path_params", {}).items():
+        concrete = concrete.replace(f"{{{name}}}", str(value))
+    path = scope["path"]
+    if concrete and path.endswith(concrete):
+        return path[: len(path) - len(concrete)] + template
+    return template
+
+
+class AccessLogMiddleware:
+    """Pure ASGI, outermost, so latency includes every other middleware."""
+
+    def __init__(self, app, sample_rates: dict[int, float], slow_ms: float):
+        self.app = app
+        self.sample_rates = sample_rates
+        self.slow_seconds = slow_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _stats.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _stats.reset(token)
+            self._log(scope, status, time.perf_counter() - started, stats)
+
+    def _log(self, scope, status: int, elapsed: float, stats: RequestStats) -> None:
+        rate = self.sample_rates.get(status // 100, 1.0)
+        if elapsed < self.slow_seconds and (rate <= 0 or (rate < 1 and random.random() >= rate)):
+            return
+        logger.info("access", extra={"access": {
+            "method": scope["method"],
+            "route": route_template(scope),
+            "path": scope["path"],
+            "status": status,
+            "latency_ms": round(elapsed * 1000, 2),
+            "request_id": scope.get("state", {}).get("request_id"),
+            "user_id": stats.user_id,
+            "cache_hit": stats.cache_hit,
+            "db_ms": round(stats.db_seconds * 1000, 2),
+            "db_queries": stats.db_queries,
+            "sample_rate": 1.0 if elapsed >= self.slow_seconds else rate,
+        }})
@@ -1,12 +1,118 @@
-from datetime import datetime, timezone
-from pathlib import Path
+"""
+Structured audit trail in the `audit_events` table.
 
-AUDIT_LOG_PATH = Path("audit.log")
+Write endpoints call `record_audit` before committing, so the event is
+stored in the same transaction as the change it describes. Admins query it
+with `GET /v1/admin/audit` (see app/api/v1/admin.py).
 
+The old `audit.log` text file can be imported once with:
+
+    python -m app.core.audit import audit.log
+"""
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from app.core.jobs import job
+from app.db.models import AuditEvent, User
+
+logger = logging.getLogger("app.audit")
+
+
+def record_audit(db: Session, user_id: int | None, action: str, item_id: int | None = None, **detail) -> AuditEvent:
+    event = AuditEvent(
+        user_id=user_id,
+        action=action,
+        item_id=item_id,
+        detail=json.dumps(detail, separators=(",", ":")) if detail else None,
+    )
+    db.add(event)
+    return event
+
+
+def parse_legacy_line(line: str) -> dict | None:
+    """`<iso timestamp> | user=<email> action=<a> item_id=<n> title=<...> type=<t>`"""
+    stamp, sep, message = line.rstrip("\n").partition(" | ")
+    if not sep:
+        return None
+    try:
+        created_at = datetime.fromisoformat(stamp)
+    except ValueError:
+        return None
+
+    # title may contain spaces, so split on the known keys only
+    fields: dict[str, str] = {}
+    key = None
+    for token in message.split(" "):
+        name, eq, value = token.partition("=")
+        if eq and name in ("user", "action", "item_id", "title", "type"):
+            key = name
+            fields[key] = value
+        elif key:
+            fields[key] += " " + token
+    if "action" not in fields:
+        return None
+    return {"created_at": created_at, **fields}
+
+
+def _legacy_event(db: Session, fields: dict) -> AuditEvent:
+    user_id = db.query(User.id).filter(User.email == fields.get("user", "").lower()).scalar()
+    detail = {k: fields[k] for k in ("title", "type") if k in fields}
+    item_id = fields.get("item_id")
+    event = record_audit(db, user_id, fields["action"], int(item_id) if item_id and item_id.isdigit() else None, **detail)
+    if "created_at" in fields:
+        event.created_at = fields["created_at"]
+    return event
+
+
+@job("audit.write")
 def write_audit_log(message: str) -> None:
-    timestamp = datetime.now(timezone.utc).isoformat()
-    AUDIT_LOG_PATH.write_text(
-        AUDIT_LOG_PATH.read_text() + f"{timestamp} | {message}\n"
-        if AUDIT_LOG_PATH.exists()
-        else f"{timestamp} | {message}\n"
-    )
\ No newline at end of file
+    # Jobs queued by older releases as free-text messages; stored as events.
+    from app.db.session import SessionLocal
+
+    fields = parse_legacy_line(f"{datetime.now().isoformat()} | {message}")
+    if fields is None:
+        logger.warning("dropping unparseable audit message: %s", message)
+        return
+    fields.pop("created_at")
+    db = SessionLocal()
+    try:
+        _legacy_event(db, fields)
+        db.commit()
+    finally:
+        db.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    import argparse
+    from app.db.session import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Audit trail maintenance.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="load an old audit.log text file into audit_events")
+    imp.add_argument("path")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    imported = skipped = 0
+    try:
+        with open(args.path, encoding="utf-8") as f:
+            for line in f:
+                fields = parse_legacy_line(line)
+                if fields is None:
+                    skipped += 1
+                    continue
+                _legacy_event(db, fields)
+                imported += 1
+                if imported % 1000 == 0:
+                    db.commit()
+        db.commit()
+    finally:
+        db.close()
+    print(f"imported {imported} event(s), skipped {skipped} line(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Compact Redis cache payloads.
+
+Values go through a pluggable codec (msgpack when installed, compact JSON
+otherwise) and are compressed once they reach CACHE_COMPRESS_MIN_BYTES.
+The first byte of every stored value records which codec and compressor
+wrote it, so entries written under other settings still decode.
+
+Keys are short and hashed: `wl:<user_id>:<digest of the query params>`.
+With CACHE_MODE=snapshot a user has a single key, `wl:<user_id>:snap`,
+holding their whole list, and every page is cut from it in-process.
+"""
+import hashlib
+import json
+import zlib
+from typing import Any
+
+from app.core.access_log import note_cache
+from app.core.config import settings
+from app.core.jobs import job
+from app.core.redis_client import delete_pattern, get_redis
+
+
+class JsonCodec:
+    id = 1
+    name = "json"
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class MsgpackCodec:
+    id = 2
+    name = "msgpack"
+
+    def __init__(self):
+        import msgpack
+        self._msgpack = msgpack
+
+    def dumps(self, value: Any) -> bytes:
+        return self._msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return self._msgpack.unpackb(data, raw=False)
+
+
+class NoCompression:
+    id = 0
+    name = "none"
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+
+class ZlibCompression:
+    id = 1
+    name = "zlib"
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, 6)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class ZstdCompression:
+    id = 2
+    name = "zstd"
+
+    def __init__(self):
+        import zstandard
+        self._c = zstandard.ZstdCompressor(level=3)
+        self._d = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._d.decompress(data)
+
+
+class Lz4Compression:
+    id = 3
+    name = "lz4"
+
+    def __init__(self):
+        import lz4.frame
+        self._lz4 = lz4.frame
+
+    def compress(self, data: bytes) -> bytes:
+        return self._lz4.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._lz4.decompress(data)
+
+
+CODECS = {"msgpack": MsgpackCodec, "json": JsonCodec}
+COMPRESSORS = {"zstd": ZstdCompression, "lz4": Lz4Compression, "zlib": ZlibCompression, "none": NoCompression}
+
+
+def _build(registry: dict, name: str, fallback: list[str]):
+    # Optional dependencies: fall back to the next available implementation.
+    for candidate in [name] + fallback:
+        try:
+            return registry[candidate]()
+        except (KeyError, ImportError):
+            continue
+    raise ValueError(f"no usable implementation for {name!r}")
+
+
+class CacheSerializer:
+    def __init__(self, codec: str = "msgpack", compression: str = "auto", min_compress_bytes: int = 512):
+        self.codec = _build(CODECS, codec, ["json"])
+        if compression == "auto":
+            self.compressor = _build(COMPRESSORS, "zstd", ["lz4", "zlib"])
+        else:
+            self.compressor = _build(COMPRESSORS, compression, ["zlib"])
+        self.min_compress_bytes = min_compress_bytes
+
+        self._codecs = {self.codec.id: self.codec}
+        self._compressors = {self.compressor.id: self.compressor, NoCompression.id: NoCompression()}
+
+    def dumps(self, value: Any) -> bytes:
+        body = self.codec.dumps(value)
+        compressor = self.compressor
+        if len(body) < self.min_compress_bytes:
+            compressor = self._compressors[NoCompression.id]
+        else:
+            body = compressor.compress(body)
+        header = (self.codec.id << 4) | compressor.id
+        return bytes([header]) + body
+
+    def loads(self, data: bytes) -> Any:
+        header, body = data[0], data[1:]
+        codec = self._lookup(self._codecs, CODECS, header >> 4)
+        compressor = self._lookup(self._compressors, COMPRESSORS, header & 0x0F)
+        return codec.loads(compressor.decompress(body))
+
+    @staticmethod
+    def _lookup(cache: dict, registry: dict, type_id: int):
+        if type_id not in cache:
+            for cls in registry.values():
+                if cls.id == type_id:
+                    cache[type_id] = cls()
+                    break
+            else:
+                raise ValueError(f"unknown cache payload type {type_id}")
+        return cache[type_id]
+
+
+serializer = CacheSerializer(
+    codec=settings.CACHE_CODEC,
+    compression=settings.CACHE_COMPRESSION,
+    min_compress_bytes=settings.CACHE_COMPRESS_MIN_BYTES,
+)
+
+
+def cache_key(user_id: int, **params) -> str:
+    raw = "&".join(f"{k}={params[k]}" for k in sorted(params))
+    digest = hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+    return f"wl:{user_id}:{digest}"
+
+
+def snapshot_key(user_id: int) -> str:
+    return f"wl:{user_id}:snap"
+
+
+def user_cache_pattern(user_id: int) -> str:
+    return f"wl:{user_id}:*"
+
+
+async def cache_get(key: str) -> Any | None:
+    """Fail-open: a Redis error or an undecodable entry is a cache miss."""
+    try:
+        data = await get_redis().get(key)
+        if data is None:
+            note_cache(False)
+            return None
+        value = serializer.loads(data)
+    except Exception:
+        note_cache(False)
+        return None
+    note_cache(True)
+    return value
+
+
+async def cache_set(key: str, value: Any, ttl: int) -> None:
+    try:
+        await get_redis().set(key, serializer.dumps(value), ex=ttl)
+    except Exception:
+        pass
+
+
+async def drop_snapshot(user_id: int) -> None:
+    """Fail-open, like cache_get."""
+    try:
+        await get_redis().delete(snapshot_key(user_id))
+    except Exception:
+        pass
+
+
+@job("cache.invalidate_user")
+async def invalidate_user_cache(user_id: int) -> None:
+    if settings.CACHE_MODE == "snapshot":
+        # one key per user: no SCAN over every cached page variant
+        await drop_snapshot(user_id)
+        return
+    await delete_pattern(user_cache_pattern(user_id))
@@ -0,0 +1,176 @@
+"""
+Adaptive concurrency limiting (load shedding).
+
+Each worker admits at most `limit` requests at a time. Requests over the
+limit wait in a short FIFO queue (CONCURRENCY_QUEUE_SIZE entries, at most
+CONCURRENCY_QUEUE_TIMEOUT_MS) and are otherwise rejected at once with 503
+and Retry-After, before any routing, auth or DB work.
+
+The limit adapts from observed latency (AIMD): every request that finishes
+under CONCURRENCY_LATENCY_TARGET_MS while the limit was in use adds
+1/limit (about +1 per round of requests), and a slower one multiplies the
+limit by CONCURRENCY_BACKOFF, at most once per target interval. Health,
+metrics and the long-lived SSE stream are never limited.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+
+from app.core.config import settings
+
+
+class Overloaded(Exception):
+    pass
+
+
+class AIMDLimiter:
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        latency_target: float,
+        backoff: float,
+        queue_size: int,
+        queue_timeout: float,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+
+        self.in_flight = 0
+        self.rejected = 0
+        self.queued_total = 0
+        self.wait_seconds_total = 0.0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.capacity and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            raise Overloaded()
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        self.queued_total += 1
+        started = time.monotonic()
+        # asyncio.wait does not cancel fut, so a slot handed over right at
+        # the deadline is still seen (and kept) below
+        try:
+            await asyncio.wait({fut}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # client gone or shutdown: give back a slot handed over just
+            # before the cancel, or leave the queue, or the slot leaks
+            if fut.done() and not fut.cancelled():
+                self._return_slot()
+            else:
+                fut.cancel()
+                self._waiters.remove(fut)
+            raise
+        self.wait_seconds_total += time.monotonic() - started
+        if not fut.done():
+            fut.cancel()
+            self._waiters.remove(fut)
+            self.rejected += 1
+            raise Overloaded()
+
+    def release(self, latency: float) -> None:
+        busy = self.in_flight >= self.capacity
+        self._adapt(latency, busy)
+        self._return_slot()
+
+    def _return_slot(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < self.capacity:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self.in_flight += 1
+                fut.set_result(None)
+
+    def _adapt(self, latency: float, busy: bool) -> None:
+        now = time.monotonic()
+        if latency > self.latency_target:
+            if now - self._last_decrease >= self.latency_target:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        elif busy:
+            # only grow when the current limit is actually being used
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.capacity,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "queued_total": self.queued_total,
+            "rejected_total": self.rejected,
+            "queue_wait_seconds_total": round(self.wait_seconds_total, 3),
+        }
+
+
+def build_limiter() -> AIMDLimiter:
+    return AIMDLimiter(
+        initial=settings.CONCURRENCY_INITIAL_LIMIT,
+        min_limit=settings.CONCURRENCY_MIN_LIMIT,
+        max_limit=settings.CONCURRENCY_MAX_LIMIT,
+        latency_target=settings.CONCURRENCY_LATENCY_TARGET_MS / 1000,
+        backoff=settings.CONCURRENCY_BACKOFF,
+        queue_size=settings.CONCURRENCY_QUEUE_SIZE,
+        queue_timeout=settings.CONCURRENCY_QUEUE_TIMEOUT_MS / 1000,
+    )
+
+
+limiter = build_limiter()
+
+EXEMPT_PATHS = ("/health", "/v1/health", "/metrics", "/v1/metrics", "/v1/watchlists/stream")
+
+_OVERLOADED_BODY = json.dumps(
+    {"error": {"code": "OVERLOADED", "message": "Server is busy, retry shortly"}}
+).encode("utf-8")
+
+
+class ConcurrencyLimitMiddleware:
+    """Pure ASGI and outermost, so shed requests cost as little as possible."""
+
+    def __init__(self, app, limiter: AIMDLimiter, exempt_paths: tuple[str, ...] = EXEMPT_PATHS):
+        self.app = app
+        self.limiter = limiter
+        self.exempt_paths = exempt_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.limiter.acquire()
+        except Overloaded:
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(_OVERLOADED_BODY)).encode()),
+                    (b"retry-after", b"1"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": _OVERLOADED_BODY})
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(time.monotonic() - started)
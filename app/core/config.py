@@ -10,10 +10,124 @@ class Settings(BaseSettings):
     )
 
     DATABASE_URL: str = "sqlite:///./app.db"
+    # comma-separated read replica URLs; empty = everything on DATABASE_URL
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_EJECT_SECONDS: float = 30.0
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+    # watchlist item shards as "name=url,name=url"; empty = items stay on
+    # DATABASE_URL (see app/db/shards.py)
+    DATABASE_SHARDS: str = ""
+    SHARD_VNODES: int = 64
+    SHARD_ID_BLOCK: int = 1000
+    # manual ordering keys longer than this trigger a background rebalance
+    POSITION_MAX_KEY_LENGTH: int = 16
+    # deleted items are kept this long for the change feed (app/db/changes.py)
+    TOMBSTONE_RETENTION_DAYS: int = 30
     JWT_SECRET: str = os.getenv("JWT_SECRET", "local-dev-only-change-me")
     JWT_ALG: str = "HS256"
 
     JWT_EXPIRE_MINUTES: int = Field(default=60, validation_alias="jwt_expire_minutes")
+    REFRESH_EXPIRE_DAYS: int = 14
+
+    # Token revocation (see app/core/revocation.py)
+    REVOCATION_SYNC_SECONDS: float = 5.0
+    REVOCATION_BLOOM_CAPACITY: int = 100_000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+
+    # Server launcher (python -m app.server)
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+    WEB_CONCURRENCY: int = 0  # 0 = one worker per CPU
+    GRACEFUL_TIMEOUT: int = 30
+
+    # Redis client timeouts and circuit breaker (see app/core/redis_client.py)
+    REDIS_CONNECT_TIMEOUT: float = 0.5
+    REDIS_SOCKET_TIMEOUT: float = 1.0
+    REDIS_BREAKER_FAILURES: int = 5  # consecutive failures that open the breaker
+    REDIS_BREAKER_RESET_SECONDS: float = 10.0
+
+    # Redis cache payloads (see app/core/cache.py)
+    CACHE_CODEC: str = "msgpack"  # "msgpack" or "json"
+    CACHE_COMPRESSION: str = "auto"  # "auto" (zstd > lz4 > zlib), "zstd", "lz4", "zlib", "none"
+    CACHE_COMPRESS_MIN_BYTES: int = 512
+    CACHE_TTL_SECONDS: int = 30
+    # "pages": one entry per (skip, limit, type, sort, fields) combination;
+    # "snapshot": one entry per user holding the full list, pages cut in-process
+    CACHE_MODE: str = "pages"
+    CACHE_SNAPSHOT_MAX_ITEMS: int = 2000  # larger lists are read from the DB
+    CACHE_SNAPSHOT_TTL_SECONDS: int = 300
+
+    # Adaptive concurrency limit per worker (see app/core/concurrency.py)
+    CONCURRENCY_LIMIT_ENABLED: bool = True
+    CONCURRENCY_INITIAL_LIMIT: int = 32
+    CONCURRENCY_MIN_LIMIT: int = 4
+    CONCURRENCY_MAX_LIMIT: int = 512
+    CONCURRENCY_LATENCY_TARGET_MS: float = 250.0
+    CONCURRENCY_BACKOFF: float = 0.9
+    CONCURRENCY_QUEUE_SIZE: int = 64
+    CONCURRENCY_QUEUE_TIMEOUT_MS: float = 100.0
+
+    # JSON access logs (see app/core/access_log.py); per status class sample
+    # rates, unlisted classes are always logged, slow requests always are
+    ACCESS_LOG_ENABLED: bool = True
+    ACCESS_LOG_SAMPLE_RATES: str = "2xx=0.01,3xx=0.01,4xx=0.1,5xx=1"
+    ACCESS_LOG_SLOW_MS: float = 1000.0
+    ACCESS_LOG_QUEUE_SIZE: int = 10_000
+
+    # Request tracing (see app/core/tracing.py); kept at the tail when slow,
+    # 5xx, sampled by the caller or picked at random; off by default
+    TRACE_ENABLED: bool = False
+    TRACE_FILE: str = "traces/traces.jsonl"  # each worker adds its pid to the name
+    TRACE_FILE_MAX_BYTES: int = 50_000_000
+    TRACE_FILE_BACKUPS: int = 5
+    TRACE_SLOW_MS: float = 500.0
+    TRACE_SAMPLE_RATE: float = 0.0
+    TRACE_MAX_SPANS: int = 1000  # per trace; later spans are counted, not kept
+    TRACE_QUEUE_SIZE: int = 1000
+
+    # POST /v1/batch (see app/api/v1/batch.py)
+    BATCH_MAX_REQUESTS: int = 20
+    BATCH_CONCURRENCY: int = 4  # sub-requests running at once per batch
+
+    # Idempotency-Key replay for writes (see app/core/idempotency.py)
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_LOCK_SECONDS: int = 30  # how long a duplicate waits for the first
+
+    # Request profiling (see app/core/profiling.py); with a zero sample rate
+    # and the header disabled the middleware is not installed
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_ALLOW_HEADER: bool = True  # admins can send X-Profile: 1
+    PROFILE_DIR: str = "profiles"
+    PROFILE_INTERVAL_MS: float = 2.0
+    PROFILE_KEEP: int = 200
+
+    # SSE change feed (see app/core/events.py)
+    EVENTS_BACKEND: str = "auto"  # "auto", "redis" or "memory"
+    EVENTS_HISTORY: int = 200  # events kept per user for Last-Event-ID resume
+    EVENTS_QUEUE_SIZE: int = 64  # per-connection buffer
+    EVENTS_HEARTBEAT_SECONDS: float = 15.0
+
+    # Background jobs (see app/core/jobs.py, run with python -m app.worker)
+    JOBS_BACKEND: str = "auto"  # "auto", "redis" or "inline"
+    JOBS_STREAM: str = "jobs:stream"
+    JOBS_GROUP: str = "workers"
+    JOBS_DEAD_STREAM: str = "jobs:dead"
+    JOBS_MAX_ATTEMPTS: int = 5
+    JOBS_CLAIM_IDLE_MS: int = 60_000
+    JOBS_STREAM_MAXLEN: int = 100_000
+
+    @property
+    def replica_urls(self) -> list[str]:
+        return [u.strip() for u in self.DATABASE_REPLICA_URLS.split(",") if u.strip()]
+
+    @property
+    def shard_urls(self) -> dict[str, str]:
+        shards = {}
+        for entry in self.DATABASE_SHARDS.split(","):
+            if entry.strip():
+                name, _, url = entry.partition("=")
+                shards[name.strip()] = url.strip()
+        return shards
 
 
 settings = Settings()
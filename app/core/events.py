@@ -0,0 +1,297 @@
+"""
+Per-user watchlist change events for the SSE feed.
+
+Write endpoints call `publish_event`; `GET /v1/watchlists/stream` reads
+from a `Subscription`. Two brokers share the same local fan-out:
+
+- RedisBroker: event ids come from INCR, the last EVENTS_HISTORY events
+  per user are kept in a capped list for Last-Event-ID resume, and events
+  travel between workers over one PSUBSCRIBE connection per process.
+- InProcessBroker: the same in memory, used when Redis is unreachable
+  (events then only reach clients connected to the same worker). With
+  EVENTS_BACKEND=auto this fallback is temporary: Redis is probed again
+  every REPROBE_SECONDS, and once it answers the worker switches back and
+  tells its connected clients to resync, so they reconnect to the shared feed.
+
+Each connection gets a bounded queue. A client that falls behind is told
+to resync instead of letting its buffer grow.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger("app.events")
+
+CHANNEL_PREFIX = "events:"
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    type: str
+    data: dict
+
+    def encode(self) -> str:
+        return json.dumps({"id": self.id, "type": self.type, "data": self.data}, separators=(",", ":"))
+
+    @classmethod
+    def decode(cls, raw: str | bytes) -> "Event":
+        obj = json.loads(raw)
+        return cls(id=obj["id"], type=obj["type"], data=obj["data"])
+
+
+class Subscription:
+    def __init__(self, user_id: int, maxsize: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue[Event] = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def deliver(self, event: Event) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # the reader sees this on its next get() and tells the client to resync
+            self.overflowed = True
+
+    def end(self) -> None:
+        """Make the reader tell its client to resync (and so reconnect)."""
+        self.overflowed = True
+        try:
+            self.queue.put_nowait(Event(id=0, type="resync", data={}))
+        except asyncio.QueueFull:
+            pass  # the reader wakes up on a queued event anyway
+
+
+class Broker:
+    def __init__(self, history: int, queue_size: int):
+        self.history = history
+        self.queue_size = queue_size
+        self._subs: dict[int, set[Subscription]] = {}
+
+    def subscribe(self, user_id: int) -> Subscription:
+        sub = Subscription(user_id, self.queue_size)
+        self._subs.setdefault(user_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        subs = self._subs.get(sub.user_id)
+        if subs:
+            subs.discard(sub)
+            if not subs:
+                del self._subs[sub.user_id]
+
+    def _fanout(self, user_id: int, event: Event) -> None:
+        for sub in list(self._subs.get(user_id, ())):
+            sub.deliver(event)
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def publish(self, user_id: int, type: str, data: dict) -> Event:
+        raise NotImplementedError
+
+    async def replay(self, user_id: int, after: int) -> list[Event] | None:
+        """Events newer than `after`, or None if history no longer reaches back that far."""
+        raise NotImplementedError
+
+
+class InProcessBroker(Broker):
+    def __init__(self, history: int, queue_size: int):
+        super().__init__(history, queue_size)
+        self._seq: dict[int, int] = {}
+        self._log: dict[int, deque[Event]] = {}
+
+    async def publish(self, user_id: int, type: str, data: dict) -> Event:
+        self._seq[user_id] = self._seq.get(user_id, 0) + 1
+        event = Event(id=self._seq[user_id], type=type, data=data)
+        self._log.setdefault(user_id, deque(maxlen=self.history)).append(event)
+        self._fanout(user_id, event)
+        return event
+
+    async def replay(self, user_id: int, after: int) -> list[Event] | None:
+        return _events_after(list(self._log.get(user_id, ())), after, self._seq.get(user_id, 0))
+
+    async def close(self) -> None:
+        for subs in list(self._subs.values()):
+            for sub in list(subs):
+                sub.end()
+
+
+class RedisBroker(Broker):
+    def __init__(self, history: int, queue_size: int):
+        super().__init__(history, queue_size)
+        self._listener: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    channel = message["channel"]
+                    channel = channel.decode() if isinstance(channel, bytes) else channel
+                    user_id = int(channel[len(CHANNEL_PREFIX):])
+                    if user_id in self._subs:
+                        self._fanout(user_id, Event.decode(message["data"]))
+            except asyncio.CancelledError:
+                await pubsub.aclose()
+                raise
+            except Exception:
+                logger.warning("event listener lost Redis, reconnecting")
+                await pubsub.aclose()
+                await asyncio.sleep(1)
+
+    async def publish(self, user_id: int, type: str, data: dict) -> Event:
+        redis = get_redis()
+        event_id = await redis.incr(f"{CHANNEL_PREFIX}seq:{user_id}")
+        event = Event(id=event_id, type=type, data=data)
+        raw = event.encode()
+
+        log_key = f"{CHANNEL_PREFIX}log:{user_id}"
+        pipe = redis.pipeline(transaction=False)
+        pipe.rpush(log_key, raw)
+        pipe.ltrim(log_key, -self.history, -1)
+        pipe.expire(log_key, 86400)
+        pipe.publish(f"{CHANNEL_PREFIX}{user_id}", raw)
+        await pipe.execute()
+        return event
+
+    async def replay(self, user_id: int, after: int) -> list[Event] | None:
+        redis = get_redis()
+        raw = await redis.lrange(f"{CHANNEL_PREFIX}log:{user_id}", 0, -1)
+        latest = int(await redis.get(f"{CHANNEL_PREFIX}seq:{user_id}") or 0)
+        return _events_after([Event.decode(r) for r in raw], after, latest)
+
+
+def _events_after(log: list[Event], after: int, latest: int) -> list[Event] | None:
+    if after >= latest:
+        return []
+    if not log or log[0].id > after + 1:
+        return None
+    return [e for e in log if e.id > after]
+
+
+_broker: Broker | None = None
+_probed_at = 0.0
+REPROBE_SECONDS = 30
+
+
+async def _pick_backend() -> str:
+    backend = settings.EVENTS_BACKEND
+    if backend != "auto":
+        return backend
+    try:
+        await get_redis().ping()
+        return "redis"
+    except Exception:
+        return "memory"
+
+
+def _fallback_is_stale() -> bool:
+    return (
+        settings.EVENTS_BACKEND == "auto"
+        and isinstance(_broker, InProcessBroker)
+        and time.monotonic() - _probed_at > REPROBE_SECONDS
+    )
+
+
+async def get_broker() -> Broker:
+    global _broker, _probed_at
+    if _broker is None or _fallback_is_stale():
+        _probed_at = time.monotonic()
+        backend = await _pick_backend()
+        # another request may have picked a broker during ping()
+        if _broker is None:
+            cls = RedisBroker if backend == "redis" else InProcessBroker
+            _broker = cls(settings.EVENTS_HISTORY, settings.EVENTS_QUEUE_SIZE)
+            await _broker.start()
+            if cls is InProcessBroker and settings.EVENTS_BACKEND == "auto":
+                logger.warning(
+                    "Redis unreachable; events reach this worker's clients only (retrying in %ss)",
+                    REPROBE_SECONDS,
+                )
+        elif backend == "redis" and isinstance(_broker, InProcessBroker):
+            fallback, _broker = _broker, RedisBroker(settings.EVENTS_HISTORY, settings.EVENTS_QUEUE_SIZE)
+            await _broker.start()
+            logger.warning("Redis reachable again; moving event streams back to it")
+            await fallback.close()
+    return _broker
+
+
+async def close_broker() -> None:
+    global _broker
+    if _broker is not None:
+        broker, _broker = _broker, None
+        await broker.close()
+
+
+async def publish_event(user_id: int, type: str, data: dict) -> None:
+    """Fire-and-forget: a broker failure must not fail the write that triggered it."""
+    try:
+        broker = await get_broker()
+        await broker.publish(user_id, type, data)
+    except Exception:
+        logger.warning("could not publish %s event for user_id=%s", type, user_id)
+
+
+def format_sse(event: Event) -> str:
+    return f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data, separators=(',', ':'))}\n\n"
+
+
+RESYNC = "event: resync\ndata: {}\n\n"
+
+
+async def event_stream(broker: Broker, user_id: int, last_event_id: int | None, heartbeat: float):
+    """Yield SSE frames: replay after Last-Event-ID, then live events and heartbeats."""
+    sub = broker.subscribe(user_id)
+    try:
+        yield "retry: 3000\n\n"
+
+        seen = 0
+        if last_event_id is not None:
+            missed = await broker.replay(user_id, last_event_id)
+            if missed is None:
+                yield RESYNC
+            else:
+                for event in missed:
+                    seen = event.id
+                    yield format_sse(event)
+
+        while True:
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+
+            if sub.overflowed:
+                # client fell behind: make it refetch instead of buffering more
+                yield RESYNC
+                return
+            if event.id <= seen:
+                continue  # already sent during replay
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(sub)
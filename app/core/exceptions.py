@@ -1,8 +1,9 @@
 class AppError(Exception):
-    def __init__(self, code: str, message: str, status_code: int = 400):
+    def __init__(self, code: str, message: str, status_code: int = 400, headers: dict[str, str] | None = None):
         self.code = code
         self.message = message
         self.status_code = status_code
+        self.headers = headers
         super().__init__(message)
 
 
@@ -19,3 +20,23 @@ class UnauthorizedError(AppError):
 class ForbiddenError(AppError):
     def __init__(self, message: str = "Forbidden"):
         super().__init__(code="FORBIDDEN", message=message, status_code=403)
+
+
+class BadRequestError(AppError):
+    def __init__(self, message: str = "Bad request"):
+        super().__init__(code="BAD_REQUEST", message=message, status_code=400)
+
+
+class GoneError(AppError):
+    def __init__(self, message: str = "Resource is gone"):
+        super().__init__(code="RESYNC_REQUIRED", message=message, status_code=410)
+
+
+class ServiceUnavailableError(AppError):
+    def __init__(self, message: str = "Service temporarily unavailable", retry_after: int = 1):
+        super().__init__(
+            code="SERVICE_UNAVAILABLE",
+            message=message,
+            status_code=503,
+            headers={"Retry-After": str(retry_after)},
+        )
@@ -0,0 +1,24 @@
+# Shared outbound HTTP client, created on first use and closed by the app
+# lifespan. httpx is imported lazily so workers that never call out skip it.
+_http_client = None
+
+
+def get_http_client():
+    global _http_client
+    if _http_client is None:
+        import httpx
+        from app.core.tracing import TracingTransport
+        _http_client = httpx.AsyncClient(timeout=5.0, transport=TracingTransport(httpx.AsyncHTTPTransport()))
+    return _http_client
+
+
+def reset_http_client() -> None:
+    global _http_client
+    _http_client = None
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        client, _http_client = _http_client, None
+        await client.aclose()
@@ -0,0 +1,277 @@
+"""
+Idempotency-Key support for write endpoints.
+
+A client that retries a write sends the same `Idempotency-Key` header. The
+first request runs normally and its response is stored for
+IDEMPOTENCY_TTL_SECONDS; a repeat gets the stored response (marked with
+`Idempotent-Replayed: true`) without reaching the route, so it costs no DB
+write, job or cache invalidation. A repeat that arrives while the first is
+still running waits for it instead of running twice.
+
+Keys are scoped to the caller (the token subject) and must be reused with
+the same method, path and body; anything else is a 422. Only successes
+and the 4xx answers a retry would get again (400, 404, 409, 422) are
+stored; anything else (401, 403, 429, 5xx) may change with a fresh token,
+more time or a recovered dependency, so the key is released and the retry
+runs for real. A route whose 2xx wraps such an answer (POST /v1/batch)
+calls `skip_storing` so the same applies to it.
+
+Records live in Redis so every worker sees them; when Redis is unreachable
+an in-process store keeps the same guarantees within one worker.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger("app.idempotency")
+
+HEADER = "idempotency-key"
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+PENDING = "pending"
+MAX_KEY_LENGTH = 255
+# the same request would get the same 4xx again
+DETERMINISTIC_ERRORS = {400, 404, 409, 422}
+
+
+def is_storable(status: int) -> bool:
+    return 200 <= status < 300 or status in DETERMINISTIC_ERRORS
+
+
+def skip_storing(request) -> None:
+    """Release the key after this response instead of storing it."""
+    request.state.idempotency_skip = True
+
+
+class InProcessStore:
+    def __init__(self):
+        self._records: dict[str, tuple[float, dict]] = {}
+        self._done: dict[str, asyncio.Event] = {}
+
+    async def claim(self, key: str, record: dict, ttl: int) -> bool:
+        self._expire()
+        if key in self._records:
+            return False
+        self._records[key] = (time.monotonic() + ttl, record)
+        self._done[key] = asyncio.Event()
+        return True
+
+    async def get(self, key: str) -> dict | None:
+        entry = self._records.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    async def put(self, key: str, record: dict, ttl: int) -> None:
+        self._records[key] = (time.monotonic() + ttl, record)
+        self._notify(key)
+
+    async def release(self, key: str) -> None:
+        self._records.pop(key, None)
+        self._notify(key)
+
+    async def wait(self, key: str, timeout: float) -> None:
+        done = self._done.get(key)
+        if done is not None:
+            try:
+                await asyncio.wait_for(done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _notify(self, key: str) -> None:
+        done = self._done.pop(key, None)
+        if done is not None:
+            done.set()
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for key in [k for k, (until, _) in self._records.items() if until <= now]:
+            del self._records[key]
+
+
+class RedisStore:
+    POLL_SECONDS = 0.05
+
+    async def claim(self, key: str, record: dict, ttl: int) -> bool:
+        return bool(await get_redis().set(key, json.dumps(record), nx=True, ex=ttl))
+
+    async def get(self, key: str) -> dict | None:
+        raw = await get_redis().get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def put(self, key: str, record: dict, ttl: int) -> None:
+        await get_redis().set(key, json.dumps(record), ex=ttl)
+
+    async def release(self, key: str) -> None:
+        await get_redis().delete(key)
+
+    async def wait(self, key: str, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            record = await self.get(key)
+            if record is None or record["state"] != PENDING:
+                return
+            await asyncio.sleep(self.POLL_SECONDS)
+
+
+_redis_store = RedisStore()
+_local_store = InProcessStore()
+
+
+async def _claim(key: str, record: dict, ttl: int):
+    """Claim `key`; returns (store used, claimed?). Falls back to memory if Redis fails."""
+    try:
+        return _redis_store, await _redis_store.claim(key, record, ttl)
+    except Exception:
+        return _local_store, await _local_store.claim(key, record, ttl)
+
+
+def caller_scope(headers: dict[str, str]) -> str:
+    from app.core.security import decode_token
+
+    auth = headers.get("authorization", "")
+    try:
+        # the subject survives token refreshes between retries
+        return "sub:" + decode_token(auth.split(" ", 1)[1].strip())["sub"].lower()
+    except Exception:
+        return "auth:" + hashlib.blake2b(auth.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def fingerprint(method: str, path: str, body: bytes) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for part in (method.encode(), path.encode(), body):
+        h.update(part)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _json_response(status: int, code: str, message: str, extra_headers: list | None = None):
+    body = json.dumps({"error": {"code": code, "message": message}}).encode("utf-8")
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    return status, headers + (extra_headers or []), body
+
+
+class IdempotencyMiddleware:
+    """Pure ASGI so the stored response is exactly what was sent, and replays skip the app."""
+
+    def __init__(self, app, path_prefixes: tuple[str, ...]):
+        self.app = app
+        self.path_prefixes = path_prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        idem_key = headers.get(HEADER)
+        if not idem_key:
+            await self.app(scope, receive, send)
+            return
+        if len(idem_key) > MAX_KEY_LENGTH:
+            await _send(send, *_json_response(400, "BAD_REQUEST", "Idempotency-Key is too long"))
+            return
+
+        body = await _read_body(receive)
+        fp = fingerprint(scope["method"], scope["path"], body)
+        key = f"idem:{caller_scope(headers)}:{idem_key}"
+
+        pending = {"state": PENDING, "fp": fp}
+        store, claimed = await _claim(key, pending, settings.IDEMPOTENCY_LOCK_SECONDS)
+        if not claimed:
+            await self._replay(store, key, fp, send)
+            return
+
+        captured: dict = {"status": 500, "headers": [], "body": []}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                captured["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, _replay_body(body), capture)
+        except BaseException:
+            await _safe(store.release(key))
+            raise
+
+        status = captured["status"]
+        if not is_storable(status) or scope.get("state", {}).get("idempotency_skip"):
+            await _safe(store.release(key))
+            return
+        record = {
+            "state": "done",
+            "fp": fp,
+            "status": status,
+            "headers": [[k.decode("latin-1"), v.decode("latin-1")] for k, v in captured["headers"]],
+            "body": b"".join(captured["body"]).decode("latin-1"),
+        }
+        await _safe(store.put(key, record, settings.IDEMPOTENCY_TTL_SECONDS))
+
+    async def _replay(self, store, key: str, fp: str, send) -> None:
+        record = await store.get(key)
+        if record is not None and record["state"] == PENDING:
+            await store.wait(key, settings.IDEMPOTENCY_LOCK_SECONDS)
+            record = await store.get(key)
+
+        if record is None or record["state"] == PENDING:
+            # the first request failed (and released the key) or is still running
+            await _send(send, *_json_response(
+                409, "IDEMPOTENCY_IN_PROGRESS", "A request with this Idempotency-Key is still in progress",
+                [(b"retry-after", b"1")],
+            ))
+            return
+        if record["fp"] != fp:
+            await _send(send, *_json_response(
+                422, "IDEMPOTENCY_KEY_REUSED", "Idempotency-Key was already used for a different request",
+            ))
+            return
+
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in record["headers"]]
+        headers.append((b"idempotent-replayed", b"true"))
+        await _send(send, record["status"], headers, record["body"].encode("latin-1"))
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+def _replay_body(body: bytes):
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # nothing more to read; behave like a client that is still connected
+        await asyncio.Event().wait()
+
+    return receive
+
+
+async def _send(send, status: int, headers: list, body: bytes) -> None:
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _safe(awaitable) -> None:
+    try:
+        await awaitable
+    except Exception:
+        logger.warning("idempotency store unavailable", exc_info=True)
@@ -0,0 +1,178 @@
+"""
+Background jobs on a Redis Stream.
+
+Producers call `enqueue(name, payload)`; handlers are registered with
+`@job(name)` and run by a separate worker process (`python -m app.worker`)
+that reads the stream through a consumer group:
+
+- a handler that raises is retried up to JOBS_MAX_ATTEMPTS times, then the
+  message is copied to the dead-letter stream JOBS_DEAD_STREAM
+- a message left pending by a worker that died is reclaimed by another
+  worker after JOBS_CLAIM_IDLE_MS
+
+When Redis is unavailable (tests, local dev without docker) jobs run
+inline in the calling process instead of being dropped.
+"""
+import asyncio
+import inspect
+import json
+import logging
+import os
+import socket
+import time
+from typing import Any, Callable
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger("app.jobs")
+
+JOBS: dict[str, Callable[..., Any]] = {}
+
+
+def job(name: str):
+    def register(fn: Callable[..., Any]):
+        JOBS[name] = fn
+        return fn
+    return register
+
+
+async def run_job(name: str, payload: dict) -> None:
+    handler = JOBS[name]
+    if inspect.iscoroutinefunction(handler):
+        await handler(**payload)
+    else:
+        await asyncio.to_thread(handler, **payload)
+
+
+class InlineQueue:
+    name = "inline"
+
+    async def enqueue(self, name: str, payload: dict) -> None:
+        await run_job(name, payload)
+
+
+class RedisStreamQueue:
+    name = "redis"
+
+    def __init__(self, stream: str, group: str, dead_stream: str, max_attempts: int, claim_idle_ms: int):
+        self.stream = stream
+        self.group = group
+        self.dead_stream = dead_stream
+        self.max_attempts = max_attempts
+        self.claim_idle_ms = claim_idle_ms
+
+    async def enqueue(self, name: str, payload: dict, attempts: int = 0) -> None:
+        fields = {"name": name, "payload": json.dumps(payload), "attempts": attempts}
+        await get_redis().xadd(self.stream, fields, maxlen=settings.JOBS_STREAM_MAXLEN, approximate=True)
+
+    async def ensure_group(self) -> None:
+        try:
+            await get_redis().xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except Exception as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+    async def _handle(self, message_id, fields: dict) -> None:
+        fields = {_text(k): _text(v) for k, v in fields.items()}
+        name = fields.get("name", "")
+        attempts = int(fields.get("attempts", 0)) + 1
+
+        try:
+            await run_job(name, json.loads(fields.get("payload", "{}")))
+        except Exception as exc:
+            logger.warning("job %s (%s) failed on attempt %s: %r", name, _text(message_id), attempts, exc)
+            if attempts >= self.max_attempts or name not in JOBS:
+                await get_redis().xadd(self.dead_stream, {**fields, "attempts": attempts, "error": repr(exc)[:500]})
+            else:
+                await self.enqueue(name, json.loads(fields.get("payload", "{}")), attempts=attempts)
+
+        await get_redis().xack(self.stream, self.group, message_id)
+
+    async def work(self, consumer: str, stop: asyncio.Event, batch: int = 10, block_ms: int | None = None) -> None:
+        # a blocking read must return before the client's socket timeout,
+        # or an idle stream would look like a Redis outage to the breaker
+        block_ms = block_ms or int(settings.REDIS_SOCKET_TIMEOUT * 1000) // 2
+        redis = get_redis()
+        await self.ensure_group()
+
+        while not stop.is_set():
+            # pick up messages a dead worker left unacknowledged
+            _, claimed, *_ = await redis.xautoclaim(
+                self.stream, self.group, consumer, min_idle_time=self.claim_idle_ms, start_id="0-0", count=batch
+            )
+            for message_id, fields in claimed:
+                if fields:
+                    await self._handle(message_id, fields)
+
+            response = await redis.xreadgroup(self.group, consumer, {self.stream: ">"}, count=batch, block=block_ms)
+            for _, messages in response or []:
+                for message_id, fields in messages:
+                    await self._handle(message_id, fields)
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def default_consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def redis_queue() -> RedisStreamQueue:
+    return RedisStreamQueue(
+        stream=settings.JOBS_STREAM,
+        group=settings.JOBS_GROUP,
+        dead_stream=settings.JOBS_DEAD_STREAM,
+        max_attempts=settings.JOBS_MAX_ATTEMPTS,
+        claim_idle_ms=settings.JOBS_CLAIM_IDLE_MS,
+    )
+
+
+_queue = None
+_probed_at = 0.0
+REPROBE_SECONDS = 30
+
+
+async def get_queue():
+    global _queue, _probed_at
+    auto = settings.JOBS_BACKEND == "auto"
+    # in auto mode an inline fallback is re-checked periodically so the
+    # stream is used again once Redis comes back
+    if _queue is None or (auto and isinstance(_queue, InlineQueue) and time.monotonic() - _probed_at > REPROBE_SECONDS):
+        backend = settings.JOBS_BACKEND
+        if auto:
+            _probed_at = time.monotonic()
+            try:
+                await get_redis().ping()
+                backend = "redis"
+            except Exception:
+                backend = "inline"
+        _queue = redis_queue() if backend == "redis" else InlineQueue()
+    return _queue
+
+
+def reset_queue() -> None:
+    global _queue
+    _queue = None
+
+
+async def enqueue(name: str, **payload) -> None:
+    """
+    Hand a job to the worker. If the stream cannot be reached the job runs
+    inline so it is not lost; a failing inline job is logged, not raised.
+    """
+    queue = await get_queue()
+    try:
+        await queue.enqueue(name, payload)
+        return
+    except Exception:
+        if isinstance(queue, InlineQueue):
+            logger.exception("inline job %s failed", name)
+            return
+        logger.warning("could not enqueue %s, running inline", name)
+
+    try:
+        await run_job(name, payload)
+    except Exception:
+        logger.exception("inline job %s failed", name)
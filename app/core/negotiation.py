@@ -0,0 +1,151 @@
+"""
+MessagePack content negotiation for API routes.
+
+Routes built with `NegotiatedRoute` (and `NegotiatedResponse` as their
+response class) answer in MessagePack when the client asks for it with
+`Accept: application/msgpack` and in JSON otherwise, and accept request
+bodies sent as `Content-Type: application/msgpack`. Endpoints stay the
+same: they return plain dicts, and only the final encoding changes.
+
+JSON is the default. MessagePack is used only when the Accept header names
+it explicitly with a q-value at least as high as JSON's (so `*/*` alone
+still gets JSON). Error responses from the app's exception handlers stay
+JSON. Cache entries hold rows, not encoded responses, so one cached page
+serves both formats.
+
+Request bodies must hold only what JSON could: bin and ext values get a
+400, like a body that does not parse. msgpack is optional like the cache
+codec: without it every response is JSON and msgpack request bodies get a
+415.
+"""
+from contextvars import ContextVar
+from typing import Any
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is in requirements.txt
+    msgpack = None
+
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = {MSGPACK, "application/x-msgpack", "application/vnd.msgpack"}
+JSON_RANGES = {"application/json", "application/*", "*/*"}
+
+_msgpack_response: ContextVar[bool] = ContextVar("msgpack_response", default=False)
+
+
+def _media_type(value: str) -> str:
+    return value.split(";", 1)[0].strip().lower()
+
+
+def prefers_msgpack(accept: str | None) -> bool:
+    if not accept or msgpack is None:
+        return False
+    msgpack_q = json_q = 0.0
+    for part in accept.split(","):
+        media_type, *params = (p.strip() for p in part.split(";"))
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        media_type = media_type.lower()
+        if media_type in MSGPACK_TYPES:
+            msgpack_q = max(msgpack_q, q)
+        elif media_type in JSON_RANGES:
+            json_q = max(json_q, q)
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+
+def is_msgpack(content_type: str | None) -> bool:
+    return bool(content_type) and _media_type(content_type) in MSGPACK_TYPES
+
+
+def packb(content: Any) -> bytes:
+    return msgpack.packb(content, use_bin_type=True)
+
+
+def unpackb(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False)
+
+
+def _reject_ext(code: int, data: bytes):
+    raise ValueError(f"MessagePack ext type {code} is not accepted")
+
+
+def _check_json_types(value: Any) -> None:
+    if isinstance(value, bytes):
+        raise ValueError("MessagePack bin values are not accepted")
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _check_json_types(key)
+            _check_json_types(item)
+    elif isinstance(value, list):
+        for item in value:
+            _check_json_types(item)
+
+
+def unpack_body(data: bytes) -> Any:
+    """Decode a request body, refusing values JSON has no type for."""
+    value = msgpack.unpackb(data, raw=False, ext_hook=_reject_ext)
+    _check_json_types(value)
+    return value
+
+
+class NegotiatedResponse(JSONResponse):
+    """JSON, or MessagePack when the route's request asked for it."""
+
+    def __init__(self, content: Any, *args, **kwargs):
+        self.msgpack = _msgpack_response.get()
+        if self.msgpack:
+            self.media_type = MSGPACK
+        super().__init__(content, *args, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        if self.msgpack:
+            return packb(content)
+        return super().render(content)
+
+
+class MsgpackRequest(Request):
+    """A request with a MessagePack body, handed to FastAPI's JSON body
+    parsing: it reports a JSON content type and `json()` decodes MessagePack."""
+
+    def __init__(self, scope, receive):
+        super().__init__(scope, receive)
+        headers = MutableHeaders(raw=list(scope["headers"]))
+        headers["content-type"] = "application/json"
+        self._headers = headers
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            # FastAPI answers 400 when this raises, as for malformed JSON
+            self._json = unpack_body(await self.body())
+        return self._json
+
+
+class NegotiatedRoute(APIRoute):
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request) -> Response:
+            if is_msgpack(request.headers.get("content-type")):
+                if msgpack is None:
+                    raise HTTPException(status_code=415, detail="application/msgpack is not supported")
+                request = MsgpackRequest(request.scope, request.receive)
+            token = _msgpack_response.set(prefers_msgpack(request.headers.get("accept")))
+            try:
+                response = await handler(request)
+            finally:
+                _msgpack_response.reset(token)
+            response.headers.add_vary_header("Accept")
+            return response
+
+        return negotiated_handler
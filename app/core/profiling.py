@@ -0,0 +1,147 @@
+"""
+On-demand request profiling.
+
+A request is profiled when an admin sends `X-Profile: 1`, or at random with
+probability PROFILE_SAMPLE_RATE. The profile is written to
+PROFILE_DIR/<X-Request-ID>.folded and downloaded with
+`GET /v1/admin/profiles/<request id>`.
+
+The profiler samples the stacks of the event loop thread and of any worker
+thread running app code (sync dependencies and routes run in a threadpool)
+every PROFILE_INTERVAL_MS. Output is in "folded" form (`a;b;c <count>`),
+which flamegraph.pl and speedscope read directly. Other requests running on
+the same worker at the same time can show up in the samples.
+
+When neither trigger is configured the middleware is not installed at all.
+"""
+import asyncio
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from app.core.config import settings
+
+APP_DIR = str(Path(__file__).resolve().parent.parent)
+PROFILE_SUFFIX = ".folded"
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(APP_DIR):
+        filename = "app" + filename[len(APP_DIR):]
+    else:
+        filename = filename.rsplit("site-packages/", 1)[-1]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    def __init__(self, interval: float, loop_thread_id: int):
+        self.interval = interval
+        self.loop_thread_id = loop_thread_id
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                if self._keep(thread_id, stack):
+                    self.samples[";".join(_frame_label(c) for c in reversed(stack))] += 1
+
+    def _keep(self, thread_id: int, stack: list) -> bool:
+        if thread_id == self.loop_thread_id:
+            # an idle loop sits in selector.select(); that is not our time
+            return not stack[0].co_filename.endswith("selectors.py")
+        return any(c.co_filename.startswith(APP_DIR) for c in stack)
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def profile_path(request_id: str) -> Path:
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", request_id)[:128].lstrip(".")
+    return Path(settings.PROFILE_DIR) / f"{safe}{PROFILE_SUFFIX}"
+
+
+def save_profile(request_id: str, folded: str) -> Path:
+    path = profile_path(request_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(folded, encoding="utf-8")
+
+    # keep only the newest PROFILE_KEEP profiles
+    profiles = sorted(path.parent.glob(f"*{PROFILE_SUFFIX}"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in profiles[settings.PROFILE_KEEP:]:
+        old.unlink(missing_ok=True)
+    return path
+
+
+async def is_admin_token(scope) -> bool:
+    """Whether the request's bearer token belongs to an admin (see
+    `admin_from_request`)."""
+    from fastapi import Request
+
+    from app.api.v1.auth import admin_from_request
+    from app.core.exceptions import AppError
+
+    try:
+        await admin_from_request(Request(scope))
+    except AppError:
+        return False
+    return True
+
+
+class ProfilingMiddleware:
+    """Pure ASGI; must sit inside RequestIDMiddleware so the request id is known."""
+
+    def __init__(self, app, sample_rate: float, allow_header: bool, interval_ms: float):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.allow_header = allow_header
+        self.interval = interval_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not await self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = StackSampler(self.interval, threading.get_ident())
+        sampler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            sampler.stop()
+            request_id = scope.get("state", {}).get("request_id") or f"unknown-{time.time_ns()}"
+            await asyncio.to_thread(save_profile, request_id, sampler.folded())
+
+    async def _wanted(self, scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        if not self.allow_header:
+            return False
+        profile = authorization = None
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                profile = value
+            elif name == b"authorization":
+                authorization = value
+        if profile != b"1" or authorization is None:
+            return False
+        return await is_admin_token(scope)
@@ -1,5 +1,6 @@
 from fastapi import Depends, HTTPException, Request
-from app.core.redis_client import redis_client
+from app.core.redis_client import get_redis
+from app.core.tracing import traced_dependency
 
 
 def rate_limit(action: str, limit: int, window: int):
@@ -9,6 +10,7 @@ def rate_limit(action: str, limit: int, window: int):
         key = f"rl:{action}:{identifier}"
 
         try:
+            redis_client = get_redis()
             count = await redis_client.incr(key)
 
             if count == 1:
@@ -32,4 +34,4 @@ def rate_limit(action: str, limit: int, window: int):
             # Fail open if Redis or event loop is unavailable (common in tests)
             return
 
-    return _rate_limit
+    return traced_dependency(_rate_limit, name=f"rate_limit {action}")
@@ -1,10 +1,221 @@
+"""
+Shared Redis client behind a circuit breaker.
+
+Every caller fails open when Redis is down, but each failed call used to
+wait for a connection attempt first, so an outage added connect-timeout
+latency to every request, several times over. The client returned by
+`get_redis()` now has short explicit timeouts (REDIS_CONNECT_TIMEOUT,
+REDIS_SOCKET_TIMEOUT), no client-side retries, and a breaker in front:
+
+- closed: calls go through; REDIS_BREAKER_FAILURES connection or timeout
+  errors in a row open the breaker.
+- open: calls raise CircuitOpenError at once, without touching the network.
+- half-open: after REDIS_BREAKER_RESET_SECONDS one trial call is let
+  through; success closes the breaker, failure opens it again.
+
+Redis replies such as BUSYGROUP or WRONGTYPE do not count as failures.
+Pub/sub connections are not guarded; the event listener reconnects on its own.
+Guarded commands are also traced (one client span each, see app/core/tracing.py).
+"""
+import asyncio
 import time
 import os
-from redis.asyncio import Redis
-from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.tracing import CLIENT, end_span, span, start_span
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
-redis_client: Redis = Redis.from_url(REDIS_URL, decode_responses=True)
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling Redis while the breaker is open."""
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = self.CLOSED
+        self._trial_in_flight = False
+
+        self.failures_total = 0
+        self.opened_total = 0
+        self.rejected_total = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now."""
+        state = self.state
+        if state == self.CLOSED:
+            return
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = True
+            return
+        self.rejected_total += 1
+        raise CircuitOpenError("Redis circuit breaker is open")
+
+    def on_success(self) -> None:
+        self.failures = 0
+        self._trial_in_flight = False
+        self._state = self.CLOSED
+
+    def on_failure(self) -> None:
+        self.failures += 1
+        self.failures_total += 1
+        self._trial_in_flight = False
+        if self._state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.opened_total += 1
+            self._state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def on_cancel(self) -> None:
+        # a cancelled trial says nothing about Redis; let the next call try
+        self._trial_in_flight = False
+
+    def reset(self) -> None:
+        self.failures = 0
+        self._state = self.CLOSED
+        self._trial_in_flight = False
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "failures_total": self.failures_total,
+            "opened_total": self.opened_total,
+            "rejected_total": self.rejected_total,
+        }
+
+
+def _is_outage(exc: BaseException) -> bool:
+    from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+    return isinstance(exc, (RedisConnectionError, RedisTimeoutError, OSError, TimeoutError))
+
+
+# not network calls, or (pub/sub) long-lived connections with their own reconnects
+UNGUARDED = frozenset({"pubsub", "aclose", "close"})
+
+
+class GuardedRedis:
+    """Proxy that runs every Redis command through the breaker."""
+
+    def __init__(self, client, breaker: CircuitBreaker):
+        self._client = client
+        self._breaker = breaker
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name in UNGUARDED or not callable(attr):
+            return attr
+        if name == "pipeline":
+            return lambda *args, **kwargs: GuardedRedis(attr(*args, **kwargs), self._breaker)
+        if name.endswith("scan_iter"):
+            return lambda *args, **kwargs: self._guard_iter(attr(*args, **kwargs), name)
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            # commands are coroutines; pipeline buffering calls return the pipeline
+            return self._guard(result, name) if asyncio.iscoroutine(result) else result
+
+        return call
+
+    async def _guard(self, command, name: str):
+        with span(f"redis {name}", CLIENT, {"db.system": "redis", "db.operation": name}):
+            try:
+                self._breaker.before_call()
+            except CircuitOpenError:
+                command.close()
+                raise
+            try:
+                result = await command
+            except BaseException as exc:
+                self._settle(exc)
+                raise
+            self._breaker.on_success()
+            return result
+
+    async def _guard_iter(self, iterator, name: str):
+        # not made current: an abandoned iterator is closed from another context
+        current = start_span(f"redis {name}", CLIENT, {"db.system": "redis", "db.operation": name})
+        try:
+            self._breaker.before_call()
+            async for item in iterator:
+                yield item
+        except BaseException as exc:
+            end_span(current, exc)
+            if not isinstance(exc, CircuitOpenError):
+                self._settle(exc)
+            raise
+        finally:
+            end_span(current)
+        self._breaker.on_success()
+
+    def _settle(self, exc: BaseException) -> None:
+        if _is_outage(exc):
+            self._breaker.on_failure()
+        elif isinstance(exc, Exception):
+            self._breaker.on_success()  # Redis answered, just with an error
+        else:
+            self._breaker.on_cancel()
+
+
+def build_breaker() -> CircuitBreaker:
+    return CircuitBreaker(settings.REDIS_BREAKER_FAILURES, settings.REDIS_BREAKER_RESET_SECONDS)
+
+
+breaker = build_breaker()
+
+# Created on first use so importing the app (and forking workers) does not
+# pay for redis-py or open a connection pool up front.
+_redis_client = None
+
+
+def get_redis():
+    global _redis_client
+    if _redis_client is None:
+        from redis.asyncio import Redis
+        from redis.asyncio.retry import Retry
+        from redis.backoff import NoBackoff
+        # raw bytes: cache entries are binary (see app/core/cache.py)
+        client = Redis.from_url(
+            REDIS_URL,
+            socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            retry=Retry(NoBackoff(), 0),
+        )
+        _redis_client = GuardedRedis(client, breaker)
+    return _redis_client
+
+
+def reset_redis() -> None:
+    """Forget the client inherited from a parent process (call after fork)."""
+    global _redis_client
+    _redis_client = None
+    breaker.reset()
+
+
+async def close_redis() -> None:
+    global _redis_client
+    if _redis_client is not None:
+        client, _redis_client = _redis_client, None
+        try:
+            await client.aclose()
+        except Exception:
+            pass
 
 
 async def delete_pattern(pattern: str) -> int:
@@ -13,6 +224,7 @@ async def delete_pattern(pattern: str) -> int:
     Fail-open: if Redis is down, return 0 and do not crash the API.
     """
     try:
+        redis_client = get_redis()
         keys = []
         async for key in redis_client.scan_iter(match=pattern):
             keys.append(key)
@@ -20,7 +232,7 @@ async def delete_pattern(pattern: str) -> int:
         if keys:
             return await redis_client.delete(*keys)
         return 0
-    except (RedisError, Exception):
+    except Exception:
         return 0
 
 
@@ -29,11 +241,12 @@ async def is_rate_limited(key: str, limit: int, window_seconds: int) -> bool:
     Fail-open: if Redis is down, do NOT rate limit.
     """
     try:
+        redis_client = get_redis()
         count = await redis_client.incr(key)
         if count == 1:
             await redis_client.expire(key, window_seconds)
         return count > limit
-    except (RedisError, Exception):
+    except Exception:
         return False
 
 
@@ -44,6 +257,7 @@ async def rate_limit_info(key: str, limit: int, window_seconds: int) -> dict:
     now = int(time.time())
 
     try:
+        redis_client = get_redis()
         window = now // window_seconds
         redis_key = f"{key}:{window}"
 
@@ -61,7 +275,7 @@ async def rate_limit_info(key: str, limit: int, window_seconds: int) -> dict:
             "is_limited": count > limit,
         }
 
-    except (RedisError, Exception):
+    except Exception:
         # Pretend we're not limited if Redis is unavailable
         return {
             "limit": limit,
@@ -69,7 +283,3 @@ async def rate_limit_info(key: str, limit: int, window_seconds: int) -> dict:
             "reset": now + window_seconds,
             "is_limited": False,
         }
-
-
-def get_redis():
-    return redis_client
\ No newline at end of file
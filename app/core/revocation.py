@@ -0,0 +1,116 @@
+"""
+Revoked token ids (`jti`).
+
+Redis is the source of truth: `revoked:jti:<jti>` expires with the token,
+and the `revoked:index` sorted set (score = token exp) lets each process
+rebuild a local Bloom filter every REVOCATION_SYNC_SECONDS.
+
+`is_revoked` only goes to Redis when the filter reports a hit, so the
+common case (token not revoked) costs no network round trip. Revocations
+made in another process become visible here after the next sync, which is
+fine for access tokens but not for single-use refresh tokens: `claim`
+rotates those with an atomic `SET NX` in Redis, so a rotated token replayed
+against another worker is refused at once.
+"""
+import asyncio
+import logging
+import time
+
+from app.core.bloom import BloomFilter
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger("app.revocation")
+
+KEY_PREFIX = "revoked:jti:"
+INDEX_KEY = "revoked:index"
+
+_filter = BloomFilter(settings.REVOCATION_BLOOM_CAPACITY, settings.REVOCATION_BLOOM_ERROR_RATE)
+# jti -> exp revoked by this process; re-added on every rebuild so a
+# revocation that could not reach Redis still holds locally
+_local: dict[str, int] = {}
+
+
+async def revoke(jti: str, exp: int) -> None:
+    now = int(time.time())
+    _local[jti] = exp
+    _filter.add(jti)
+
+    try:
+        redis = get_redis()
+        pipe = redis.pipeline(transaction=False)
+        pipe.set(f"{KEY_PREFIX}{jti}", 1, ex=max(1, exp - now))
+        pipe.zadd(INDEX_KEY, {jti: exp})
+        await pipe.execute()
+    except Exception:
+        logger.warning("could not store revocation for jti=%s in Redis", jti)
+
+
+async def claim(jti: str, exp: int) -> bool:
+    """Revoke `jti` if nobody has yet; False if it was already revoked.
+
+    Without Redis only this process's own revocations can be seen, so a
+    claim then falls back to them (an outage does not lock every user out
+    of refreshing)."""
+    if jti in _local:
+        return False
+    now = int(time.time())
+    try:
+        redis = get_redis()
+        claimed = await redis.set(f"{KEY_PREFIX}{jti}", 1, nx=True, ex=max(1, exp - now))
+        if claimed:
+            await redis.zadd(INDEX_KEY, {jti: exp})
+    except Exception:
+        logger.warning("could not claim jti=%s in Redis; checked locally only", jti)
+        claimed = True
+    _local[jti] = exp
+    _filter.add(jti)
+    return bool(claimed)
+
+
+async def is_revoked(jti: str) -> bool:
+    if jti not in _filter:
+        return False
+
+    try:
+        return bool(await get_redis().exists(f"{KEY_PREFIX}{jti}")) or jti in _local
+    except Exception:
+        # A filter hit with Redis down: treat as revoked rather than risk
+        # accepting a logged-out token.
+        return True
+
+
+async def sync() -> int:
+    """Rebuild the local filter from Redis. Returns the number of revoked ids."""
+    global _filter
+    now = int(time.time())
+
+    redis = get_redis()
+    await redis.zremrangebyscore(INDEX_KEY, "-inf", now)
+    members = await redis.zrange(INDEX_KEY, 0, -1)
+
+    for jti, exp in list(_local.items()):
+        if exp <= now:
+            del _local[jti]
+
+    capacity = max(settings.REVOCATION_BLOOM_CAPACITY, 2 * (len(members) + len(_local)))
+    fresh = BloomFilter(capacity, settings.REVOCATION_BLOOM_ERROR_RATE)
+    for member in members:
+        fresh.add(member.decode() if isinstance(member, bytes) else member)
+    for jti in _local:
+        fresh.add(jti)
+
+    _filter = fresh
+    return len(fresh)
+
+
+async def sync_forever(interval: float) -> None:
+    while True:
+        try:
+            await sync()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # keep the previous filter while Redis is unavailable
+            pass
+        await asyncio.sleep(interval)
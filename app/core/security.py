@@ -1,35 +1,47 @@
-from passlib.context import CryptContext
-from passlib.exc import UnknownHashError
+from functools import lru_cache
 from datetime import datetime, timedelta, timezone
+import uuid
 import jwt
 from app.core.config import settings
 
-pwd_context = CryptContext(
-    schemes=["pbkdf2_sha256", "bcrypt_sha256", "bcrypt"],  # ✅ pbkdf2 avoids bcrypt crash
-    deprecated="auto",
-)
+
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    # passlib is only needed on register/login, so keep it off the import path
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["pbkdf2_sha256", "bcrypt_sha256", "bcrypt"],  # ✅ pbkdf2 avoids bcrypt crash
+        deprecated="auto",
+    )
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
+    from passlib.exc import UnknownHashError
+
     try:
-        return pwd_context.verify(plain_password, hashed_password)
+        return get_pwd_context().verify(plain_password, hashed_password)
     except UnknownHashError:
         return False
 
-def create_access_token(subject: str) -> str:
-    secret = settings.JWT_SECRET
-    alg = settings.JWT_ALG
-    exp_minutes = settings.JWT_EXPIRE_MINUTES
-
+def _create_token(subject: str, token_type: str, lifetime: timedelta) -> str:
     now = datetime.now(timezone.utc)
     payload = {
         "sub": subject,
+        "type": token_type,
+        "jti": uuid.uuid4().hex,
         "iat": int(now.timestamp()),
-        "exp": int((now + timedelta(minutes=exp_minutes)).timestamp()),
+        "exp": int((now + lifetime).timestamp()),
     }
-    return jwt.encode(payload, secret, algorithm=alg)
+    return jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALG)
+
+def create_access_token(subject: str) -> str:
+    return _create_token(subject, "access", timedelta(minutes=settings.JWT_EXPIRE_MINUTES))
+
+def create_refresh_token(subject: str) -> str:
+    return _create_token(subject, "refresh", timedelta(days=settings.REFRESH_EXPIRE_DAYS))
 
 def decode_token(token: str) -> dict:
     secret = settings.JWT_SECRET
@@ -0,0 +1,436 @@
+"""
+In-process request tracing.
+
+Every request gets a trace: a root span from TracingMiddleware, and child
+spans for FastAPI dependencies (`traced_dependency`), SQL statements and
+session commits (SQLAlchemy events below), Redis commands (GuardedRedis in
+app/core/redis_client.py) and outbound HTTP calls (TracingTransport on the
+shared httpx client). The current span is kept in a ContextVar, so spans
+made from threadpool code (sync routes and dependencies) nest under the
+request like any other.
+
+Sampling is decided at the tail, once the response is sent. A trace is kept
+if the request took at least TRACE_SLOW_MS, ended in a 5xx, arrived with a
+sampled W3C `traceparent`, or was picked at random (TRACE_SAMPLE_RATE).
+Everything else is thrown away without being encoded. Server-sent event
+streams stay open for minutes, so they are not kept just for being long.
+
+Kept traces are written as OTLP/JSON, one ExportTraceServiceRequest per line
+(what the OpenTelemetry Collector's file receiver reads), to TRACE_FILE with
+the worker's pid added to the name, since each worker rotates its own file.
+As with access logs, the request only enqueues its finished spans; a
+QueueListener thread encodes and writes them, and a full queue drops traces.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import time
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from inspect import isasyncgenfunction, iscoroutinefunction, isgeneratorfunction
+from logging.handlers import QueueListener, RotatingFileHandler
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.access_log import DroppingQueueHandler, route_template
+from app.core.config import settings
+
+logger = logging.getLogger("app.trace")
+
+# OTLP span kinds and status codes
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+STATUS_UNSET, STATUS_ERROR = 0, 2
+
+MAX_STATEMENT_LENGTH = 2000
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits) or 1:0{bits // 4}x}"
+
+
+class Trace:
+    def __init__(self, trace_id: str, max_spans: int, sampled: bool = False):
+        self.trace_id = trace_id
+        self.max_spans = max_spans
+        self.sampled = sampled  # the caller asked for this trace to be kept
+        self.spans: list[Span] = []
+        self.dropped = 0
+
+
+@dataclass(eq=False)
+class Span:
+    trace: Trace
+    name: str
+    kind: int
+    parent_id: str | None
+    attributes: dict = field(default_factory=dict)
+    span_id: str = field(default_factory=lambda: _new_id(64))
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int | None = None
+    error: str | None = None
+
+    def end(self, exc: BaseException | None = None) -> None:
+        if exc is not None and self.error is None:
+            self.error = f"{type(exc).__name__}: {exc}"
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+
+_current: ContextVar[Span | None] = ContextVar("trace_span", default=None)
+
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+def start_span(name: str, kind: int = INTERNAL, attributes: dict | None = None) -> Span | None:
+    """Start a child of the current span without making it current.
+
+    Returns None outside a trace, or once the trace has TRACE_MAX_SPANS."""
+    parent = _current.get()
+    if parent is None:
+        return None
+    trace = parent.trace
+    if len(trace.spans) >= trace.max_spans:
+        trace.dropped += 1
+        return None
+    new = Span(trace, name, kind, parent.span_id, attributes or {})
+    trace.spans.append(new)
+    return new
+
+
+def end_span(span: Span | None, exc: BaseException | None = None) -> None:
+    if span is not None:
+        span.end(exc)
+
+
+@contextmanager
+def span(name: str, kind: int = INTERNAL, attributes: dict | None = None):
+    """Run the block in a child span of the current one; a no-op outside a trace."""
+    new = start_span(name, kind, attributes)
+    if new is None:
+        yield None
+        return
+    token = _current.set(new)
+    try:
+        yield new
+    except BaseException as exc:
+        new.end(exc)
+        raise
+    finally:
+        _current.reset(token)
+        new.end()
+
+
+def traceparent(span: Span) -> str:
+    return f"00-{span.trace.trace_id}-{span.span_id}-{'01' if span.trace.sampled else '00'}"
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str, bool] | None:
+    """W3C traceparent -> (trace_id, parent span id, sampled); None if invalid."""
+    parts = (value or "").strip().lower().split("-")
+    if len(parts) != 4 or len(parts[0]) != 2 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[0] == "ff" or not parts[1].strip("0") or not parts[2].strip("0"):
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def traced_dependency(func, name: str | None = None):
+    """Wrap a FastAPI dependency in a span.
+
+    The wrapper is the same kind of callable (sync, async, generator or
+    async generator) with the same signature, so FastAPI runs it the same
+    way, and it is what the module exports, so dependency_overrides keyed
+    on it keep working. For yield dependencies only the setup up to the
+    yield is timed."""
+    name = name or f"dependency {func.__name__}"
+
+    if isasyncgenfunction(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            async with AsyncExitStack() as stack:
+                with span(name):
+                    value = await stack.enter_async_context(asynccontextmanager(func)(*args, **kwargs))
+                yield value
+    elif isgeneratorfunction(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with ExitStack() as stack:
+                with span(name):
+                    value = stack.enter_context(contextmanager(func)(*args, **kwargs))
+                yield value
+    elif iscoroutinefunction(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+    else:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+    return wrapper
+
+
+# SQLAlchemy: one span per statement (these listeners apply to every engine,
+# like the access log's) and one per session commit, which covers the flush
+# and the COMMIT itself. Neither is made current; nothing nests under them.
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+    conn.info["trace_span"] = start_span(f"db {operation}", CLIENT, {
+        "db.system": conn.engine.dialect.name,
+        "db.operation": operation,
+        "db.statement": statement[:MAX_STATEMENT_LENGTH],
+    })
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    end_span(conn.info.pop("trace_span", None))
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(ctx):
+    if ctx.connection is not None:
+        end_span(ctx.connection.info.pop("trace_span", None), ctx.original_exception)
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session):
+    session.info["trace_commit_span"] = start_span("db commit", CLIENT)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    end_span(session.info.pop("trace_commit_span", None))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _after_soft_rollback(session, previous_transaction):
+    pending = session.info.pop("trace_commit_span", None)
+    if pending is not None:
+        pending.error = "rolled back"
+        pending.end()
+
+
+class TracingTransport:
+    """httpx transport wrapper: a client span per request, and the trace
+    context sent on in a `traceparent` header.
+
+    Duck-typed rather than a subclass so this module does not import httpx
+    (see app/core/http_client.py)."""
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    async def handle_async_request(self, request):
+        with span(f"HTTP {request.method}", CLIENT, {
+            "http.request.method": request.method,
+            "server.address": request.url.host,
+            "url.full": str(request.url.copy_with(query=None)),
+        }) as current:
+            if current is None:
+                return await self.transport.handle_async_request(request)
+            request.headers["traceparent"] = traceparent(current)
+            response = await self.transport.handle_async_request(request)
+            current.attributes["http.response.status_code"] = response.status_code
+            if response.status_code >= 400:
+                current.error = f"HTTP {response.status_code}"
+            return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+    async def __aenter__(self):
+        await self.transport.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.transport.__aexit__(*exc_info)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}  # int64 is a string in OTLP/JSON
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list[dict]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+def _otlp_span(span: Span, trace_end_ns: int) -> dict:
+    error = span.error
+    if span.end_ns is None:
+        error = error or "span did not end before the request finished"
+    encoded = {
+        "traceId": span.trace.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns or trace_end_ns),
+        "attributes": _otlp_attributes(span.attributes),
+        "status": {"code": STATUS_ERROR, "message": error} if error else {"code": STATUS_UNSET},
+    }
+    if span.parent_id:
+        encoded["parentSpanId"] = span.parent_id
+    return encoded
+
+
+class OtlpJsonFormatter(logging.Formatter):
+    def __init__(self, service_name: str):
+        super().__init__()
+        self.resource = {"attributes": _otlp_attributes({"service.name": service_name, "process.pid": os.getpid()})}
+
+    def format(self, record: logging.LogRecord) -> str:
+        spans = record.spans
+        trace_end = max((s.end_ns or 0 for s in spans), default=0)
+        return json.dumps({"resourceSpans": [{
+            "resource": self.resource,
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [_otlp_span(s, trace_end) for s in spans],
+            }],
+        }]}, separators=(",", ":"))
+
+
+def worker_path(path: str) -> Path:
+    """traces/traces.jsonl -> traces/traces.<pid>.jsonl"""
+    file = Path(path)
+    return file.with_name(f"{file.stem}.{os.getpid()}{file.suffix}")
+
+
+class TraceExporter:
+    def __init__(self, path: str, max_bytes: int, backups: int, queue_size: int = 1000,
+                 service_name: str = "watchlist-api"):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.service_name = service_name
+        self.handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        self.listener: QueueListener | None = None
+
+    def start(self) -> None:
+        # per process, like AccessLog.start(): the file name carries the pid
+        if self.listener is not None:
+            return
+        path = worker_path(self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        output = RotatingFileHandler(path, maxBytes=self.max_bytes, backupCount=self.backups,
+                                     encoding="utf-8", delay=True)
+        output.setFormatter(OtlpJsonFormatter(self.service_name))
+        self.listener = QueueListener(self.handler.queue, output, respect_handler_level=False)
+        logger.addHandler(self.handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        self.listener.start()
+
+    def stop(self) -> None:
+        """Write what is queued, stop the listener thread and close the file."""
+        if self.listener is not None:
+            self.listener.stop()
+            for output in self.listener.handlers:
+                output.close()
+            logger.removeHandler(self.handler)
+            self.listener = None
+
+
+trace_exporter = TraceExporter(
+    settings.TRACE_FILE,
+    max_bytes=settings.TRACE_FILE_MAX_BYTES,
+    backups=settings.TRACE_FILE_BACKUPS,
+    queue_size=settings.TRACE_QUEUE_SIZE,
+)
+
+
+def _header(scope, name: bytes) -> str | None:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class TracingMiddleware:
+    """Pure ASGI; starts the root span and makes the keep/drop decision."""
+
+    def __init__(self, app, sample_rate: float, slow_ms: float, max_spans: int = 1000):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ns = int(slow_ms * 1_000_000)
+        self.max_spans = max_spans
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        upstream = parse_traceparent(_header(scope, b"traceparent"))
+        if upstream:
+            trace = Trace(upstream[0], self.max_spans, sampled=upstream[2])
+        else:
+            trace = Trace(_new_id(128), self.max_spans)
+        root = Span(trace, scope["method"], SERVER, upstream[1] if upstream else None, {
+            "http.request.method": scope["method"],
+            "url.path": scope["path"],
+        })
+        trace.spans.append(root)
+        token = _current.set(root)
+        status = 500
+        streaming = False
+
+        async def send_wrapper(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = any(
+                    key == b"content-type" and value.startswith(b"text/event-stream")
+                    for key, value in message.get("headers", ())
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as exc:
+            root.end(exc)
+            raise
+        finally:
+            _current.reset(token)
+            root.end()
+            self._finish(scope, trace, root, status, streaming)
+
+    def _finish(self, scope, trace: Trace, root: Span, status: int, streaming: bool) -> None:
+        slow = root.end_ns - root.start_ns >= self.slow_ns and not streaming
+        if not (slow or status >= 500 or trace.sampled or random.random() < self.sample_rate):
+            return
+        route = route_template(scope)
+        if route:
+            root.name = f"{scope['method']} {route}"
+        if status >= 500 and root.error is None:
+            root.error = f"HTTP {status}"
+        root.attributes.update({
+            "http.route": route,
+            "http.response.status_code": status,
+            "request.id": scope.get("state", {}).get("request_id"),
+            "trace.dropped_spans": trace.dropped or None,
+        })
+        logger.info("trace", extra={"spans": list(trace.spans)})
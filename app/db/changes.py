@@ -0,0 +1,169 @@
+"""
+Incremental watchlist sync.
+
+Every write stamps `watchlist_items.updated_at` with the database clock
+inside the write statement (see `utcnow` in app/db/models.py), and deletes
+only set `deleted_at`, leaving a tombstone. `changes_since` walks
+`ix_watchlist_items_user_updated` from the client's change token and returns
+the changed items plus the ids deleted since then.
+
+A change token is an opaque (updated_at, id) position plus the time it was
+issued. Once a client has caught up, its token points at the start of the
+last millisecond seen, so writes stamped in the same millisecond are sent
+again rather than missed. Applying changes is idempotent, so the repeat is
+harmless.
+
+Tombstones older than TOMBSTONE_RETENTION_DAYS are removed with:
+
+    python -m app.db.changes compact
+
+and tokens issued before that window get a 410 telling the client to
+resync. The check uses the issue time, not the position: an empty or idle
+list keeps an old position, but a client polling it has seen every
+tombstone since its last call.
+"""
+import base64
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.exceptions import BadRequestError, GoneError
+from app.core.jobs import job
+from app.db.models import WatchlistItem
+
+logger = logging.getLogger("app.changes")
+
+BEGINNING = datetime(1970, 1, 1)
+
+CHANGE_COLUMNS = (
+    WatchlistItem.id,
+    WatchlistItem.title,
+    WatchlistItem.media_type,
+    WatchlistItem.created_at,
+    WatchlistItem.position,
+    WatchlistItem.updated_at,
+    WatchlistItem.deleted_at,
+)
+
+
+def _utc_naive_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def encode_token(updated_at: datetime, item_id: int, issued_at: datetime | None = None) -> str:
+    issued_at = issued_at or _utc_naive_now()
+    raw = f"{updated_at.replace(tzinfo=None).isoformat()}|{item_id}|{issued_at.replace(tzinfo=None).isoformat()}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_token(token: str) -> tuple[datetime, int, datetime]:
+    """(updated_at, id, issued_at); tokens without an issue time count as
+    issued at their position, as they were checked before."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        parts = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").split("|")
+        if len(parts) not in (2, 3):
+            raise ValueError(token)
+        after = datetime.fromisoformat(parts[0])
+        issued_at = datetime.fromisoformat(parts[2]) if len(parts) == 3 else after
+        return after, int(parts[1]), issued_at
+    except ValueError:
+        raise BadRequestError("Invalid change token")
+
+
+def changes_since(db: Session, user_id: int, since: str | None, limit: int) -> dict:
+    now = _utc_naive_now()
+    after, after_id, issued_at = decode_token(since) if since else (BEGINNING, 0, now)
+    retention = timedelta(days=settings.TOMBSTONE_RETENTION_DAYS)
+    if issued_at < now - retention:
+        raise GoneError("Change token is older than the tombstone retention window; refetch the full list")
+
+    stmt = (
+        select(*CHANGE_COLUMNS)
+        .where(
+            WatchlistItem.user_id == user_id,
+            tuple_(WatchlistItem.updated_at, WatchlistItem.id) > (after, after_id),
+        )
+        .order_by(WatchlistItem.updated_at, WatchlistItem.id)
+        .limit(limit + 1)
+    )
+    if not since:
+        # first sync: nothing to delete on the client yet
+        stmt = stmt.where(WatchlistItem.deleted_at.is_(None))
+
+    rows = db.execute(stmt).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    changed, deleted = [], []
+    for item_id, title, media_type, created_at, position, updated_at, deleted_at in rows:
+        if deleted_at is not None:
+            deleted.append(item_id)
+        else:
+            changed.append({
+                "id": item_id,
+                "title": title,
+                "type": media_type,
+                "created_at": created_at.isoformat(),
+                "position": position,
+                "updated_at": updated_at.isoformat(),
+            })
+
+    if not rows:
+        # same position, but issued now: nothing was missed up to this call
+        next_token = encode_token(after, after_id, now)
+    elif has_more:
+        next_token = encode_token(rows[-1].updated_at, rows[-1].id, now)
+    else:
+        # caught up: restart from the top of the last millisecond next time
+        last = rows[-1].updated_at
+        next_token = encode_token(last.replace(microsecond=last.microsecond // 1000 * 1000), 0, now)
+
+    return {"changed": changed, "deleted": deleted, "next_token": next_token, "has_more": has_more}
+
+
+def compact(db: Session, older_than: datetime, batch: int = 1000) -> int:
+    """Delete tombstones older than `older_than`, `batch` rows per transaction."""
+    removed = 0
+    while True:
+        ids = db.scalars(
+            select(WatchlistItem.id)
+            .where(WatchlistItem.deleted_at.is_not(None), WatchlistItem.deleted_at < older_than)
+            .limit(batch)
+        ).all()
+        if not ids:
+            return removed
+        db.execute(delete(WatchlistItem).where(WatchlistItem.id.in_(ids)))
+        db.commit()
+        removed += len(ids)
+
+
+@job("watchlist.compact_tombstones")
+def compact_tombstones() -> int:
+    from app.db.shards import shard_map
+
+    cutoff = _utc_naive_now() - timedelta(days=settings.TOMBSTONE_RETENTION_DAYS)
+    removed = 0
+    for name in shard_map.engines:
+        with shard_map.session(name) as db:
+            removed += compact(db, cutoff)
+    logger.info("compacted %s tombstone(s) older than %s", removed, cutoff.isoformat())
+    return removed
+
+
+def main(argv: list[str] | None = None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Watchlist change feed maintenance.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("compact", help="delete tombstones older than TOMBSTONE_RETENTION_DAYS on every shard")
+    parser.parse_args(argv)
+
+    print(f"removed {compact_tombstones()} tombstone(s)")
+
+
+if __name__ == "__main__":
+    main()
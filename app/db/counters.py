@@ -0,0 +1,107 @@
+"""
+Denormalized per-user watchlist totals (`users.item_count`, `movie_count`,
+`show_count`).
+
+Write endpoints call `adjust_counts` in the same transaction as the item
+change; the UPDATE increments in SQL so concurrent writers cannot lose
+updates. Drift (e.g. from manual SQL) is reported and repaired with:
+
+    python -m app.db.counters [--repair]
+"""
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.db.models import User, WatchlistItem
+
+COUNTED_TYPES = {"movie": "movie_count", "show": "show_count"}
+
+
+def adjust_counts(db: Session, user_id: int, added: str | None = None, removed: str | None = None) -> None:
+    """
+    Record that an item of type `added` was created and/or an item of type
+    `removed` went away. A type change passes both.
+    """
+    deltas = {"item_count": (added is not None) - (removed is not None)}
+    for media_type, sign in ((added, 1), (removed, -1)):
+        column = COUNTED_TYPES.get(media_type)
+        if column:
+            deltas[column] = deltas.get(column, 0) + sign
+
+    values = {name: getattr(User, name) + delta for name, delta in deltas.items() if delta}
+    if values:
+        db.execute(update(User).where(User.id == user_id).values(**values))
+
+
+def totals(user: User, type: str | None = None) -> dict:
+    """Totals for a list response, read from the already-loaded user row."""
+    by_type = {"movie": user.movie_count, "show": user.show_count}
+    if type is None:
+        total = user.item_count
+    else:
+        total = by_type.get(type)
+    return {"total": total, "totals": {"all": user.item_count, **by_type}}
+
+
+def find_drift(db: Session, item_sessions: list[Session] | None = None) -> list[dict]:
+    """
+    Users whose stored counters disagree with the watchlist_items table(s).
+    `item_sessions` are the shards to count items on (default: `db` only).
+    """
+    actual: dict[int, dict[str, int]] = {}
+    for items_db in item_sessions or [db]:
+        rows = items_db.execute(
+            select(WatchlistItem.user_id, WatchlistItem.media_type, func.count())
+            .where(WatchlistItem.deleted_at.is_(None))
+            .group_by(WatchlistItem.user_id, WatchlistItem.media_type)
+        )
+        for user_id, media_type, count in rows:
+            counts = actual.setdefault(user_id, {"item_count": 0, "movie_count": 0, "show_count": 0})
+            counts["item_count"] += count
+            if media_type in COUNTED_TYPES:
+                counts[COUNTED_TYPES[media_type]] += count
+
+    drift = []
+    users = db.execute(select(User.id, User.item_count, User.movie_count, User.show_count))
+    for user_id, item_count, movie_count, show_count in users:
+        stored = {"item_count": item_count, "movie_count": movie_count, "show_count": show_count}
+        expected = actual.get(user_id, {"item_count": 0, "movie_count": 0, "show_count": 0})
+        if stored != expected:
+            drift.append({"user_id": user_id, "stored": stored, "expected": expected})
+    return drift
+
+
+def repair(db: Session, drift: list[dict]) -> None:
+    for entry in drift:
+        db.execute(update(User).where(User.id == entry["user_id"]).values(**entry["expected"]))
+    db.commit()
+
+
+def main(argv: list[str] | None = None) -> None:
+    import argparse
+    from app.db.shards import MAIN_SHARD, shard_map
+
+    parser = argparse.ArgumentParser(description="Check per-user watchlist counters against the items table.")
+    parser.add_argument("--repair", action="store_true", help="overwrite drifted counters")
+    args = parser.parse_args(argv)
+
+    db = shard_map.session(MAIN_SHARD)
+    shard_sessions = [db] + [shard_map.session(n) for n in shard_map.engines if n != MAIN_SHARD]
+    try:
+        drift = find_drift(db, shard_sessions)
+        for entry in drift:
+            print(f"user_id={entry['user_id']} stored={entry['stored']} expected={entry['expected']}")
+        if not drift:
+            print("counters are consistent")
+        elif args.repair:
+            repair(db, drift)
+            print(f"repaired {len(drift)} user(s)")
+        else:
+            print(f"{len(drift)} user(s) drifted; rerun with --repair to fix")
+            raise SystemExit(1)
+    finally:
+        for s in shard_sessions:
+            s.close()
+
+
+if __name__ == "__main__":
+    main()
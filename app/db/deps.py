@@ -1,8 +1,66 @@
-from app.db.session import SessionLocal
+from contextlib import asynccontextmanager, contextmanager
+from inspect import isasyncgenfunction, signature
 
-def get_db():
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+
+from app.core.security import decode_token
+from app.core.tracing import traced_dependency
+from app.db.session import SessionLocal, is_pinned_to_primary, pin_to_primary
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def client_key(request: Request) -> str:
+    """The user the request acts for (the token's subject), or the client
+    address for anonymous requests, so a pin follows the user across tokens
+    and workers."""
+    claims = getattr(request.state, "token_payload", None)
+    auth = request.headers.get("authorization", "")
+    if claims is None and auth.lower().startswith("bearer "):
+        try:
+            claims = decode_token(auth[7:].strip())
+        except Exception:
+            claims = None
+    if claims and claims.get("sub"):
+        return f"user:{claims['sub'].lower()}"
+    return f"ip:{request.client.host if request.client else ''}"
+
+
+@traced_dependency
+async def get_db(request: Request):
     db = SessionLocal()
+    key = None
+    if db.replicas is not None:
+        key = client_key(request)
+        if request.method in READ_METHODS and not await is_pinned_to_primary(key):
+            db.info["read_only"] = True
+        else:
+            # pinned before the response goes out, so the client's next read
+            # cannot beat the pin to another worker
+            await pin_to_primary(key)
     try:
         yield db
     finally:
         db.close()
+        if key and db.info.get("committed"):
+            # restart the window from the commit
+            await pin_to_primary(key)
+
+
+@asynccontextmanager
+async def db_session(request: Request):
+    """A session from get_db, or from its dependency override, for code that
+    runs outside FastAPI's dependency injection (e.g. middleware)."""
+    provider = request.app.dependency_overrides.get(get_db, get_db)
+    kwargs = {"request": request} if "request" in signature(provider).parameters else {}
+    if isasyncgenfunction(provider):
+        async with asynccontextmanager(provider)(**kwargs) as db:
+            yield db
+    else:
+        manager = contextmanager(provider)(**kwargs)
+        db = await run_in_threadpool(manager.__enter__)
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(manager.__exit__, None, None, None)
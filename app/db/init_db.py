@@ -1,6 +1,7 @@
-from app.db.session import engine, Base
-from app.db import models  # noqa: F401  (important: registers models)
+from app.db.session import engine
+from app.db.migrations import upgrade
 
 
 def init_db() -> None:
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    """Bring the schema up to date. Run once per deploy, not per worker."""
+    upgrade(engine)
@@ -0,0 +1,244 @@
+"""
+Versioned schema migrations.
+
+Schema changes are applied once per deploy with:
+
+    python -m app.db.migrations
+
+instead of every worker calling `Base.metadata.create_all` on startup.
+Each migration runs in its own transaction and is recorded in
+`schema_migrations`, so re-running the command is a no-op.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import Connection, Engine, text
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def migration(version: int, name: str):
+    def register(fn: Callable[[Connection], None]):
+        MIGRATIONS.append(Migration(version=version, name=name, apply=fn))
+        return fn
+    return register
+
+
+def _execute_all(conn: Connection, statements: list[str]) -> None:
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+@migration(1, "initial schema")
+def _initial_schema(conn: Connection) -> None:
+    # IF NOT EXISTS so databases created by the old create_all() startup hook
+    # can be adopted without dropping anything.
+    _execute_all(conn, [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER NOT NULL PRIMARY KEY,
+            email VARCHAR(255) NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            role VARCHAR(50) NOT NULL,
+            created_at DATETIME NOT NULL
+        )
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)",
+        """
+        CREATE TABLE IF NOT EXISTS watchlist_items (
+            id INTEGER NOT NULL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            title VARCHAR(255) NOT NULL,
+            media_type VARCHAR(20) NOT NULL,
+            created_at DATETIME NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_watchlist_items_user_id ON watchlist_items (user_id)",
+    ])
+
+
+@migration(2, "per-user item counters")
+def _user_item_counters(conn: Connection) -> None:
+    _execute_all(conn, [
+        "ALTER TABLE users ADD COLUMN item_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE users ADD COLUMN movie_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE users ADD COLUMN show_count INTEGER NOT NULL DEFAULT 0",
+        """
+        UPDATE users SET
+            item_count = (SELECT COUNT(*) FROM watchlist_items w WHERE w.user_id = users.id),
+            movie_count = (SELECT COUNT(*) FROM watchlist_items w WHERE w.user_id = users.id AND w.media_type = 'movie'),
+            show_count = (SELECT COUNT(*) FROM watchlist_items w WHERE w.user_id = users.id AND w.media_type = 'show')
+        """,
+    ])
+
+
+@migration(3, "watchlist shard assignment")
+def _shard_assignment(conn: Connection) -> None:
+    _execute_all(conn, [
+        "ALTER TABLE users ADD COLUMN shard VARCHAR(64)",
+        "ALTER TABLE users ADD COLUMN shard_moving INTEGER NOT NULL DEFAULT 0",
+        # existing items live in this database, so keep their owners here
+        # until the rebalance tool moves them
+        "UPDATE users SET shard = 'main' WHERE id IN (SELECT DISTINCT user_id FROM watchlist_items)",
+        """
+        CREATE TABLE IF NOT EXISTS id_sequences (
+            name VARCHAR(64) NOT NULL PRIMARY KEY,
+            next_value INTEGER NOT NULL
+        )
+        """,
+    ])
+
+
+@migration(4, "audit events")
+def _audit_events(conn: Connection) -> None:
+    # Each index ends in created_at so a filter plus time range is one index
+    # range scan; SQLite appends the rowid (id), which the keyset cursor uses.
+    _execute_all(conn, [
+        """
+        CREATE TABLE IF NOT EXISTS audit_events (
+            id INTEGER NOT NULL PRIMARY KEY,
+            user_id INTEGER,
+            action VARCHAR(50) NOT NULL,
+            item_id INTEGER,
+            detail TEXT,
+            created_at DATETIME NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_audit_events_user_time ON audit_events (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_audit_events_action_time ON audit_events (action, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_audit_events_time ON audit_events (created_at)",
+    ])
+
+
+@migration(5, "user-defined item order")
+def _item_positions(conn: Connection) -> None:
+    from app.db.positions import spaced_keys
+
+    conn.execute(text("ALTER TABLE watchlist_items ADD COLUMN position VARCHAR(64)"))
+
+    # existing items keep their oldest-first order
+    rows = conn.execute(text("SELECT user_id, id FROM watchlist_items ORDER BY user_id, created_at, id")).all()
+    by_user: dict[int, list[int]] = {}
+    for user_id, item_id in rows:
+        by_user.setdefault(user_id, []).append(item_id)
+    for ids in by_user.values():
+        conn.execute(
+            text("UPDATE watchlist_items SET position = :p WHERE id = :id"),
+            [{"p": key, "id": item_id} for item_id, key in zip(ids, spaced_keys(len(ids)))],
+        )
+
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_watchlist_items_user_position ON watchlist_items (user_id, position)"
+    ))
+
+
+@migration(6, "item change feed")
+def _item_change_feed(conn: Connection) -> None:
+    _execute_all(conn, [
+        # SQLite cannot add a NOT NULL column without a constant default;
+        # the backfill below gives every existing row a real value
+        "ALTER TABLE watchlist_items ADD COLUMN updated_at DATETIME NOT NULL DEFAULT ''",
+        "ALTER TABLE watchlist_items ADD COLUMN deleted_at DATETIME",
+        "UPDATE watchlist_items SET updated_at = created_at",
+        "CREATE INDEX IF NOT EXISTS ix_watchlist_items_user_updated ON watchlist_items (user_id, updated_at)",
+    ])
+
+
+@migration(7, "list sort indexes")
+def _list_sort_indexes(conn: Connection) -> None:
+    # List pages filter on user (and type) and order by created_at; without
+    # these SQLite reads every item of the user and sorts them in a temp
+    # B-tree. ix_watchlist_items_user_id is a prefix of both, so it goes.
+    # benchmarks/query_plans.py checks the plans of all hot queries.
+    _execute_all(conn, [
+        "CREATE INDEX IF NOT EXISTS ix_watchlist_items_user_created ON watchlist_items (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_watchlist_items_user_type_created"
+        " ON watchlist_items (user_id, media_type, created_at)",
+        "DROP INDEX IF EXISTS ix_watchlist_items_user_id",
+    ])
+
+
+def _ensure_version_table(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER NOT NULL PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at DATETIME NOT NULL
+            )
+            """
+        ))
+
+
+def current_version(engine: Engine) -> int:
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        version = conn.execute(text("SELECT MAX(version) FROM schema_migrations")).scalar()
+    return version or 0
+
+
+def upgrade(engine: Engine, target: int | None = None) -> list[int]:
+    """
+    Apply every pending migration up to `target` (default: latest).
+    Returns the versions that were applied.
+    """
+    _ensure_version_table(engine)
+    applied = []
+
+    for m in sorted(MIGRATIONS, key=lambda m: m.version):
+        if target is not None and m.version > target:
+            break
+
+        with engine.begin() as conn:
+            done = conn.execute(
+                text("SELECT 1 FROM schema_migrations WHERE version = :v"),
+                {"v": m.version},
+            ).first()
+            if done:
+                continue
+
+            m.apply(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": m.version, "n": m.name, "t": datetime.now(timezone.utc)},
+            )
+        applied.append(m.version)
+
+    return applied
+
+
+def main(argv: list[str] | None = None) -> None:
+    import argparse
+    from app.db.shards import shard_map
+
+    parser = argparse.ArgumentParser(description="Apply database schema migrations.")
+    parser.add_argument("--target", type=int, default=None, help="stop at this version")
+    parser.add_argument("--status", action="store_true", help="print the current version and exit")
+    args = parser.parse_args(argv)
+
+    # every shard gets the same schema so items can move between them
+    for name, engine in shard_map.engines.items():
+        if args.status:
+            print(f"[{name}] schema version: {current_version(engine)}")
+            continue
+
+        applied = upgrade(engine, target=args.target)
+        if applied:
+            print(f"[{name}] applied migrations: {', '.join(str(v) for v in applied)}")
+        else:
+            print(f"[{name}] schema is up to date")
+        print(f"[{name}] schema version: {current_version(engine)}")
+
+
+if __name__ == "__main__":
+    main()
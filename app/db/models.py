@@ -1,10 +1,32 @@
 from datetime import datetime, timezone
-from sqlalchemy import String, DateTime, ForeignKey
+from sqlalchemy import Boolean, String, DateTime, ForeignKey, Integer, Text
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.sql.functions import FunctionElement
 
 from app.db.session import Base
 
 
+class utcnow(FunctionElement):
+    """
+    Current UTC time evaluated by the database inside the write statement,
+    i.e. while SQLite holds the write lock, so stamps follow commit order.
+    """
+    type = DateTime(timezone=True)
+    inherit_cache = True
+
+
+@compiles(utcnow, "sqlite")
+def _sqlite_utcnow(element, compiler, **kw):
+    # same text format SQLAlchemy writes for Python datetimes (microseconds)
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -13,6 +35,16 @@ class User(Base):
     password_hash: Mapped[str] = mapped_column(String(255), nullable=False)
     role: Mapped[str] = mapped_column(String(50), default="user", nullable=False)
 
+    # denormalized watchlist totals, maintained by app/db/counters.py
+    item_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    movie_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    show_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+
+    # shard holding this user's watchlist items (None = decided by the hash
+    # ring on first write); see app/db/shards.py
+    shard: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    shard_moving: Mapped[bool] = mapped_column(Boolean, default=False, server_default="0", nullable=False)
+
     created_at: Mapped[datetime] = mapped_column(
     DateTime(timezone=True),
     default=lambda: datetime.now(timezone.utc),
@@ -30,15 +62,42 @@ class WatchlistItem(Base):
     __tablename__ = "watchlist_items"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True, nullable=False)
+    # indexed together with the sort columns, see migrations 5-7
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
 
     title: Mapped[str] = mapped_column(String(255), nullable=False)
     media_type: Mapped[str] = mapped_column(String(20), default="movie", nullable=False)  # "movie" or "show"
+    # fractional rank key for the user's manual order (app/db/positions.py)
+    position: Mapped[str | None] = mapped_column(String(64), nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         default=lambda: datetime.now(timezone.utc),
         nullable=False,
     )
+    # change feed (app/db/changes.py): bumped on every write, and deleted
+    # items stay as tombstones until compacted
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=utcnow(),
+        onupdate=utcnow(),
+        nullable=False,
+    )
+    deleted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    user: Mapped["User"] = relationship(back_populates="items")
+
+class AuditEvent(Base):
+    __tablename__ = "audit_events"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    action: Mapped[str] = mapped_column(String(50), nullable=False)
+    item_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    detail: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON object
 
-    user: Mapped["User"] = relationship(back_populates="items")
\ No newline at end of file
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
@@ -0,0 +1,136 @@
+"""
+User-defined watchlist order with fractional (lexicographic) rank keys.
+
+`watchlist_items.position` is a base-62 string compared byte-wise. Between
+any two keys there is always another one (keys never end in the smallest
+digit), so moving an item rewrites only that item's row. Inserting
+repeatedly at the same spot makes keys longer. Once a key exceeds
+POSITION_MAX_KEY_LENGTH the `watchlist.rebalance_positions` job rewrites
+the user's keys to short, evenly spaced ones.
+
+Appending, the most common write, does not halve the remaining space each
+time: it counts up instead. A key's leading "z"s plus the next two digits
+are its integer part, which is incremented and the fraction dropped, so a
+key gains one character per ~3800 appends (1000 appends from an empty list
+stay within 2 characters).
+"""
+import logging
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.jobs import job
+from app.db.models import WatchlistItem
+
+logger = logging.getLogger("app.positions")
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+_INDEX = {d: i for i, d in enumerate(DIGITS)}
+
+
+def _midpoint(a: str, b: str | None) -> str:
+    # a == "" means "before everything", b is None means "after everything"
+    if b is not None:
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else "0") == b[n]:
+            n += 1
+        if n:
+            return b[:n] + _midpoint(a[n:], b[n:])
+
+    lo = _INDEX[a[0]] if a else 0
+    hi = _INDEX[b[0]] if b is not None else BASE
+    if hi - lo > 1:
+        return DIGITS[(lo + hi + 1) // 2]
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return DIGITS[lo] + _midpoint(a[1:], None)
+
+
+def _after(a: str) -> str:
+    # the digit after the leading "z"s is never "z" itself, so the carry
+    # stops there at the latest; "...y" + carry becomes the next "z" level
+    width = len(a) - len(a.lstrip("z")) + 2
+    digits = [_INDEX[d] for d in a[:width].ljust(width, "0")]
+    i = width - 1
+    while digits[i] == BASE - 1:
+        digits[i] = 0
+        i -= 1
+    digits[i] += 1
+    return "".join(DIGITS[d] for d in digits).rstrip("0")
+
+
+def key_between(a: str | None, b: str | None) -> str:
+    """A key strictly between `a` and `b` (either may be None for an open end)."""
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"{a!r} is not before {b!r}")
+    if a and b is None:
+        return _after(a)
+    return _midpoint(a or "", b)
+
+
+def spaced_keys(count: int) -> list[str]:
+    """`count` ascending keys of equal, minimal length with room around each."""
+    length = 1
+    while BASE ** length < 2 * (count + 1):
+        length += 1
+    span = BASE ** length
+    keys = []
+    for i in range(1, count + 1):
+        value = i * span // (count + 1)
+        digits = []
+        for _ in range(length):
+            value, d = divmod(value, BASE)
+            digits.append(DIGITS[d])
+        key = "".join(reversed(digits)).rstrip("0")
+        keys.append(key)
+    return keys
+
+
+def last_position(db: Session, user_id: int) -> str | None:
+    return db.scalar(
+        select(func.max(WatchlistItem.position))
+        .where(WatchlistItem.user_id == user_id, WatchlistItem.deleted_at.is_(None))
+    )
+
+
+def neighbour_position(db: Session, user_id: int, anchor: str, after: bool, exclude_id: int) -> str | None:
+    """The next key after (or before) `anchor` in the user's list, ignoring `exclude_id`."""
+    column = WatchlistItem.position
+    stmt = select(column).where(
+        WatchlistItem.user_id == user_id, WatchlistItem.id != exclude_id, WatchlistItem.deleted_at.is_(None)
+    )
+    if after:
+        stmt = stmt.where(column > anchor).order_by(column.asc())
+    else:
+        stmt = stmt.where(column < anchor).order_by(column.desc())
+    return db.scalar(stmt.limit(1))
+
+
+def rebalance(db: Session, user_id: int) -> int:
+    """Rewrite a user's keys in their current order. Returns rows updated."""
+    ids = db.scalars(
+        select(WatchlistItem.id)
+        .where(WatchlistItem.user_id == user_id, WatchlistItem.deleted_at.is_(None))
+        .order_by(WatchlistItem.position, WatchlistItem.id)
+    ).all()
+    for item_id, key in zip(ids, spaced_keys(len(ids))):
+        db.execute(update(WatchlistItem).where(WatchlistItem.id == item_id).values(position=key))
+    return len(ids)
+
+
+@job("watchlist.rebalance_positions")
+def rebalance_positions(user_id: int) -> None:
+    from app.db.models import User
+    from app.db.shards import MAIN_SHARD, shard_map
+
+    with shard_map.session(MAIN_SHARD) as main:
+        user = main.get(User, user_id)
+        if user is None:
+            return
+        shard = shard_map.shard_for(user)
+
+    with shard_map.session(shard) as db:
+        count = rebalance(db, user_id)
+        db.commit()
+    logger.info("rebalanced %s position key(s) for user_id=%s", count, user_id)
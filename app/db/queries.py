@@ -0,0 +1,128 @@
+"""
+Column-only read queries for watchlist list endpoints.
+
+These select just the requested columns with Core and return plain row
+tuples, skipping ORM instances, the identity map and attribute
+instrumentation. Rows are converted straight into the positional lists
+the cache and responses use. Writes still go through the ORM.
+
+`page_from_snapshot` answers the same list queries from a user's cached
+full list (CACHE_MODE=snapshot) without touching the database.
+
+See benchmarks/list_read_path.py for the CPU and memory difference.
+"""
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.models import WatchlistItem
+
+# API field name -> column, in default output order
+ITEM_FIELDS = {
+    "id": WatchlistItem.id,
+    "title": WatchlistItem.title,
+    "type": WatchlistItem.media_type,
+    "created_at": WatchlistItem.created_at,
+    "position": WatchlistItem.position,
+}
+
+SORTS = {
+    "created_at_desc": (WatchlistItem.created_at.desc(),),
+    "created_at_asc": (WatchlistItem.created_at.asc(),),
+    # served by ix_watchlist_items_user_position; id breaks ties
+    "position": (WatchlistItem.position.asc(), WatchlistItem.id.asc()),
+}
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _converters(fields: list[str]) -> list:
+    return [_isoformat if name == "created_at" else None for name in fields]
+
+
+def _to_lists(rows, converters: list) -> list[list]:
+    if not any(converters):
+        return [list(r) for r in rows]
+    return [[c(v) if c else v for c, v in zip(converters, r)] for r in rows]
+
+
+def list_item_rows(
+    db: Session,
+    user_id: int,
+    fields: list[str],
+    type: str | None,
+    sort: str,
+    skip: int,
+    limit: int | None,
+) -> list[list]:
+    """One page of a user's items as positional rows in `fields` order (limit None: all)."""
+    order = SORTS.get(sort, SORTS["created_at_desc"])
+    stmt = select(*(ITEM_FIELDS[f] for f in fields)).where(
+        WatchlistItem.user_id == user_id, WatchlistItem.deleted_at.is_(None)
+    )
+    if type:
+        stmt = stmt.where(WatchlistItem.media_type == type)
+    stmt = stmt.order_by(*order).offset(skip).limit(limit)
+
+    return _to_lists(db.execute(stmt), _converters(fields))
+
+
+def get_item_rows(db: Session, user_id: int, ids: list[int], fields: list[str]) -> list[list]:
+    """`[id, row]` pairs for the user's items among `ids` (missing ids are skipped)."""
+    # "+ 0" keeps user_id out of index selection: with ANALYZE stats SQLite
+    # would otherwise walk a user index over the whole list (very slow for
+    # large lists) instead of doing one primary key lookup per id
+    stmt = select(WatchlistItem.id, *(ITEM_FIELDS[f] for f in fields)).where(
+        WatchlistItem.id.in_(ids), WatchlistItem.user_id + 0 == user_id, WatchlistItem.deleted_at.is_(None)
+    )
+    rows = db.execute(stmt).all()
+    values = _to_lists((r[1:] for r in rows), _converters(fields))
+    return [[r[0], v] for r, v in zip(rows, values)]
+
+
+SNAPSHOT_FIELDS = list(ITEM_FIELDS)
+_COLUMN = {name: i for i, name in enumerate(SNAPSHOT_FIELDS)}
+
+
+def snapshot_rows(db: Session, user_id: int, max_items: int) -> list[list] | None:
+    """All of a user's items in SNAPSHOT_FIELDS order, newest first, or None
+    if there are more than `max_items`."""
+    rows = list_item_rows(db, user_id, SNAPSHOT_FIELDS, None, "created_at_desc", 0, max_items + 1)
+    return rows if len(rows) <= max_items else None
+
+
+def page_from_snapshot(
+    snapshot: list[list],
+    fields: list[str],
+    type: str | None,
+    sort: str,
+    skip: int,
+    limit: int,
+) -> list[list]:
+    """The page `list_item_rows` would return, cut from a `snapshot_rows` list."""
+    rows = snapshot
+    if type:
+        col = _COLUMN["type"]
+        rows = [r for r in rows if r[col] == type]
+
+    if sort == "created_at_asc":
+        rows = rows[::-1]
+    elif sort == "position":
+        pos, id_ = _COLUMN["position"], _COLUMN["id"]
+        # NULL keys first, as SQLite orders them
+        rows = sorted(rows, key=lambda r: (r[pos] is not None, r[pos] or "", r[id_]))
+    # anything else is created_at_desc, the snapshot's own order
+
+    skip = max(skip, 0)
+    rows = rows[skip:] if limit < 0 else rows[skip:skip + limit]
+    cols = [_COLUMN[f] for f in fields]
+    return [[r[c] for c in cols] for r in rows]
+
+
+def snapshot_items(snapshot: list[list], ids: list[int], fields: list[str]) -> list[list]:
+    """`[id, row]` pairs among `ids`, like `get_item_rows`, from a snapshot."""
+    wanted = set(ids)
+    id_ = _COLUMN["id"]
+    cols = [_COLUMN[f] for f in fields]
+    return [[r[id_], [r[c] for c in cols]] for r in snapshot if r[id_] in wanted]
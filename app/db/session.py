@@ -1,19 +1,141 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import itertools
+import time
+
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
 
 from app.core.config import settings
+from app.core.redis_client import get_redis
 
 
 class Base(DeclarativeBase):
     pass
 
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {},
-)
+def make_engine(url: str) -> Engine:
+    return create_engine(
+        url,
+        connect_args={"check_same_thread": False} if url.startswith("sqlite") else {},
+    )
+
+
+class ReplicaPool:
+    """
+    Round-robin over read replicas. A replica that raises a connection or
+    operational error is skipped for `eject_seconds`.
+    """
+
+    def __init__(self, engines: list[Engine], eject_seconds: float):
+        self.engines = engines
+        self.eject_seconds = eject_seconds
+        self._ejected_until: dict[Engine, float] = {}
+        self._counter = itertools.count()
+
+        for e in engines:
+            event.listen(e, "handle_error", self._on_error)
+
+    def _on_error(self, ctx) -> None:
+        if ctx.is_disconnect or isinstance(ctx.sqlalchemy_exception, OperationalError):
+            self.eject(ctx.engine)
+
+    def eject(self, engine: Engine) -> None:
+        self._ejected_until[engine] = time.monotonic() + self.eject_seconds
+
+    def healthy(self) -> list[Engine]:
+        now = time.monotonic()
+        return [e for e in self.engines if self._ejected_until.get(e, 0) <= now]
+
+    def pick(self) -> Engine | None:
+        n = len(self.engines)
+        now = time.monotonic()
+        for _ in range(n):
+            candidate = self.engines[next(self._counter) % n]
+            if self._ejected_until.get(candidate, 0) <= now:
+                return candidate
+        return None
+
+
+class RoutingSession(Session):
+    """
+    Sends reads to a replica when `info["read_only"]` is set, and everything
+    else (flushes, DML, sessions not marked read-only) to the primary. One
+    replica is pinned per session so a request sees a consistent snapshot.
+    """
+
+    def __init__(self, *args, replicas: ReplicaPool | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+        self._replica: Engine | None = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if not self.replicas or not self.info.get("read_only"):
+            return primary
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        if self._flushing or (clause is not None and getattr(clause, "is_dml", False)):
+            # a "read-only" request that writes stays on the primary from here on
+            self.info["read_only"] = False
+            return primary
 
+        if self._replica is None or self._replica not in self.replicas.healthy():
+            self._replica = self.replicas.pick()
+        return self._replica or primary
 
 
+# Read-your-writes: after a user commits, their reads stay on the primary
+# for READ_YOUR_WRITES_SECONDS so replica lag cannot hide the write. The pin
+# is a Redis key per user (see app/db/deps.py), so it holds whichever worker
+# serves the next read; while Redis is down it is kept per process instead.
+STICKY_PREFIX = "sticky:"
+_sticky_until: dict[str, float] = {}
+
+
+def _pin_locally(key: str) -> None:
+    now = time.monotonic()
+    if len(_sticky_until) > 10_000:
+        for k, until in list(_sticky_until.items()):
+            if until <= now:
+                del _sticky_until[k]
+    _sticky_until[key] = now + settings.READ_YOUR_WRITES_SECONDS
+
+
+async def pin_to_primary(key: str) -> None:
+    try:
+        await get_redis().set(
+            f"{STICKY_PREFIX}{key}", 1, px=max(1, int(settings.READ_YOUR_WRITES_SECONDS * 1000))
+        )
+    except Exception:
+        _pin_locally(key)
+
+
+async def is_pinned_to_primary(key: str) -> bool:
+    if _sticky_until.get(key, 0) > time.monotonic():
+        return True
+    try:
+        return bool(await get_redis().exists(f"{STICKY_PREFIX}{key}"))
+    except Exception:
+        return False
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _remember_writer(session: Session) -> None:
+    # pinned by get_db once the request is done; this event may run in a worker thread
+    if session.replicas:
+        session.info["committed"] = True
+
+
+engine = make_engine(settings.DATABASE_URL)
+
+replica_pool = ReplicaPool(
+    [make_engine(url) for url in settings.replica_urls],
+    eject_seconds=settings.REPLICA_EJECT_SECONDS,
+)
+
+SessionLocal = sessionmaker(
+    class_=RoutingSession,
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+    replicas=replica_pool if replica_pool.engines else None,
+)
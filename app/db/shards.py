@@ -0,0 +1,280 @@
+"""
+Horizontal sharding of watchlist items by user.
+
+The `users` table (and everything else) stays on the main database
+(DATABASE_URL). Watchlist items live on one of the DATABASE_SHARDS, chosen
+per user:
+
+- `users.shard` records where a user's items are. It is set on the user's
+  first write from a consistent-hash ring, so adding a shard later does not
+  silently re-route existing users; they move when the rebalance tool says so.
+- With no shards configured the only shard is "main" and item sessions are
+  the request's own session, so nothing changes for single-database setups.
+  List "main" (without a URL) in DATABASE_SHARDS to keep it in the ring.
+- While sharded, item ids come from a block allocator on the main database
+  so they stay unique across shards and survive a move unchanged.
+
+Moving users between shards (online: reads keep working, writes for the
+user being moved get a 503 with Retry-After for the few seconds it takes):
+
+    python -m app.db.shards where USER_ID
+    python -m app.db.shards move USER_ID SHARD
+    python -m app.db.shards rebalance [--dry-run]
+"""
+import bisect
+import hashlib
+import threading
+import time
+
+from sqlalchemy import Engine, delete, insert, select, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.core.exceptions import ServiceUnavailableError
+from app.db.models import User, WatchlistItem
+from app.db.session import engine as main_engine, make_engine
+
+MAIN_SHARD = "main"
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing with virtual nodes: adding a shard moves ~1/N of users."""
+
+    def __init__(self, names: list[str], vnodes: int):
+        points = sorted((_hash(f"{name}#{i}"), name) for name in names for i in range(vnodes))
+        self._keys = [p for p, _ in points]
+        self._names = [n for _, n in points]
+
+    def lookup(self, user_id: int) -> str:
+        i = bisect.bisect(self._keys, _hash(str(user_id))) % len(self._keys)
+        return self._names[i]
+
+
+class IdAllocator:
+    """
+    Hands out watchlist item ids in blocks reserved from `id_sequences` on the
+    main database, so the main database sees one UPDATE per `block` inserts.
+    """
+
+    def __init__(self, engine: Engine, name: str, block: int):
+        self.engine = engine
+        self.name = name
+        self.block = block
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def next_id(self) -> int:
+        with self._lock:
+            if self._next >= self._end:
+                self._next = self._reserve()
+                self._end = self._next + self.block
+            value = self._next
+            self._next += 1
+            return value
+
+    def reset(self) -> None:
+        # after fork: a block inherited from the parent must not be reused
+        with self._lock:
+            self._next = self._end = 0
+
+    def _reserve(self) -> int:
+        with self.engine.begin() as conn:
+            # seeded above the ids the main database already handed out
+            # ("WHERE true" keeps SQLite from parsing ON CONFLICT as a join)
+            conn.execute(
+                text(
+                    "INSERT INTO id_sequences (name, next_value) "
+                    "SELECT :name, COALESCE(MAX(id), 0) + 1 FROM watchlist_items WHERE true "
+                    "ON CONFLICT (name) DO NOTHING"
+                ),
+                {"name": self.name},
+            )
+            return conn.execute(
+                text(
+                    "UPDATE id_sequences SET next_value = next_value + :block "
+                    "WHERE name = :name RETURNING next_value - :block"
+                ),
+                {"name": self.name, "block": self.block},
+            ).scalar_one()
+
+
+class ShardMap:
+    def __init__(self, main: Engine, shards: dict[str, Engine], vnodes: int, id_block: int):
+        self.enabled = bool(shards)
+        self.engines = {MAIN_SHARD: main, **shards}
+        self.ring = HashRing(list(shards) or [MAIN_SHARD], vnodes)
+        self.ids = IdAllocator(main, "watchlist_items", id_block)
+        self._sessions = {
+            name: sessionmaker(bind=e, autocommit=False, autoflush=False) for name, e in self.engines.items()
+        }
+
+    def placement(self, user_id: int) -> str:
+        """Where the ring puts this user (new users, and rebalance targets)."""
+        return self.ring.lookup(user_id)
+
+    def shard_for(self, user: User) -> str:
+        return user.shard or self.placement(user.id)
+
+    def session(self, name: str) -> Session:
+        if name not in self._sessions:
+            raise KeyError(f"unknown shard {name!r}")
+        return self._sessions[name]()
+
+    def dispose(self) -> None:
+        for e in self.engines.values():
+            e.dispose(close=False)
+        self.ids.reset()
+
+
+def build_shard_map() -> ShardMap:
+    shards = {
+        name: main_engine if name == MAIN_SHARD else make_engine(url)
+        for name, url in settings.shard_urls.items()
+    }
+    return ShardMap(main_engine, shards, vnodes=settings.SHARD_VNODES, id_block=settings.SHARD_ID_BLOCK)
+
+
+shard_map = build_shard_map()
+
+
+def prepare_item_write(user: User, item: WatchlistItem | None = None) -> None:
+    """
+    Call before changing a user's items: rejects writes while the user is
+    being moved, pins the user to their shard on first write, and gives a new
+    item a cluster-wide id when sharding is on.
+    """
+    if user.shard_moving:
+        raise ServiceUnavailableError("Watchlist is being moved between databases, retry shortly", retry_after=2)
+    if user.shard is None:
+        user.shard = shard_map.shard_for(user)
+    if item is not None and item.id is None and shard_map.enabled:
+        item.id = shard_map.ids.next_id()
+
+
+def commit_write(items_db: Session, db: Session) -> None:
+    # items first: if the main commit (counters) then fails, the counter
+    # check in app/db/counters.py finds and repairs the drift
+    if items_db is not db:
+        items_db.commit()
+    db.commit()
+
+
+def move_user(shards: ShardMap, user_id: int, target: str, grace: float = 2.0, batch: int = 500) -> int:
+    """
+    Copy a user's items to `target`, switch `users.shard`, then delete them
+    from the source. Re-running after a crash is safe. Returns rows moved.
+    """
+    if target not in shards.engines:
+        raise KeyError(f"unknown shard {target!r}")
+
+    main = shards.session(MAIN_SHARD)
+    try:
+        user = main.get(User, user_id)
+        if user is None:
+            raise KeyError(f"unknown user {user_id}")
+        source = shards.shard_for(user)
+        if source == target:
+            return 0
+
+        user.shard_moving = True
+        main.commit()
+        try:
+            # let writes that loaded the user before the flag was set finish
+            time.sleep(grace)
+            moved = _copy_items(shards, user_id, source, target, batch)
+
+            user.shard = target
+            user.shard_moving = False
+            main.commit()
+        except BaseException:
+            main.rollback()
+            user.shard_moving = False
+            main.commit()
+            raise
+
+        with shards.session(source) as src:
+            src.execute(delete(WatchlistItem).where(WatchlistItem.user_id == user_id))
+            src.commit()
+        return moved
+    finally:
+        main.close()
+
+
+def _copy_items(shards: ShardMap, user_id: int, source: str, target: str, batch: int) -> int:
+    table = WatchlistItem.__table__
+    moved = 0
+    with shards.session(source) as src, shards.session(target) as dst:
+        # leftovers from an interrupted move
+        dst.execute(delete(table).where(table.c.user_id == user_id))
+
+        last_id = 0
+        while True:
+            rows = src.execute(
+                select(table)
+                .where(table.c.user_id == user_id, table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch)
+            ).mappings().all()
+            if not rows:
+                break
+            dst.execute(insert(table), [dict(r) for r in rows])
+            last_id = rows[-1]["id"]
+            moved += len(rows)
+        dst.commit()
+    return moved
+
+
+def misplaced_users(shards: ShardMap) -> list[tuple[int, str, str]]:
+    """(user_id, current shard, ring placement) for users the ring wants elsewhere."""
+    with shards.session(MAIN_SHARD) as main:
+        rows = main.execute(select(User.id, User.shard).where(User.shard.is_not(None))).all()
+    return [(uid, shard, shards.placement(uid)) for uid, shard in rows if shard != shards.placement(uid)]
+
+
+def main(argv: list[str] | None = None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect and move users between watchlist shards.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    where = sub.add_parser("where", help="print the shard holding a user's items")
+    where.add_argument("user_id", type=int)
+    move = sub.add_parser("move", help="move one user's items to a shard")
+    move.add_argument("user_id", type=int)
+    move.add_argument("shard")
+    rebalance = sub.add_parser("rebalance", help="move every user the hash ring places elsewhere")
+    rebalance.add_argument("--dry-run", action="store_true")
+    for p in (move, rebalance):
+        p.add_argument("--grace", type=float, default=2.0, help="seconds to wait for in-flight writes")
+    args = parser.parse_args(argv)
+
+    if args.command == "where":
+        with shard_map.session(MAIN_SHARD) as db:
+            user = db.get(User, args.user_id)
+            if user is None:
+                raise SystemExit(f"unknown user {args.user_id}")
+            print(f"user_id={user.id} shard={shard_map.shard_for(user)} ring={shard_map.placement(user.id)}")
+        return
+
+    if args.command == "move":
+        moved = move_user(shard_map, args.user_id, args.shard, grace=args.grace)
+        print(f"moved {moved} item(s) for user_id={args.user_id} to {args.shard}")
+        return
+
+    todo = misplaced_users(shard_map)
+    for user_id, current, target in todo:
+        if args.dry_run:
+            print(f"user_id={user_id} {current} -> {target}")
+            continue
+        moved = move_user(shard_map, user_id, target, grace=args.grace)
+        print(f"user_id={user_id} {current} -> {target}: {moved} item(s)")
+    if not todo:
+        print("every user is on its ring shard")
+
+
+if __name__ == "__main__":
+    main()
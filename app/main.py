@@ -1,15 +1,47 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware  
 
 from app.api.v1.router import api_router
 from app.core.middleware import RequestIDMiddleware
+from app.core.access_log import AccessLogMiddleware, access_log, parse_sample_rates
+from app.core.concurrency import ConcurrencyLimitMiddleware, limiter
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.core.tracing import TracingMiddleware, trace_exporter
 from app.core.exceptions import AppError, NotFoundError
-from app.db.init_db import init_db
+from app.core.http_client import close_http_client
+from app.core.config import settings
+from app.core.events import close_broker
+from app.core.redis_client import close_redis
+from app.core.revocation import sync_forever
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema changes are applied once per deploy by `python -m app.db.migrations`,
+    # and Redis/HTTP clients are created on first use, so startup stays cheap.
+    if settings.ACCESS_LOG_ENABLED:
+        access_log.start()
+    if settings.TRACE_ENABLED:
+        trace_exporter.start()
+    revocation_sync = asyncio.create_task(sync_forever(settings.REVOCATION_SYNC_SECONDS))
+    yield
+    revocation_sync.cancel()
+    with suppress(asyncio.CancelledError):
+        await revocation_sync
+    await close_broker()
+    await close_http_client()
+    await close_redis()
+    trace_exporter.stop()
+    access_log.stop()
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Watchlist API", version="1.0.0")
+    app = FastAPI(title="Watchlist API", version="1.0.0", lifespan=lifespan)
 
     # CORS (safe default for local dev + Streamlit)
     origins = [
@@ -27,11 +59,34 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # retried writes with the same Idempotency-Key get the first response back
+    app.add_middleware(IdempotencyMiddleware, path_prefixes=("/v1/watchlists", "/v1/batch"))
+    if settings.PROFILE_SAMPLE_RATE > 0 or settings.PROFILE_ALLOW_HEADER:
+        app.add_middleware(
+            ProfilingMiddleware,
+            sample_rate=settings.PROFILE_SAMPLE_RATE,
+            allow_header=settings.PROFILE_ALLOW_HEADER,
+            interval_ms=settings.PROFILE_INTERVAL_MS,
+        )
     app.add_middleware(RequestIDMiddleware)
-
-    @app.on_event("startup")
-    def on_startup():
-        init_db()
+    if settings.CONCURRENCY_LIMIT_ENABLED:
+        # outermost: shed excess load before any other work is done
+        app.add_middleware(ConcurrencyLimitMiddleware, limiter=limiter)
+    if settings.TRACE_ENABLED:
+        # the root span includes time queued in the limiter
+        app.add_middleware(
+            TracingMiddleware,
+            sample_rate=settings.TRACE_SAMPLE_RATE,
+            slow_ms=settings.TRACE_SLOW_MS,
+            max_spans=settings.TRACE_MAX_SPANS,
+        )
+    if settings.ACCESS_LOG_ENABLED:
+        # outside the limiter too, so shed requests (503) are logged
+        app.add_middleware(
+            AccessLogMiddleware,
+            sample_rates=parse_sample_rates(settings.ACCESS_LOG_SAMPLE_RATES),
+            slow_ms=settings.ACCESS_LOG_SLOW_MS,
+        )
 
     @app.exception_handler(AppError)
     async def app_error_handler(request: Request, exc: AppError):
@@ -45,6 +100,7 @@ def create_app() -> FastAPI:
                     "request_id": request_id,
                 }
             },
+            headers=exc.headers,
         )
 
     app.include_router(api_router, prefix="/v1")
@@ -0,0 +1,180 @@
+"""
+Pre-forking server launcher.
+
+    python -m app.server --workers 4
+
+The app is imported once in the parent (so workers share its memory
+copy-on-write), the listening socket is bound once, and N uvicorn workers
+are forked onto it. Each worker drops the DB pool and Redis/HTTP clients it
+inherited and creates its own on first use.
+
+SIGTERM/SIGINT stop the parent from respawning, are forwarded to every
+worker (uvicorn stops accepting and drains in-flight requests), and workers
+still alive after GRACEFUL_TIMEOUT seconds are killed.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.server")
+
+
+def worker_count(configured: int | None = None) -> int:
+    configured = configured if configured is not None else settings.WEB_CONCURRENCY
+    if configured and configured > 0:
+        return configured
+    return os.cpu_count() or 1
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def reset_after_fork() -> None:
+    """Drop connections inherited from the parent; they must not be shared."""
+    from app.core.http_client import reset_http_client
+    from app.core.jobs import reset_queue
+    from app.core.redis_client import reset_redis
+    from app.db.session import replica_pool
+    from app.db.shards import shard_map
+
+    shard_map.dispose()  # main + shard engines, and the item id block
+    for replica in replica_pool.engines:
+        replica.dispose(close=False)
+    reset_redis()
+    reset_http_client()
+    reset_queue()
+
+
+def run_worker(app, sock: socket.socket, graceful_timeout: int) -> None:
+    import uvicorn
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    reset_after_fork()
+
+    config = uvicorn.Config(
+        app,
+        lifespan="on",
+        timeout_graceful_shutdown=graceful_timeout,
+        log_level="info",
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Arbiter:
+    POLL_INTERVAL = 0.1  # seconds between checks for exited workers
+
+    def __init__(self, app, sock: socket.socket, workers: int, graceful_timeout: int):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.children: set[int] = set()
+        self.stopping = False
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.app, self.sock, self.graceful_timeout)
+            except BaseException:
+                logger.exception("worker crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children.add(pid)
+        logger.info("started worker pid=%s", pid)
+
+    def handle_stop(self, signum, frame) -> None:
+        if not self.stopping:
+            logger.info("received %s, draining workers", signal.Signals(signum).name)
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.children.discard(pid)
+
+    def reap(self) -> None:
+        # never blocks: a blocking waitpid is restarted after the signal
+        # handler runs, so a stuck worker would keep the parent from ever
+        # reaching the kill deadline
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            self.children.discard(pid)
+            if not self.stopping:
+                logger.warning("worker pid=%s exited with status %s, respawning", pid, status)
+                self.spawn()
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+
+        for _ in range(self.workers):
+            self.spawn()
+
+        while not self.stopping:
+            self.reap()
+            time.sleep(self.POLL_INTERVAL)
+
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(self.POLL_INTERVAL)
+
+        for pid in list(self.children):
+            logger.warning("worker pid=%s did not drain in time, killing", pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            # SIGKILL cannot be ignored, so this wait is bounded
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+            self.children.discard(pid)
+        self.sock.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the API with one worker per CPU.")
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument("--workers", type=int, default=None, help="default: WEB_CONCURRENCY or CPU count")
+    parser.add_argument("--graceful-timeout", type=int, default=settings.GRACEFUL_TIMEOUT)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    # preload: import the app (and everything it pulls in) before forking
+    from app.main import app
+
+    sock = bind_socket(args.host, args.port)
+    workers = worker_count(args.workers)
+    logger.info("listening on %s:%s with %s workers", args.host, args.port, workers)
+
+    Arbiter(app, sock, workers, args.graceful_timeout).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Background job worker.
+
+    python -m app.worker
+
+Consumes the Redis jobs stream (see app/core/jobs.py) until SIGTERM/SIGINT,
+finishing the job in hand before exiting. Run as many as needed; they share
+the work through the consumer group.
+"""
+import argparse
+import asyncio
+import importlib
+import logging
+import signal
+
+from app.core.jobs import JOBS, default_consumer_name, redis_queue
+
+logger = logging.getLogger("app.worker")
+
+# modules that register @job handlers
+JOB_MODULES = (
+    "app.core.audit",
+    "app.core.cache",
+    "app.db.changes",
+    "app.db.positions",
+)
+
+
+def load_handlers() -> None:
+    for module in JOB_MODULES:
+        importlib.import_module(module)
+
+
+async def run(consumer: str) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    queue = redis_queue()
+    logger.info("worker %s consuming %s (jobs: %s)", consumer, queue.stream, ", ".join(sorted(JOBS)))
+
+    while not stop.is_set():
+        try:
+            await queue.work(consumer, stop)
+        except Exception:
+            logger.exception("worker loop failed, retrying")
+            await asyncio.sleep(1)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the background job worker.")
+    parser.add_argument("--consumer", default=None, help="consumer name (default: host-pid)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    load_handlers()
+    asyncio.run(run(args.consumer or default_consumer_name()))
+
+
+if __name__ == "__main__":
+    main()
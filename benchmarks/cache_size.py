@@ -0,0 +1,93 @@
+"""
+Bytes per cache entry for watchlist pages: the original pretty-keyed JSON
+format versus the compact codecs in app/core/cache.py.
+
+    python -m benchmarks.cache_size --users 200 --items 120
+
+Every user gets a realistic watchlist and every (skip, limit, type, sort)
+page a client would request is encoded in each format. Key bytes are
+included, since Redis stores both.
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+from app.core.cache import CacheSerializer, cache_key
+
+WORDS = (
+    "the a of night last star dark house game lost city return king blood "
+    "river storm silent shadow empire secret winter fire girl man world war "
+    "love story road home glass moon summer black white red island"
+).split()
+
+PAGE_SIZES = (10, 25, 50)
+TYPES = (None, "movie", "show")
+SORTS = ("created_at_desc", "created_at_asc")
+
+
+def make_items(rng: random.Random, count: int) -> list[dict]:
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    items = []
+    for i in range(count):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 5))).title()
+        items.append({
+            "id": rng.randint(1, 10_000_000),
+            "title": title,
+            "type": rng.choice(("movie", "show")),
+            "created_at": (start + timedelta(minutes=rng.randint(0, 500_000))).isoformat(),
+        })
+    return items
+
+
+def pages(items: list[dict]):
+    for limit in PAGE_SIZES:
+        for type_ in TYPES:
+            filtered = [i for i in items if type_ is None or i["type"] == type_]
+            for sort in SORTS:
+                ordered = sorted(filtered, key=lambda i: i["created_at"], reverse=sort.endswith("desc"))
+                for skip in range(0, max(len(ordered), 1), limit):
+                    yield skip, limit, type_, sort, ordered[skip:skip + limit]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--items", type=int, default=120, help="mean items per user")
+    parser.add_argument("--seed", type=int, default=12)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    formats = {
+        "msgpack+auto": CacheSerializer("msgpack", "auto"),
+        "msgpack+none": CacheSerializer("msgpack", "none"),
+        "json+zlib": CacheSerializer("json", "zlib"),
+    }
+    totals = {"original": 0, **{name: 0 for name in formats}}
+    entries = 0
+
+    for user_id in range(1, args.users + 1):
+        email = f"user{user_id}.{rng.choice(WORDS)}@example.com"
+        items = make_items(rng, max(1, int(rng.expovariate(1 / args.items))))
+
+        for skip, limit, type_, sort, page in pages(items):
+            entries += 1
+
+            old_key = f"cache:watchlists:{email}:skip={skip}:limit={limit}:type={type_}:sort={sort}"
+            old_value = json.dumps({"user": email, "skip": skip, "limit": limit, "watchlist": page})
+            totals["original"] += len(old_key) + len(old_value.encode("utf-8"))
+
+            key = cache_key(user_id, skip=skip, limit=limit, type=type_, sort=sort)
+            rows = [[i["id"], i["title"], i["type"], i["created_at"]] for i in page]
+            for name, serializer in formats.items():
+                totals[name] += len(key) + len(serializer.dumps(rows))
+
+    baseline = totals["original"] / entries
+    print(f"{entries} cache entries for {args.users} users")
+    for name, total in totals.items():
+        per_entry = total / entries
+        print(f"{name:>14}: {per_entry:8.1f} bytes/entry ({per_entry / baseline:6.1%} of original)")
+
+
+if __name__ == "__main__":
+    main()
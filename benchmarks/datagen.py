@@ -0,0 +1,150 @@
+"""
+Synthetic data generator: bulk-loads users and watchlist items into a
+migrated SQLite database at a chosen scale.
+
+    python -m benchmarks.datagen --db bench.db --users 100000 --items 10000000
+
+Items per user follow a Zipf-like skew (a few users with very large lists,
+most with small ones), the same shape real watchlists have. A small share of
+items are tombstones (deleted_at set). Rows are written with plain
+executemany in batches, with journaling and fsync turned off for the load.
+The database is ANALYZEd at the end so the planner sees realistic stats.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from app.db.migrations import upgrade
+from app.db.positions import spaced_keys
+from app.db.session import make_engine
+
+SPAN = timedelta(days=365)  # items are spread over the year before the load
+BATCH = 50_000
+TOMBSTONE_RATE = 0.02
+
+
+def items_per_user(users: int, items: int, skew: float, rng: random.Random) -> list[int]:
+    weights = [1 / (rank ** skew) for rank in range(1, users + 1)]
+    rng.shuffle(weights)
+    scale = items / sum(weights)
+    counts = [int(w * scale) for w in weights]
+    # hand out the rounding remainder one item at a time
+    for i in rng.sample(range(users), min(users, items - sum(counts))):
+        counts[i] += 1
+    return counts
+
+
+def _stamp(value: datetime) -> str:
+    # the text format SQLAlchemy stores DateTime values in
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def generate(url: str, users: int, items: int, skew: float = 0.8, seed: int = 42) -> dict:
+    rng = random.Random(seed)
+    start = datetime.now(timezone.utc).replace(tzinfo=None) - SPAN
+    engine = make_engine(url)
+    upgrade(engine)
+    started = time.perf_counter()
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode = OFF")
+        conn.exec_driver_sql("PRAGMA synchronous = OFF")
+
+        first_user = (conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM users")).scalar()) + 1
+        counts = items_per_user(users, items, skew, rng)
+
+        user_rows = [
+            {
+                "id": first_user + i,
+                "email": f"user{first_user + i}@bench.test",
+                "password_hash": "x",
+                "role": "user",
+                "created_at": _stamp(start),
+                "shard": "main",
+                "item_count": 0,
+                "movie_count": 0,
+                "show_count": 0,
+            }
+            for i in range(users)
+        ]
+        for i in range(0, users, BATCH):
+            conn.execute(
+                text(
+                    "INSERT INTO users (id, email, password_hash, role, created_at, shard,"
+                    " item_count, movie_count, show_count)"
+                    " VALUES (:id, :email, :password_hash, :role, :created_at, :shard,"
+                    " :item_count, :movie_count, :show_count)"
+                ),
+                user_rows[i:i + BATCH],
+            )
+
+        insert_item = text(
+            "INSERT INTO watchlist_items (user_id, title, media_type, position, created_at, updated_at, deleted_at)"
+            " VALUES (:user_id, :title, :media_type, :position, :created_at, :updated_at, :deleted_at)"
+        )
+        batch, totals = [], []
+        for offset, count in enumerate(counts):
+            user_id = first_user + offset
+            movies = shows = 0
+            offsets = sorted(rng.random() for _ in range(count))
+            for n, position in enumerate(spaced_keys(count)):
+                created = start + offsets[n] * SPAN
+                media_type = "movie" if rng.random() < 0.6 else "show"
+                deleted = rng.random() < TOMBSTONE_RATE
+                if not deleted:
+                    movies += media_type == "movie"
+                    shows += media_type == "show"
+                stamp = _stamp(created)
+                batch.append({
+                    "user_id": user_id,
+                    "title": f"Title {user_id}-{n}",
+                    "media_type": media_type,
+                    "position": position,
+                    "created_at": stamp,
+                    "updated_at": stamp,
+                    "deleted_at": stamp if deleted else None,
+                })
+                if len(batch) >= BATCH:
+                    conn.execute(insert_item, batch)
+                    batch = []
+            totals.append({"id": user_id, "m": movies, "s": shows, "t": movies + shows})
+        if batch:
+            conn.execute(insert_item, batch)
+
+        for i in range(0, len(totals), BATCH):
+            conn.execute(
+                text("UPDATE users SET item_count = :t, movie_count = :m, show_count = :s WHERE id = :id"),
+                totals[i:i + BATCH],
+            )
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    engine.dispose()
+
+    return {
+        "users": users,
+        "items": items,
+        "largest_list": max(counts, default=0),
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default="bench.db", help="SQLite file to create or extend")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--skew", type=float, default=0.8, help="Zipf exponent for items per user")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    result = generate(f"sqlite:///{args.db}", args.users, args.items, args.skew, args.seed)
+    print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+ORM vs column-row read path for watchlist pages: CPU time and peak
+Python memory to load and serialize one page of 1k and 10k items.
+
+    python -m benchmarks.list_read_path --repeat 20
+
+"orm" is the previous list_watchlist path (ORM instances with load_only,
+then fields copied into lists); "rows" is app/db/queries.list_item_rows.
+Prints one JSON line per (path, page size).
+"""
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import insert
+from sqlalchemy.orm import load_only, sessionmaker
+
+from app.db.migrations import upgrade
+from app.db.models import User, WatchlistItem
+from app.db.queries import ITEM_FIELDS, list_item_rows
+from app.db.session import make_engine
+
+FIELDS = list(ITEM_FIELDS)
+
+
+def orm_page(db, user_id: int, limit: int) -> list[list]:
+    items = (
+        db.query(WatchlistItem)
+        .options(load_only(*ITEM_FIELDS.values()))
+        .filter(WatchlistItem.user_id == user_id)
+        .order_by(WatchlistItem.created_at.desc())
+        .limit(limit)
+        .all()
+    )
+    rows = []
+    for item in items:
+        row = []
+        for name in FIELDS:
+            value = getattr(item, ITEM_FIELDS[name].key)
+            row.append(value.isoformat() if name == "created_at" else value)
+        rows.append(row)
+    return rows
+
+
+def rows_page(db, user_id: int, limit: int) -> list[list]:
+    return list_item_rows(db, user_id, FIELDS, None, "created_at_desc", 0, limit)
+
+
+def seed(Session, count: int) -> int:
+    with Session() as db:
+        user = User(email="bench@test.com", password_hash="x")
+        db.add(user)
+        db.commit()
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        db.execute(insert(WatchlistItem), [
+            {"user_id": user.id, "title": f"Title {i}", "media_type": "movie" if i % 2 else "show",
+             "created_at": start + timedelta(minutes=i)}
+            for i in range(count)
+        ])
+        db.commit()
+        return user.id
+
+
+def measure(fn, Session, user_id: int, limit: int, repeat: int) -> dict:
+    with Session() as db:
+        fn(db, user_id, limit)  # warm up statement caches
+
+    cpu = time.process_time()
+    for _ in range(repeat):
+        with Session() as db:
+            rows = fn(db, user_id, limit)
+    cpu_ms = (time.process_time() - cpu) * 1000 / repeat
+
+    tracemalloc.start()
+    with Session() as db:
+        rows = fn(db, user_id, limit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(rows) == limit
+    return {"cpu_ms_per_page": round(cpu_ms, 2), "peak_kib": round(peak / 1024, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--sizes", default="1000,10000")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        upgrade(engine)
+        Session = sessionmaker(bind=engine)
+        user_id = seed(Session, max(sizes))
+
+        for size in sizes:
+            results = {name: measure(fn, Session, user_id, size, args.repeat)
+                       for name, fn in (("orm", orm_page), ("rows", rows_page))}
+            for name, result in results.items():
+                print(json.dumps({"path": name, "page_size": size, **result}), flush=True)
+            print(json.dumps({
+                "page_size": size,
+                "cpu_speedup": round(results["orm"]["cpu_ms_per_page"] / results["rows"]["cpu_ms_per_page"], 2),
+                "memory_ratio": round(results["rows"]["peak_kib"] / results["orm"]["peak_kib"], 2),
+            }), flush=True)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
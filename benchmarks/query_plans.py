@@ -0,0 +1,204 @@
+"""
+Query benchmark with plan checks: times every query pattern the watchlist
+and auth endpoints issue and records SQLite's EXPLAIN QUERY PLAN for each.
+
+    python -m benchmarks.datagen --db bench.db --users 100000 --items 10000000
+    python -m benchmarks.query_plans --db bench.db --repeat 200
+
+Each pattern runs the application's own query code (app/db/queries.py,
+app/db/changes.py, app/db/positions.py, or the ORM query an endpoint
+builds inline), so the SQL checked is the SQL that ships. Queries run
+against the user with the largest list, the worst case for anything that
+is not a bounded index range.
+
+Prints one JSON line per query with p50/p95 latency and the plan, and exits
+non-zero if a query scans a table or index end to end, sorts through a temp
+B-tree, or stops using the index it was designed around. tests/test_query_plans.py runs the same check on a small
+generated database.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import Engine, event, func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.changes import changes_since, encode_token
+from app.db.models import User, WatchlistItem
+from app.db.positions import last_position, neighbour_position
+from app.db.queries import ITEM_FIELDS, get_item_rows, list_item_rows
+from app.db.session import make_engine
+
+FIELDS = list(ITEM_FIELDS)
+
+
+@dataclass(frozen=True)
+class HotQuery:
+    name: str
+    endpoint: str
+    run: Callable[[Session, dict], object]
+    # the plan must mention this index (catches a worse index being chosen)
+    index: str
+
+
+def _own_item(db: Session, ctx: dict):
+    # PATCH/DELETE/move /v1/watchlists/items/{id} (app/api/v1/watchlists.py)
+    return (
+        db.query(WatchlistItem)
+        .filter(
+            WatchlistItem.id == ctx["item_id"],
+            WatchlistItem.user_id == ctx["user_id"],
+            WatchlistItem.deleted_at.is_(None),
+        )
+        .first()
+    )
+
+
+def _user_by_email(db: Session, ctx: dict):
+    # get_current_user on every authenticated request (app/api/v1/auth.py)
+    return db.query(User).filter(User.email == ctx["email"]).first()
+
+
+HOT_QUERIES = [
+    HotQuery("list_newest", "GET /v1/watchlists",
+             lambda db, c: list_item_rows(db, c["user_id"], FIELDS, None, "created_at_desc", 0, 10),
+             "ix_watchlist_items_user_created"),
+    HotQuery("list_newest_deep_page", "GET /v1/watchlists?skip=200",
+             lambda db, c: list_item_rows(db, c["user_id"], FIELDS, None, "created_at_desc", 200, 10),
+             "ix_watchlist_items_user_created"),
+    HotQuery("list_type_oldest", "GET /v1/watchlists?type=show&sort=created_at_asc",
+             lambda db, c: list_item_rows(db, c["user_id"], FIELDS, "show", "created_at_asc", 0, 10),
+             "ix_watchlist_items_user_type_created"),
+    HotQuery("list_position", "GET /v1/watchlists?sort=position",
+             lambda db, c: list_item_rows(db, c["user_id"], FIELDS, None, "position", 0, 10),
+             "ix_watchlist_items_user_position"),
+    HotQuery("list_type_position", "GET /v1/watchlists?type=movie&sort=position",
+             lambda db, c: list_item_rows(db, c["user_id"], FIELDS, "movie", "position", 0, 10),
+             "ix_watchlist_items_user_position"),
+    HotQuery("get_items_by_ids", "GET /v1/watchlists/items?ids=",
+             lambda db, c: get_item_rows(db, c["user_id"], c["item_ids"], FIELDS),
+             "INTEGER PRIMARY KEY"),
+    HotQuery("own_item_by_id", "PATCH|DELETE /v1/watchlists/items/{id}", _own_item, "INTEGER PRIMARY KEY"),
+    HotQuery("user_by_email", "every authenticated request", _user_by_email, "ix_users_email"),
+    HotQuery("last_position", "POST /v1/watchlists/items",
+             lambda db, c: last_position(db, c["user_id"]),
+             "ix_watchlist_items_user_position"),
+    HotQuery("neighbour_position", "POST /v1/watchlists/items/{id}/move",
+             lambda db, c: neighbour_position(db, c["user_id"], c["position"], True, c["item_id"]),
+             "ix_watchlist_items_user_position"),
+    HotQuery("changes_since", "GET /v1/watchlists/changes?since=",
+             lambda db, c: changes_since(db, c["user_id"], c["token"], 500),
+             "ix_watchlist_items_user_updated"),
+]
+
+
+def context(db: Session) -> dict:
+    """Parameters for HOT_QUERIES, taken from the user with the largest list."""
+    user = db.scalars(select(User).order_by(User.item_count.desc()).limit(1)).one()
+    ids = db.scalars(
+        select(WatchlistItem.id)
+        .where(WatchlistItem.user_id == user.id, WatchlistItem.deleted_at.is_(None))
+        .order_by(WatchlistItem.id)
+    ).all()
+    middle = db.get(WatchlistItem, ids[len(ids) // 2])
+    latest = db.scalar(select(func.max(WatchlistItem.updated_at)).where(WatchlistItem.user_id == user.id))
+    return {
+        "user_id": user.id,
+        "email": user.email,
+        "item_id": middle.id,
+        "item_ids": ids[:: max(1, len(ids) // 20)][:20],
+        "position": middle.position,
+        # a client that last synced just before this user's newest write
+        "token": encode_token(latest, 0) if latest else None,
+    }
+
+
+def capture(engine: Engine, db: Session, query: HotQuery, ctx: dict) -> list[tuple[str, object]]:
+    """Run `query` once and return the (sql, params) it sent."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        query.run(db, ctx)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+
+def explain(db: Session, statement: str, parameters) -> list[str]:
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return [row[3] for row in rows]
+
+
+def problems(query: HotQuery, plan: list[str]) -> list[str]:
+    """Steps that read a whole table or index or sort in a temp B-tree, and a
+    note if the expected index is not used."""
+    found = [step for step in plan if step.startswith("SCAN ") or "TEMP B-TREE" in step]
+    if not any(query.index in step for step in plan):
+        found.append(f"does not use {query.index}")
+    return found
+
+
+def check(engine: Engine, db: Session, ctx: dict) -> dict[str, list[str]]:
+    """Plan of every hot query, by name."""
+    plans = {}
+    for query in HOT_QUERIES:
+        plans[query.name] = [
+            step for statement, params in capture(engine, db, query, ctx) for step in explain(db, statement, params)
+        ]
+    return plans
+
+
+def time_query(db: Session, query: HotQuery, ctx: dict, repeat: int) -> dict:
+    query.run(db, ctx)  # warm the statement and page caches
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        query.run(db, ctx)
+        db.expunge_all()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default="bench.db", help="database built by benchmarks.datagen")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = make_engine(f"sqlite:///{args.db}")
+    failed = []
+    with sessionmaker(bind=engine)() as db:
+        ctx = context(db)
+        plans = check(engine, db, ctx)
+        for query in HOT_QUERIES:
+            bad = problems(query, plans[query.name])
+            if bad:
+                failed.append(query.name)
+            print(json.dumps({
+                "query": query.name,
+                "endpoint": query.endpoint,
+                **time_query(db, query, ctx, args.repeat),
+                "plan": plans[query.name],
+                "problems": bad,
+            }), flush=True)
+    engine.dispose()
+
+    if failed:
+        print(f"plan regressions in: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+JSON vs MessagePack response bodies: encoded size and encode/decode CPU
+time for watchlist list pages and exports of 10 to 10k items.
+
+    python -m benchmarks.response_formats --repeat 50
+
+"json" is what JSONResponse renders (the default for every client);
+"msgpack" is what NegotiatedResponse renders for `Accept:
+application/msgpack` (app/core/negotiation.py). Decoding is timed with
+json.loads and msgpack.unpackb, as a Python consumer would parse them.
+"list" bodies have one dict per item, like GET /v1/watchlists; "export"
+bodies have positional rows, like GET /v1/watchlists/export. gzip_bytes is
+the size after gzip level 6, for responses that go through a compressing
+proxy. FastAPI's jsonable_encoder pass runs before either encoder and is
+not included. Prints one JSON line per (shape, items, format).
+"""
+import argparse
+import gzip
+import json
+import random
+import statistics
+import time
+
+from fastapi.responses import JSONResponse
+
+from app.core.negotiation import packb, unpackb
+from benchmarks.cache_size import make_items
+
+FIELDS = ["id", "title", "type", "created_at", "position"]
+
+
+def payloads(items: list[dict]) -> dict[str, dict]:
+    totals = {"total": len(items), "totals": {"all": len(items), "movie": 0, "show": 0}}
+    return {
+        "list": {"user": "bench@example.com", "skip": 0, "limit": len(items), **totals, "watchlist": items},
+        "export": {
+            "user": "bench@example.com",
+            **totals,
+            "fields": FIELDS,
+            "items": [[i[f] for f in FIELDS] for i in items],
+        },
+    }
+
+
+FORMATS = {
+    "json": (lambda content: JSONResponse(content).body, json.loads),
+    "msgpack": (packb, unpackb),
+}
+
+
+def median_ms(fn, arg, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(arg)
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--sizes", default="10,100,1000,10000")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for count in (int(s) for s in args.sizes.split(",")):
+        items = make_items(rng, count)
+        for n, item in enumerate(items):
+            item["position"] = f"a{n:06d}"
+        for shape, content in payloads(items).items():
+            for name, (encode, decode) in FORMATS.items():
+                body = encode(content)
+                assert decode(body) == json.loads(JSONResponse(content).body)
+                print(json.dumps({
+                    "shape": shape,
+                    "items": count,
+                    "format": name,
+                    "bytes": len(body),
+                    "gzip_bytes": len(gzip.compress(body, 6)),
+                    "encode_ms": median_ms(encode, content, args.repeat),
+                    "decode_ms": median_ms(decode, body, args.repeat),
+                }), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Write-throughput benchmark for watchlist sharding: committed item inserts
+per second with 1, 2, 4, ... SQLite shards.
+
+    python -m benchmarks.shard_writes --max-shards 4 --writers 8 --seconds 5
+
+Each writer thread owns one user and commits one item per transaction to
+that user's shard (ids from the shared block allocator), which is the item
+half of POST /v1/watchlists/items. SQLite serialises writers per database
+file, so spreading users across files is what lets commits overlap.
+Prints one JSON line per shard count.
+"""
+import argparse
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy import event
+
+from app.db.migrations import upgrade
+from app.db.models import WatchlistItem
+from app.db.session import make_engine
+from app.db.shards import ShardMap
+
+
+def _engine(path: Path):
+    engine = make_engine(f"sqlite:///{path}")
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_conn, _):
+        dbapi_conn.execute("PRAGMA busy_timeout = 30000")
+
+    upgrade(engine)
+    return engine
+
+
+def run(shard_count: int, writers: int, seconds: float, workdir: Path) -> dict:
+    main = _engine(workdir / "main.db")
+    shards = {f"s{i}": _engine(workdir / f"s{i}.db") for i in range(shard_count)}
+    shard_map = ShardMap(main, shards, vnodes=64, id_block=1000)
+
+    # one user per writer, spread over the ring the same way the API does
+    user_ids, by_shard, uid = [], {}, 1
+    while len(user_ids) < writers:
+        name = shard_map.placement(uid)
+        if by_shard.get(name, 0) < -(-writers // shard_count):
+            by_shard[name] = by_shard.get(name, 0) + 1
+            user_ids.append(uid)
+        uid += 1
+
+    counts = [0] * writers
+    deadline = time.monotonic() + seconds
+
+    def writer(slot: int, user_id: int) -> None:
+        db = shard_map.session(shard_map.placement(user_id))
+        try:
+            while time.monotonic() < deadline:
+                db.add(WatchlistItem(id=shard_map.ids.next_id(), user_id=user_id, title="bench", media_type="movie"))
+                db.commit()
+                counts[slot] += 1
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=writer, args=(i, u)) for i, u in enumerate(user_ids)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for e in shard_map.engines.values():
+        e.dispose()
+    total = sum(counts)
+    return {
+        "shards": shard_count,
+        "writers": writers,
+        "writes": total,
+        "writes_per_sec": round(total / seconds, 1),
+        "users_per_shard": dict(sorted(by_shard.items())),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-shards", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    counts, n = [], 1
+    while n <= args.max_shards:
+        counts.append(n)
+        n *= 2
+
+    for shard_count in counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(json.dumps(run(shard_count, args.writers, args.seconds, Path(tmp))), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Startup-time benchmark: import time of app.main and time-to-first-response
+of a fresh uvicorn process.
+
+    python -m benchmarks.startup --runs 5
+
+Prints one JSON line per run plus a summary line, so results can be appended
+to a file and tracked over time.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import(env: dict) -> float:
+    out = subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, env=env)
+    return float(out.decode().strip())
+
+
+def measure_first_response(env: dict, timeout: float = 30.0) -> float:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=0.5) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"no response from {url} within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db")
+
+        imports, firsts = [], []
+        for run in range(args.runs):
+            imp = measure_import(env)
+            first = measure_first_response(env)
+            imports.append(imp)
+            firsts.append(first)
+            print(json.dumps({"benchmark": "startup", "run": run, "import_s": round(imp, 4), "first_response_s": round(first, 4)}))
+
+        print(json.dumps({
+            "benchmark": "startup",
+            "summary": True,
+            "runs": args.runs,
+            "import_s_median": round(statistics.median(imports), 4),
+            "first_response_s_median": round(statistics.median(firsts), 4),
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Throughput benchmark for the pre-forking launcher: requests/second against
+`python -m app.server --workers N` for N = 1..max.
+
+    python -m benchmarks.throughput --max-workers 4 --seconds 5
+
+Load is generated from several client processes so the client side is not
+the bottleneck. Prints one JSON line per worker count.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server at {url} did not come up")
+
+
+async def _hammer(url: str, seconds: float, concurrency: int) -> int:
+    import httpx
+
+    done = 0
+    deadline = time.monotonic() + seconds
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=10.0) as client:
+        async def loop():
+            nonlocal done
+            while time.monotonic() < deadline:
+                r = await client.get(url)
+                if r.status_code < 500:
+                    done += 1
+
+        await asyncio.gather(*(loop() for _ in range(concurrency)))
+    return done
+
+
+def _client_process(url: str, seconds: float, concurrency: int, out) -> None:
+    out.put(asyncio.run(_hammer(url, seconds, concurrency)))
+
+
+def measure(workers: int, path: str, seconds: float, clients: int, concurrency: int, env: dict) -> float:
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}{path}"
+        wait_ready(f"http://127.0.0.1:{port}/health")
+
+        results = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=_client_process, args=(url, seconds, concurrency, results))
+            for _ in range(clients)
+        ]
+        for p in procs:
+            p.start()
+        total = sum(results.get() for _ in procs)
+        for p in procs:
+            p.join()
+        return total / seconds
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=60)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--path", default="/health")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--clients", type=int, default=None, help="load generator processes (default: max-workers)")
+    parser.add_argument("--concurrency", type=int, default=32, help="connections per client process")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db")
+        subprocess.check_call([sys.executable, "-m", "app.db.migrations"], cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+
+        baseline = None
+        for workers in range(1, args.max_workers + 1):
+            rps = measure(workers, args.path, args.seconds, args.clients or args.max_workers, args.concurrency, env)
+            baseline = baseline or rps
+            print(json.dumps({
+                "benchmark": "throughput",
+                "path": args.path,
+                "workers": workers,
+                "rps": round(rps, 1),
+                "speedup": round(rps / baseline, 2),
+            }))
+
+
+if __name__ == "__main__":
+    main()
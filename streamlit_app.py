@@ -3,6 +3,10 @@ import streamlit as st
 import os
 import json
 import time
+import uuid
+from dataclasses import dataclass
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # API_BASE_DEFAULT = "http://127.0.0.1:8000/v1"
 # API_BASE_DEFAULT = os.getenv("API_BASE_URL") or os.getenv("API_BASE_URL") or "http://api:8000/v1"
@@ -133,38 +137,102 @@ div[data-testid="stMetric"] *{ color:#F5F5F1 !important; }
 st.markdown(DASH_CSS, unsafe_allow_html=True)
 
 
+# -----------------------------
+# HTTP client
+# -----------------------------
+# paths (under /v1) the API's Idempotency-Key middleware covers
+IDEMPOTENT_PREFIXES = ("/watchlists", "/batch")
+
+
+@st.cache_resource
+def get_http_session(retry_writes: bool = False) -> requests.Session:
+    """One keep-alive session per Streamlit server process, shared by all reruns.
+
+    Only GETs are retried on 502/503/504 unless `retry_writes` is set: writes
+    may be retried only where the API replays a repeated Idempotency-Key
+    instead of writing twice. /auth/* is not covered (a retried register
+    whose first response was lost would answer "User already exists")."""
+    session = requests.Session()
+    methods = {"GET", "HEAD"} | ({"POST", "PATCH", "DELETE"} if retry_writes else set())
+    retry = Retry(
+        total=2,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(methods),
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def write_session(path: str) -> tuple[requests.Session, dict]:
+    """The session for a write to `path`, and the headers that make retrying it safe."""
+    if path.startswith(IDEMPOTENT_PREFIXES):
+        return get_http_session(retry_writes=True), {"Idempotency-Key": uuid.uuid4().hex}
+    return get_http_session(), {}
+
+
 def api_post(api_base: str, path: str, payload: dict, token: str | None = None):
-    headers = {"Content-Type": "application/json"}
+    session, headers = write_session(path)
+    headers["Content-Type"] = "application/json"
     if token:
         headers["Authorization"] = f"Bearer {token}"
-    return requests.post(f"{api_base}{path}", json=payload, headers=headers, timeout=12)
+    return session.post(f"{api_base}{path}", json=payload, headers=headers, timeout=12)
 
 
 def api_get(api_base: str, path: str, token: str | None = None):
     headers = {}
     if token:
         headers["Authorization"] = f"Bearer {token}"
-    return requests.get(f"{api_base}{path}", headers=headers, timeout=12)
+    return get_http_session().get(f"{api_base}{path}", headers=headers, timeout=12)
 
 
 def api_patch(api_base: str, path: str, payload: dict, token: str | None = None):
-    headers = {"Content-Type": "application/json"}
+    session, headers = write_session(path)
+    headers["Content-Type"] = "application/json"
     if token:
         headers["Authorization"] = f"Bearer {token}"
-    return requests.patch(f"{api_base}{path}", json=payload, headers=headers, timeout=12)
+    return session.patch(f"{api_base}{path}", json=payload, headers=headers, timeout=12)
 
 
 def api_delete(api_base: str, path: str, token: str | None = None):
-    headers = {}
+    session, headers = write_session(path)
     if token:
         headers["Authorization"] = f"Bearer {token}"
-    return requests.delete(f"{api_base}{path}", headers=headers, timeout=12)
+    return session.delete(f"{api_base}{path}", headers=headers, timeout=12)
+
+
+@dataclass
+class CachedResponse:
+    """Picklable snapshot of a response so reads can live in st.cache_data."""
+    status_code: int
+    headers: dict
+    text: str
+
+    def json(self):
+        return json.loads(self.text)
+
+
+@st.cache_data(ttl=15, show_spinner=False)
+def cached_get(api_base: str, path: str, token: str | None = None) -> CachedResponse:
+    resp = api_get(api_base, path, token)
+    return CachedResponse(
+        status_code=resp.status_code,
+        headers={k.lower(): v for k, v in resp.headers.items()},
+        text=resp.text,
+    )
+
+
+def invalidate_reads():
+    # called after every write so the next read sees it
+    cached_get.clear()
 
 
 # -----------------------------
 # Helpers (UI)
 # -----------------------------
-def show_headers(resp: requests.Response):
+def show_headers(resp: requests.Response | CachedResponse):
     # proof headers (case-insensitive in requests, but we'll read via .get)
     keys = [
         "x-request-id",
@@ -184,7 +252,7 @@ def show_headers(resp: requests.Response):
         st.json(present)
 
 
-def nice_json(resp: requests.Response):
+def nice_json(resp: requests.Response | CachedResponse):
     st.caption(f"HTTP {resp.status_code}")
     show_headers(resp)
     try:
@@ -193,11 +261,13 @@ def nice_json(resp: requests.Response):
         st.code(resp.text)
 
 
+@st.cache_data(ttl=10, show_spinner=False)
 def check_api_up(api_base: str) -> str:
-    # your api_base includes /v1; health is at /health
+    # your api_base includes /v1; health is at /health.
+    # Cached briefly: this runs on every rerun, i.e. every widget interaction.
     try:
         root = api_base.replace("/v1", "")
-        r = requests.get(f"{root}/health", timeout=3)
+        r = get_http_session().get(f"{root}/health", timeout=3)
         return "UP" if r.status_code == 200 else "DOWN"
     except Exception:
         return "DOWN"
@@ -214,7 +284,7 @@ def refresh_watchlist():
     if filter_type != "(all)":
         qs += f"&type={filter_type}"
 
-    resp = api_get(
+    resp = cached_get(
         st.session_state.api_base,
         f"/watchlists/?{qs}",
         st.session_state.token,
@@ -262,8 +332,14 @@ with st.sidebar:
         st.success("Logged in")
         st.code(st.session_state.email or "user", language="text")
         if st.button("Log out", use_container_width=True):
+            # revoke the token server-side too, not just forget it
+            try:
+                api_post(st.session_state.api_base, "/auth/logout", {}, st.session_state.token)
+            except Exception:
+                pass
             st.session_state.token = None
             st.session_state.email = ""
+            invalidate_reads()
             st.rerun()
     else:
         st.info("Not logged in")
@@ -328,7 +404,7 @@ with col_auth:
                 if not st.session_state.token:
                     st.warning("Login first.")
                 else:
-                    resp = api_get(st.session_state.api_base, "/auth/me", st.session_state.token)
+                    resp = cached_get(st.session_state.api_base, "/auth/me", st.session_state.token)
                     nice_json(resp)
 
 with col_data:
@@ -370,6 +446,7 @@ with col_data:
                     {"title": new_title, "type": new_type},
                     st.session_state.token,
                 )
+                invalidate_reads()
                 nice_json(resp)
                 refresh_watchlist()
 
@@ -387,6 +464,7 @@ with col_data:
                     f"/watchlists/items/{int(del_id)}",
                     st.session_state.token,
                 )
+                invalidate_reads()
                 nice_json(resp)
                 refresh_watchlist()
 
@@ -416,12 +494,13 @@ with col_data:
                         payload,
                         st.session_state.token,
                     )
+                    invalidate_reads()
                     nice_json(resp)
                     refresh_watchlist()
 
         st.divider()
         st.subheader("🧪 Caching demo (call twice)")
-        st.caption("Your API caches GET /watchlists for ~30 seconds. This calls twice to show speed difference.")
+        st.caption("Your API caches GET /watchlists for ~30 seconds. This calls twice to show speed difference (bypasses the dashboard's own cache).")
         if st.button("Cache demo (call twice)", use_container_width=True):
             if not st.session_state.token:
                 st.warning("Login first.")
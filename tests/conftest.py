@@ -1,10 +1,16 @@
+import os
+
+# No Redis in tests: point at a closed local port so every call fails fast
+# (fail-open paths) instead of waiting on DNS for the docker "redis" host.
+os.environ.setdefault("REDIS_URL", "redis://127.0.0.1:1/0")
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.main import app
-from app.db.session import Base
+from app.db.migrations import upgrade
 from app.db.deps import get_db
 
 
@@ -19,7 +25,7 @@ def client(tmp_path):
     TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
     # create tables in the temp db
-    Base.metadata.create_all(bind=engine)
+    upgrade(engine)
 
     # override FastAPI dependency
     def override_get_db():
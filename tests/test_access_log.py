@@ -0,0 +1,100 @@
+import io
+import json
+import logging
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.core.access_log import AccessLog, AccessLogMiddleware, note_cache, note_user, parse_sample_rates
+
+
+class Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.entries = []
+
+    def emit(self, record):
+        self.entries.append(record.access)
+
+
+@pytest.fixture()
+def collected():
+    handler = Collect()
+    log = logging.getLogger("app.access")
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    yield handler.entries
+    log.removeHandler(handler)
+
+
+def make_app(tmp_path, sample_rates):
+    engine = create_engine(f"sqlite:///{tmp_path / 'a.db'}")
+    app = FastAPI()
+    router = APIRouter()
+
+    @router.get("/things/{thing_id}")
+    def get_thing(thing_id: int):
+        note_user(7)
+        note_cache(False)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return {"id": thing_id}
+
+    @router.get("/boom")
+    def boom():
+        raise RuntimeError("boom")
+
+    app.include_router(router, prefix="/api")
+
+    app.add_middleware(AccessLogMiddleware, sample_rates=sample_rates, slow_ms=10_000)
+    return app
+
+
+def test_access_entry_fields(tmp_path, collected):
+    client = TestClient(make_app(tmp_path, {}))
+    assert client.get("/api/things/3").status_code == 200
+
+    (entry,) = collected
+    assert entry["method"] == "GET"
+    assert entry["route"] == "/api/things/{thing_id}"
+    assert entry["path"] == "/api/things/3"
+    assert entry["status"] == 200
+    assert entry["user_id"] == 7
+    assert entry["cache_hit"] is False
+    assert entry["db_queries"] == 2
+    assert entry["db_ms"] >= 0 and entry["latency_ms"] >= entry["db_ms"]
+
+
+def test_sampling_by_status_class(tmp_path, collected):
+    client = TestClient(make_app(tmp_path, parse_sample_rates("2xx=0,5xx=1")), raise_server_exceptions=False)
+    for _ in range(5):
+        client.get("/api/things/1")
+    assert client.get("/api/boom").status_code == 500
+
+    assert [e["status"] for e in collected] == [500]
+    assert collected[0]["sample_rate"] == 1.0
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("2xx=0.01, 5XX=1,") == {2: 0.01, 5: 1.0}
+    with pytest.raises(ValueError):
+        parse_sample_rates("ok=1")
+
+
+def test_listener_writes_json_lines_off_the_caller_thread():
+    stream = io.StringIO()
+    log = AccessLog(stream=stream, queue_size=2)
+    log.start()
+    logging.getLogger("app.access").info("access", extra={"access": {"status": 200, "route": "/x"}})
+    log.stop()
+
+    line = json.loads(stream.getvalue().splitlines()[0])
+    assert line["status"] == 200 and line["route"] == "/x" and "ts" in line
+
+    # a full queue drops instead of blocking
+    for _ in range(5):
+        log.handler.enqueue(logging.makeLogRecord({}))
+    assert log.handler.dropped == 3
@@ -0,0 +1,63 @@
+from app.core.audit import parse_legacy_line
+from app.db.deps import get_db
+from app.db.models import User
+from app.main import app
+
+from tests.test_watchlists import auth_headers, login_and_token, register
+
+
+def make_admin(email: str) -> None:
+    gen = app.dependency_overrides[get_db]()
+    db = next(gen)
+    db.query(User).filter(User.email == email).update({"role": "admin"})
+    db.commit()
+    gen.close()
+
+
+def test_admin_audit_filters_and_keyset_pagination(client):
+    register(client, "user@test.com")
+    user_headers = auth_headers(login_and_token(client, "user@test.com"))
+    register(client, "boss@test.com")
+    make_admin("boss@test.com")
+    admin_headers = auth_headers(login_and_token(client, "boss@test.com"))
+
+    ids = []
+    for i in range(5):
+        r = client.post("/v1/watchlists/items", json={"title": f"M{i}", "type": "movie"}, headers=user_headers)
+        ids.append(r.json()["item"]["id"])
+    client.delete(f"/v1/watchlists/items/{ids[0]}", headers=user_headers)
+
+    assert client.get("/v1/admin/audit", headers=user_headers).status_code == 401
+
+    r = client.get("/v1/admin/audit?user=user@test.com&action=add&limit=2", headers=admin_headers)
+    page = r.json()
+    assert [e["item_id"] for e in page["events"]] == [ids[4], ids[3]]
+    assert page["events"][0]["detail"] == {"title": "M4", "type": "movie"}
+
+    seen = [e["item_id"] for e in page["events"]]
+    while page["next_cursor"]:
+        r = client.get(
+            "/v1/admin/audit",
+            params={"user": "user@test.com", "action": "add", "limit": 2, "cursor": page["next_cursor"]},
+            headers=admin_headers,
+        )
+        page = r.json()
+        seen += [e["item_id"] for e in page["events"]]
+    assert seen == ids[::-1]
+
+    r = client.get("/v1/admin/audit?action=delete", headers=admin_headers)
+    assert [e["item_id"] for e in r.json()["events"]] == [ids[0]]
+
+    r = client.get("/v1/admin/audit?from=2000-01-01T00:00:00Z&to=2000-01-02T00:00:00Z", headers=admin_headers)
+    assert r.json() == {"events": [], "next_cursor": None}
+
+    assert client.get("/v1/admin/audit?cursor=nope", headers=admin_headers).status_code == 400
+
+
+def test_parse_legacy_audit_line():
+    fields = parse_legacy_line("2025-01-02T03:04:05+00:00 | user=a@b.com action=add item_id=7 title=The Thing type=movie\n")
+    assert fields["user"] == "a@b.com"
+    assert fields["item_id"] == "7"
+    assert fields["title"] == "The Thing"
+    assert fields["type"] == "movie"
+    assert parse_legacy_line("garbage") is None
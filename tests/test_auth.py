@@ -15,4 +15,66 @@ def test_register_login_and_me(client):
 
     r = client.get("/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
     assert r.status_code == 200
-    assert r.json()["email"] == "test@example.com"
\ No newline at end of file
+    assert r.json()["email"] == "test@example.com"
+
+def test_refresh_rotation_and_logout(client):
+    client.post("/v1/auth/register", json={"email": "rot@example.com", "password": "password123"})
+    tokens = client.post("/v1/auth/login", json={"email": "rot@example.com", "password": "password123"}).json()
+
+    # refresh tokens are not accepted as access tokens
+    r = client.get("/v1/auth/me", headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+    assert r.status_code == 401
+
+    r = client.post("/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 200
+    rotated = r.json()
+
+    # the old refresh token was rotated out and cannot be reused
+    r = client.post("/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 401
+
+    headers = {"Authorization": f"Bearer {rotated['access_token']}"}
+    assert client.get("/v1/auth/me", headers=headers).status_code == 200
+
+    r = client.post("/v1/auth/logout", json={"refresh_token": rotated["refresh_token"]}, headers=headers)
+    assert r.status_code == 200
+    assert client.get("/v1/auth/me", headers=headers).status_code == 401
+    r = client.post("/v1/auth/refresh", json={"refresh_token": rotated["refresh_token"]})
+    assert r.status_code == 401
+
+
+class SharedRedis:
+    """The part of Redis the revocation store uses, shared by 'workers'."""
+
+    def __init__(self):
+        self.keys = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        return True
+
+    async def zadd(self, key, mapping):
+        return len(mapping)
+
+    async def exists(self, key):
+        return int(key in self.keys)
+
+
+def test_rotated_refresh_token_is_refused_by_another_worker(client, monkeypatch):
+    from app.core import revocation
+    from app.core.bloom import BloomFilter
+
+    monkeypatch.setattr(revocation, "get_redis", lambda: SharedRedis.instance)
+    SharedRedis.instance = SharedRedis()
+    client.post("/v1/auth/register", json={"email": "w@example.com", "password": "password123"})
+    tokens = client.post("/v1/auth/login", json={"email": "w@example.com", "password": "password123"}).json()
+
+    assert client.post("/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 200
+
+    # another worker: nothing revoked locally and an empty filter, not yet synced
+    monkeypatch.setattr(revocation, "_local", {})
+    monkeypatch.setattr(revocation, "_filter", BloomFilter(1000, 0.01))
+    r = client.post("/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 401
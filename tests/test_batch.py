@@ -0,0 +1,119 @@
+from app.api.v1 import auth
+from app.core import rate_limit
+
+from tests.test_watchlists import auth_headers, login_and_token, register
+
+
+class CountingRedis:
+    def __init__(self, counts):
+        self.counts = counts
+
+    async def incr(self, key):
+        self.counts[key] = self.counts.get(key, 0) + 1
+        return self.counts[key]
+
+    async def expire(self, key, seconds):
+        return True
+
+
+def test_batch_runs_sub_requests_with_one_auth(client, monkeypatch):
+    register(client)
+    headers = auth_headers(login_and_token(client))
+
+    decoded = []
+    real_decode = auth.decode_token
+    monkeypatch.setattr(auth, "decode_token", lambda token: decoded.append(token) or real_decode(token))
+
+    r = client.post("/v1/batch", headers=headers, json={"requests": [
+        {"id": "me", "path": "/v1/auth/me"},
+        {"id": "add", "method": "POST", "path": "/v1/watchlists/items", "body": {"title": "Heat", "type": "movie"}},
+        {"id": "health", "path": "/v1/health/detailed"},
+        {"id": "missing", "path": "/v1/watchlists/items/999", "method": "DELETE"},
+        {"id": "bad", "method": "POST", "path": "/v1/watchlists/items", "body": {"type": "movie"}},
+    ]})
+    assert r.status_code == 200
+    by_id = {resp["id"]: resp for resp in r.json()["responses"]}
+    assert [resp["id"] for resp in r.json()["responses"]] == ["me", "add", "health", "missing", "bad"]
+
+    assert by_id["me"]["status"] == 200 and by_id["me"]["body"]["email"] == "watch@test.com"
+    assert by_id["add"]["status"] == 201 and by_id["add"]["body"]["item"]["title"] == "Heat"
+    assert by_id["health"]["status"] == 200
+    assert by_id["missing"]["status"] == 404
+    assert by_id["missing"]["body"] == {"detail": "Item not found"}
+    assert by_id["bad"]["status"] == 422
+    assert len(decoded) == 1  # the batch's token, not once per sub-request
+
+    listed = client.get("/v1/watchlists/", headers=headers)
+    assert listed.json()["total"] == 1
+
+
+def test_each_sub_request_counts_against_its_route_limit(client, monkeypatch):
+    register(client)
+    headers = auth_headers(login_and_token(client))
+    counts = {"rl:watchlists:list:testclient": 59}  # one list call left this window
+    monkeypatch.setattr(rate_limit, "get_redis", lambda: CountingRedis(counts))
+
+    r = client.post("/v1/batch", headers=headers, json={"requests": [
+        {"path": "/v1/watchlists/"},
+        {"path": "/v1/watchlists/"},
+        {"path": "/v1/auth/me"},
+    ]})
+    statuses = sorted(resp["status"] for resp in r.json()["responses"])
+    assert statuses == [200, 200, 429]
+    assert counts["rl:watchlists:list:testclient"] == 61
+
+
+def test_batch_requires_auth_and_rejects_excluded_paths(client):
+    assert client.post("/v1/batch", json={"requests": [{"path": "/v1/auth/me"}]}).status_code == 401
+
+    register(client)
+    headers = auth_headers(login_and_token(client))
+    for path in ("/v1/batch", "/v1/watchlists/stream", "/health"):
+        r = client.post("/v1/batch", headers=headers, json={"requests": [{"path": path}]})
+        assert r.status_code == 422
+    assert client.post("/v1/batch", headers=headers, json={"requests": []}).status_code == 422
+
+
+def test_sub_request_headers_override_the_batch_and_binary_bodies_are_base64(client):
+    import base64
+
+    import msgpack
+
+    register(client)
+    headers = auth_headers(login_and_token(client))
+    client.post("/v1/watchlists/items", json={"title": "Heat", "type": "movie"}, headers=headers)
+
+    r = client.post("/v1/batch", headers={**headers, "Accept": "application/json"}, json={"requests": [
+        {"id": "packed", "path": "/v1/watchlists/", "headers": {"Accept": "application/msgpack"}},
+        {"id": "plain", "path": "/v1/watchlists/"},
+    ]})
+    by_id = {resp["id"]: resp for resp in r.json()["responses"]}
+    packed = by_id["packed"]
+    assert packed["headers"]["content-type"] == "application/msgpack"
+    assert packed["body_encoding"] == "base64"
+    assert msgpack.unpackb(base64.b64decode(packed["body"])) == by_id["plain"]["body"]
+    assert "body_encoding" not in by_id["plain"]
+
+
+def test_batch_with_a_transient_failure_is_not_replayed(client, monkeypatch):
+    from app.core import idempotency
+    from app.core.idempotency import InProcessStore
+
+    monkeypatch.setattr(idempotency, "_local_store", InProcessStore())
+    register(client)
+    headers = {**auth_headers(login_and_token(client)), "Idempotency-Key": "batch-1"}
+    batch = {"requests": [{"path": "/v1/watchlists/"}]}
+
+    counts = {"rl:watchlists:list:testclient": 60}  # limit already used up
+    monkeypatch.setattr(rate_limit, "get_redis", lambda: CountingRedis(counts))
+    first = client.post("/v1/batch", headers=headers, json=batch)
+    assert first.status_code == 200 and first.json()["responses"][0]["status"] == 429
+
+    counts.clear()  # a new window
+    retry = client.post("/v1/batch", headers=headers, json=batch)
+    assert "idempotent-replayed" not in retry.headers
+    assert retry.json()["responses"][0]["status"] == 200
+
+    # an all-success batch is stored as before
+    again = client.post("/v1/batch", headers=headers, json=batch)
+    assert again.headers["idempotent-replayed"] == "true"
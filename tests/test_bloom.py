@@ -0,0 +1,11 @@
+from app.core.bloom import BloomFilter
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bf = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bf.add(f"jti-{i}")
+
+    assert all(f"jti-{i}" in bf for i in range(1000))
+    false_positives = sum(f"other-{i}" in bf for i in range(10_000))
+    assert false_positives < 300
@@ -0,0 +1,109 @@
+from app.core.cache import CacheSerializer, cache_key
+
+
+ROWS = [[i, f"Movie number {i}", "movie", "2026-01-01T00:00:00"] for i in range(50)]
+
+
+def test_serializer_round_trip_and_compression_threshold():
+    s = CacheSerializer(codec="msgpack", compression="zlib", min_compress_bytes=512)
+    small = s.dumps(ROWS[:1])
+    large = s.dumps(ROWS)
+
+    assert small[0] & 0x0F == 0  # below threshold: stored uncompressed
+    assert large[0] & 0x0F != 0
+    assert s.loads(small) == ROWS[:1]
+    assert s.loads(large) == ROWS
+
+
+def test_entries_decode_under_different_settings():
+    written = CacheSerializer(codec="json", compression="zlib", min_compress_bytes=0).dumps(ROWS)
+    reader = CacheSerializer(codec="msgpack", compression="none")
+    assert reader.loads(written) == ROWS
+
+
+def test_cache_key_is_short_and_does_not_embed_email():
+    key = cache_key(42, skip=0, limit=10, type=None, sort="created_at_desc")
+    assert key.startswith("wl:42:")
+    assert len(key) < 30
+    assert key == cache_key(42, sort="created_at_desc", type=None, limit=10, skip=0)
+
+
+def test_snapshot_mode_pages_match_database_pages(client, monkeypatch):
+    from app.api.v1 import watchlists
+    from app.core.config import settings
+    from tests.test_watchlists import auth_headers, login_and_token, register
+
+    register(client)
+    headers = auth_headers(login_and_token(client))
+    for i in range(7):
+        client.post("/v1/watchlists/items", json={"title": f"T{i}", "type": "movie" if i % 3 else "show"}, headers=headers)
+    ids = [i["id"] for i in client.get("/v1/watchlists/?limit=100", headers=headers).json()["watchlist"]]
+    client.post(f"/v1/watchlists/items/{ids[-1]}/move", json={"before": ids[3]}, headers=headers)
+
+    queries = [
+        "/v1/watchlists/",
+        "/v1/watchlists/?skip=2&limit=3",
+        "/v1/watchlists/?type=show&sort=created_at_asc",
+        "/v1/watchlists/?sort=position&fields=id,position",
+        "/v1/watchlists/?type=movie&sort=position&skip=1&limit=2",
+        f"/v1/watchlists/items?ids={ids[2]},999,{ids[0]}&fields=title",
+    ]
+    from_db = [client.get(q, headers=headers).json() for q in queries]
+
+    written = []
+
+    async def record_set(key, value, ttl):
+        written.append(key)
+
+    monkeypatch.setattr(settings, "CACHE_MODE", "snapshot")
+    monkeypatch.setattr(watchlists, "cache_set", record_set)
+    assert [client.get(q, headers=headers).json() for q in queries] == from_db
+    assert set(written) == {"wl:1:snap"}
+
+    # lists over the cap are served straight from the database
+    written.clear()
+    monkeypatch.setattr(settings, "CACHE_SNAPSHOT_MAX_ITEMS", 3)
+    assert [client.get(q, headers=headers).json() for q in queries] == from_db
+    assert written == []
+
+
+class DictRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+
+
+def test_snapshot_is_cleared_by_the_write_not_the_worker(client, monkeypatch):
+    from app.api.v1 import watchlists
+    from app.core import cache
+    from app.core.config import settings
+    from tests.test_watchlists import auth_headers, login_and_token, register
+
+    monkeypatch.setattr(settings, "CACHE_MODE", "snapshot")
+    monkeypatch.setattr(cache, "get_redis", lambda: DictRedis.instance)
+    DictRedis.instance = DictRedis()
+    queued = []
+
+    async def lagging_worker(name, **kwargs):
+        queued.append(name)
+
+    monkeypatch.setattr(watchlists, "enqueue", lagging_worker)
+
+    register(client)
+    headers = auth_headers(login_and_token(client))
+    client.post("/v1/watchlists/items", json={"title": "First", "type": "movie"}, headers=headers)
+    assert client.get("/v1/watchlists/", headers=headers).json()["total"] == 1
+    assert "wl:1:snap" in DictRedis.instance.data
+
+    client.post("/v1/watchlists/items", json={"title": "Second", "type": "movie"}, headers=headers)
+    titles = [i["title"] for i in client.get("/v1/watchlists/", headers=headers).json()["watchlist"]]
+    assert sorted(titles) == ["First", "Second"]
+    assert queued.count("cache.invalidate_user") == 2  # still queued as a backstop
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta, timezone
+
+from app.db.changes import compact, encode_token
+from app.db.deps import get_db
+from app.db.models import WatchlistItem
+from app.main import app
+
+from tests.test_watchlists import auth_headers, login_and_token, register
+
+
+def test_change_feed_reports_updates_and_deletes(client):
+    register(client)
+    headers = auth_headers(login_and_token(client))
+    ids = []
+    for title in ("A", "B", "C"):
+        r = client.post("/v1/watchlists/items", json={"title": title, "type": "movie"}, headers=headers)
+        ids.append(r.json()["item"]["id"])
+
+    first = client.get("/v1/watchlists/changes", headers=headers).json()
+    assert [i["id"] for i in first["changed"]] == ids
+    assert first["deleted"] == [] and first["has_more"] is False
+
+    client.patch(f"/v1/watchlists/items/{ids[0]}", json={"title": "A2"}, headers=headers)
+    assert client.delete(f"/v1/watchlists/items/{ids[1]}", headers=headers).status_code == 204
+
+    delta = client.get(f"/v1/watchlists/changes?since={first['next_token']}", headers=headers).json()
+    changed = {i["id"]: i for i in delta["changed"]}
+    assert changed[ids[0]]["title"] == "A2"
+    assert ids[1] in delta["deleted"] and ids[1] not in changed
+
+    # the tombstone is hidden everywhere else
+    listed = client.get("/v1/watchlists/", headers=headers).json()
+    assert sorted(i["id"] for i in listed["watchlist"]) == [ids[0], ids[2]]
+    assert listed["total"] == 2
+    assert client.delete(f"/v1/watchlists/items/{ids[1]}", headers=headers).status_code == 404
+
+
+def test_change_feed_pages_and_rejects_bad_tokens(client):
+    register(client)
+    headers = auth_headers(login_and_token(client))
+    for i in range(5):
+        client.post("/v1/watchlists/items", json={"title": f"T{i}", "type": "show"}, headers=headers)
+
+    seen, token = [], None
+    while True:
+        url = "/v1/watchlists/changes?limit=2" + (f"&since={token}" if token else "")
+        page = client.get(url, headers=headers).json()
+        seen += [i["id"] for i in page["changed"]]
+        token = page["next_token"]
+        if not page["has_more"]:
+            break
+    assert len(set(seen)) == 5
+
+    assert client.get("/v1/watchlists/changes?since=not-a-token", headers=headers).status_code == 400
+    stale = encode_token(datetime(2000, 1, 1), 0, issued_at=datetime(2000, 1, 1))
+    r = client.get(f"/v1/watchlists/changes?since={stale}", headers=headers)
+    assert r.status_code == 410
+    assert r.json()["error"]["code"] == "RESYNC_REQUIRED"
+
+
+def test_empty_and_idle_lists_keep_a_usable_token(client):
+    register(client)
+    headers = auth_headers(login_and_token(client))
+
+    # empty list: the position stays at the beginning, the token stays valid
+    token = client.get("/v1/watchlists/changes", headers=headers).json()["next_token"]
+    for _ in range(2):
+        r = client.get(f"/v1/watchlists/changes?since={token}", headers=headers)
+        assert r.status_code == 200 and r.json()["changed"] == []
+        token = r.json()["next_token"]
+
+    # idle list: last write long before the retention window, polled recently
+    old = datetime(2000, 1, 1)
+    idle = encode_token(old, 0, issued_at=datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=1))
+    r = client.get(f"/v1/watchlists/changes?since={idle}", headers=headers)
+    assert r.status_code == 200
+    r = client.get(f"/v1/watchlists/changes?since={r.json()['next_token']}", headers=headers)
+    assert r.status_code == 200
+
+    # a token from before the window is still refused
+    r = client.get(f"/v1/watchlists/changes?since={encode_token(old, 0, issued_at=old)}", headers=headers)
+    assert r.status_code == 410
+
+
+def test_compact_removes_only_old_tombstones(client):
+    register(client)
+    headers = auth_headers(login_and_token(client))
+    ids = [
+        client.post("/v1/watchlists/items", json={"title": t, "type": "movie"}, headers=headers).json()["item"]["id"]
+        for t in ("old", "new", "kept")
+    ]
+    client.delete(f"/v1/watchlists/items/{ids[0]}", headers=headers)
+    client.delete(f"/v1/watchlists/items/{ids[1]}", headers=headers)
+
+    gen = app.dependency_overrides[get_db]()
+    db = next(gen)
+    db.query(WatchlistItem).filter(WatchlistItem.id == ids[0]).update(
+        {"deleted_at": datetime(2000, 1, 1)}
+    )
+    db.commit()
+
+    assert compact(db, datetime(2000, 1, 1) + timedelta(days=1), batch=1) == 1
+    assert sorted(r.id for r in db.query(WatchlistItem.id)) == ids[1:]
+    gen.close()
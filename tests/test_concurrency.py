@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.core.concurrency import AIMDLimiter, ConcurrencyLimitMiddleware
+
+
+def _limiter(**overrides):
+    options = dict(
+        initial=2, min_limit=1, max_limit=10, latency_target=0.05,
+        backoff=0.5, queue_size=1, queue_timeout=0.05,
+    )
+    options.update(overrides)
+    return AIMDLimiter(**options)
+
+
+def test_limit_grows_when_fast_and_backs_off_when_slow():
+    limiter = _limiter(initial=4)
+
+    async def scenario():
+        for _ in range(40):
+            for _ in range(limiter.capacity):
+                await limiter.acquire()
+            for _ in range(limiter.capacity):
+                limiter.release(0.001)
+        grown = limiter.capacity
+
+        await limiter.acquire()
+        limiter.release(1.0)
+        return grown, limiter.capacity
+
+    grown, after_slow = asyncio.run(scenario())
+    assert grown > 4
+    assert after_slow <= grown // 2 + 1
+
+
+def test_excess_requests_are_shed_with_503_and_health_is_exempt():
+    api = FastAPI()
+
+    @api.get("/v1/watchlists/")
+    async def slow():
+        await asyncio.sleep(0.2)
+        return {"ok": True}
+
+    @api.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    app = ConcurrencyLimitMiddleware(api, _limiter(initial=1, min_limit=1, queue_size=1))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            pending = [asyncio.create_task(c.get("/v1/watchlists/")) for _ in range(4)]
+            await asyncio.sleep(0.02)
+            health = await c.get("/health")
+            return health, await asyncio.gather(*pending)
+
+    health, responses = asyncio.run(scenario())
+    assert health.status_code == 200
+    statuses = sorted(r.status_code for r in responses)
+    assert statuses[0] == 200 and statuses[-1] == 503
+    shed = [r for r in responses if r.status_code == 503]
+    assert all(r.headers["retry-after"] == "1" for r in shed)
+    assert shed[0].json()["error"]["code"] == "OVERLOADED"
+
+
+def test_cancelled_waiters_do_not_leak_slots():
+    limiter = _limiter(initial=1, min_limit=1, queue_size=2, queue_timeout=5)
+
+    async def scenario():
+        await limiter.acquire()
+
+        # cancelled while still queued
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert limiter.snapshot()["queued"] == 0
+
+        # cancelled right after the slot was handed over
+        granted = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.release(0.001)
+        granted.cancel()
+        await asyncio.gather(granted, return_exceptions=True)
+        assert limiter.in_flight == 0
+
+        await limiter.acquire()  # the slot is still usable
+        assert limiter.in_flight == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,33 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.db.counters import adjust_counts, find_drift, repair
+from app.db.migrations import upgrade
+from app.db.models import User, WatchlistItem
+
+
+def test_find_drift_and_repair(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'c.db'}")
+    upgrade(engine)
+    db = sessionmaker(bind=engine)()
+
+    user = User(email="c@test.com", password_hash="x")
+    db.add(user)
+    db.commit()
+    db.add_all([
+        WatchlistItem(user_id=user.id, title="A", media_type="movie"),
+        WatchlistItem(user_id=user.id, title="B", media_type="show"),
+    ])
+    adjust_counts(db, user.id, added="movie")
+    adjust_counts(db, user.id, added="show")
+    db.commit()
+    assert find_drift(db) == []
+
+    db.execute(text("UPDATE users SET item_count = 7, show_count = 0"))
+    db.commit()
+    drift = find_drift(db)
+    assert drift[0]["expected"] == {"item_count": 2, "movie_count": 1, "show_count": 1}
+
+    repair(db, drift)
+    assert find_drift(db) == []
+    db.close()
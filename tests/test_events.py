@@ -0,0 +1,82 @@
+import asyncio
+
+from app.core.events import InProcessBroker, event_stream
+
+
+async def _take(stream, n):
+    return [await stream.__anext__() for _ in range(n)]
+
+
+def test_stream_replays_after_last_event_id_then_goes_live():
+    async def scenario():
+        broker = InProcessBroker(history=10, queue_size=8)
+        for i in range(3):
+            await broker.publish(1, "item.added", {"id": i})
+
+        stream = event_stream(broker, 1, last_event_id=1, heartbeat=0.05)
+        frames = await _take(stream, 3)
+        assert frames[0].startswith("retry:")
+        assert frames[1].startswith("id: 2\n") and frames[2].startswith("id: 3\n")
+
+        await broker.publish(1, "item.deleted", {"id": 0})
+        await broker.publish(2, "item.added", {"id": 99})  # other user: not delivered
+        assert (await _take(stream, 1))[0].startswith("id: 4\nevent: item.deleted")
+        assert await _take(stream, 1) == [": ping\n\n"]
+
+        await stream.aclose()
+        assert broker._subs == {}
+
+    asyncio.run(scenario())
+
+
+def test_stream_asks_client_to_resync_when_history_is_gone_or_buffer_overflows():
+    async def scenario():
+        broker = InProcessBroker(history=2, queue_size=2)
+        for i in range(5):
+            await broker.publish(1, "item.added", {"id": i})
+
+        stream = event_stream(broker, 1, last_event_id=0, heartbeat=1)
+        assert (await _take(stream, 2))[1].startswith("event: resync")
+
+        for i in range(5):
+            await broker.publish(1, "item.added", {"id": i})
+        assert (await _take(stream, 1))[0].startswith("event: resync")
+        await stream.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_auto_backend_leaves_the_in_process_fallback_when_redis_returns(monkeypatch):
+    from app.core import events
+    from app.core.config import settings
+
+    class Redis:
+        up = False
+
+        async def ping(self):
+            if not self.up:
+                raise ConnectionError("down")
+            return True
+
+    redis = Redis()
+    monkeypatch.setattr(settings, "EVENTS_BACKEND", "auto")
+    monkeypatch.setattr(events, "get_redis", lambda: redis)
+    monkeypatch.setattr(events, "_broker", None)
+    monkeypatch.setattr(events.RedisBroker, "start", lambda self: asyncio.sleep(0))
+
+    async def scenario():
+        fallback = await events.get_broker()
+        assert isinstance(fallback, InProcessBroker)
+        stream = event_stream(fallback, 1, last_event_id=None, heartbeat=1)
+        await _take(stream, 1)
+
+        redis.up = True
+        assert await events.get_broker() is fallback  # not re-probed on every call
+
+        monkeypatch.setattr(events, "_probed_at", 0.0)
+        assert isinstance(await events.get_broker(), events.RedisBroker)
+        # the client connected to the fallback reconnects to the shared feed
+        assert (await _take(stream, 1))[0].startswith("event: resync")
+        await stream.aclose()
+
+    asyncio.run(scenario())
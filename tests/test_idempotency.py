@@ -0,0 +1,84 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.core import idempotency
+from app.core.idempotency import IdempotencyMiddleware, InProcessStore
+
+from tests.test_watchlists import auth_headers, login_and_token, register
+
+
+def test_retried_add_returns_the_first_response(client):
+    register(client)
+    headers = {**auth_headers(login_and_token(client)), "Idempotency-Key": "add-1"}
+
+    first = client.post("/v1/watchlists/items", json={"title": "Once", "type": "movie"}, headers=headers)
+    retry = client.post("/v1/watchlists/items", json={"title": "Once", "type": "movie"}, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.json()["item"]["id"] == first.json()["item"]["id"]
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+    listed = client.get("/v1/watchlists/", headers=auth_headers(headers["Authorization"].split()[1]))
+    assert listed.json()["total"] == 1
+
+    reused = client.post("/v1/watchlists/items", json={"title": "Other", "type": "movie"}, headers=headers)
+    assert reused.status_code == 422
+
+
+def test_concurrent_duplicates_wait_for_the_first(monkeypatch):
+    # Redis is unreachable in tests, so this exercises the in-process store
+    monkeypatch.setattr(idempotency, "_local_store", InProcessStore())
+    calls = 0
+
+    api = FastAPI()
+
+    @api.post("/v1/watchlists/items")
+    async def slow_write():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return {"call": calls}
+
+    app = IdempotencyMiddleware(api, path_prefixes=("/v1/watchlists",))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            headers = {"Idempotency-Key": "k", "Authorization": "Bearer x"}
+            return await asyncio.gather(*(c.post("/v1/watchlists/items", headers=headers) for _ in range(3)))
+
+    responses = asyncio.run(scenario())
+    assert calls == 1
+    assert [r.json() for r in responses] == [{"call": 1}] * 3
+    assert sum(r.headers.get("idempotent-replayed") == "true" for r in responses) == 2
+
+
+def test_only_deterministic_answers_are_stored(monkeypatch):
+    from fastapi.responses import JSONResponse
+
+    monkeypatch.setattr(idempotency, "_local_store", InProcessStore())
+    answers = {"k-auth": [401, 201], "k-busy": [429, 503, 201], "k-missing": [404, 201]}
+    calls = []
+
+    api = FastAPI()
+
+    @api.post("/v1/watchlists/items/{key}")
+    async def write(key: str):
+        calls.append(key)
+        return JSONResponse({"call": len(calls)}, status_code=answers[key].pop(0))
+
+    app = IdempotencyMiddleware(api, path_prefixes=("/v1/watchlists",))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            statuses = {}
+            for key, attempts in (("k-auth", 2), ("k-busy", 3), ("k-missing", 2)):
+                headers = {"Idempotency-Key": key, "Authorization": "Bearer x"}
+                statuses[key] = [(await c.post(f"/v1/watchlists/items/{key}", headers=headers)).status_code for _ in range(attempts)]
+            return statuses
+
+    statuses = asyncio.run(scenario())
+    assert statuses == {"k-auth": [401, 201], "k-busy": [429, 503, 201], "k-missing": [404, 404]}
+    assert calls.count("k-missing") == 1
@@ -0,0 +1,32 @@
+import asyncio
+
+from app.core import jobs
+
+
+def test_enqueue_runs_inline_when_redis_is_unreachable(monkeypatch):
+    calls = []
+
+    @jobs.job("test.record")
+    def record(value: int) -> None:
+        calls.append(value)
+
+    async def scenario():
+        jobs.reset_queue()
+        await jobs.enqueue("test.record", value=1)
+
+        # a Redis-backed queue that cannot reach Redis also falls back
+        monkeypatch.setattr(jobs, "_queue", jobs.redis_queue())
+        await jobs.enqueue("test.record", value=2)
+
+    asyncio.run(scenario())
+    jobs.reset_queue()
+    assert calls == [1, 2]
+
+
+def test_failing_inline_job_does_not_raise():
+    @jobs.job("test.boom")
+    async def boom() -> None:
+        raise RuntimeError("boom")
+
+    jobs.reset_queue()
+    asyncio.run(jobs.enqueue("test.boom"))
@@ -0,0 +1,31 @@
+from sqlalchemy import create_engine, inspect
+
+from app.db.migrations import MIGRATIONS, current_version, upgrade
+from app.db.session import Base
+from app.db import models  # noqa: F401
+
+
+def test_upgrade_creates_schema_and_is_idempotent(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'm.db'}")
+
+    applied = upgrade(engine)
+    assert applied == sorted(m.version for m in MIGRATIONS)
+    assert upgrade(engine) == []
+    assert current_version(engine) == max(m.version for m in MIGRATIONS)
+
+    # every column the models expect must exist after migrating
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        columns = {c["name"] for c in inspector.get_columns(table.name)}
+        assert {c.name for c in table.columns} <= columns
+
+
+def test_upgrade_adopts_unversioned_legacy_database(tmp_path):
+    # databases created by the old create_all() startup hook have the
+    # initial tables but no schema_migrations bookkeeping
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        MIGRATIONS[0].apply(conn)
+
+    upgrade(engine)
+    assert current_version(engine) == max(m.version for m in MIGRATIONS)
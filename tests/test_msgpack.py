@@ -0,0 +1,70 @@
+import msgpack
+
+from app.core.negotiation import prefers_msgpack
+
+from tests.test_watchlists import auth_headers, login_and_token, register
+
+MSGPACK = "application/msgpack"
+
+
+def test_accept_header_negotiation():
+    assert prefers_msgpack(MSGPACK)
+    assert prefers_msgpack("application/msgpack, */*")
+    assert prefers_msgpack("application/json;q=0.5, application/x-msgpack")
+    assert not prefers_msgpack("*/*")
+    assert not prefers_msgpack("application/json, application/msgpack;q=0.9")
+    assert not prefers_msgpack("application/msgpack;q=0")
+    assert not prefers_msgpack(None)
+
+
+def test_msgpack_bodies_and_responses(client):
+    register(client)
+    headers = auth_headers(login_and_token(client))
+    packed = {**headers, "Content-Type": MSGPACK, "Accept": MSGPACK}
+
+    r = client.post("/v1/watchlists/items", content=msgpack.packb({"title": "Alien", "type": "movie"}), headers=packed)
+    assert r.status_code == 201
+    assert r.headers["content-type"] == MSGPACK and "Accept" in r.headers["vary"]
+    item = msgpack.unpackb(r.content)["item"]
+    assert item["title"] == "Alien"
+
+    r = client.patch(f"/v1/watchlists/items/{item['id']}", content=msgpack.packb({"title": "Aliens"}), headers=packed)
+    assert r.status_code == 200
+
+    # the same cached page serves both formats
+    as_msgpack = client.get("/v1/watchlists/", headers={**headers, "Accept": MSGPACK})
+    as_json = client.get("/v1/watchlists/", headers=headers)
+    assert as_json.headers["content-type"] == "application/json"
+    assert msgpack.unpackb(as_msgpack.content) == as_json.json()
+    assert as_json.json()["watchlist"][0]["title"] == "Aliens"
+
+    r = client.get(f"/v1/watchlists/items?ids={item['id']},999", headers={**headers, "Accept": MSGPACK})
+    assert msgpack.unpackb(r.content)["missing"] == [999]
+
+    bad = client.post("/v1/watchlists/items", content=b"\xc1", headers=packed)
+    assert bad.status_code == 400
+    invalid = client.post("/v1/watchlists/items", content=msgpack.packb({"type": "movie"}), headers=packed)
+    assert invalid.status_code == 422
+
+    # no JSON equivalent: rejected up front instead of failing in the 422 handler
+    binary = msgpack.packb({"title": b"\xff", "type": "movie"}, use_bin_type=True)
+    assert client.post("/v1/watchlists/items", content=binary, headers=packed).status_code == 400
+    ext = msgpack.packb({"title": msgpack.ExtType(1, b"x"), "type": "movie"})
+    assert client.post("/v1/watchlists/items", content=ext, headers=packed).status_code == 400
+
+
+def test_export_returns_the_whole_list_as_rows(client):
+    register(client)
+    headers = auth_headers(login_and_token(client))
+    for i in range(15):
+        client.post("/v1/watchlists/items", json={"title": f"T{i}", "type": "show" if i % 3 else "movie"}, headers=headers)
+
+    r = client.get("/v1/watchlists/export?fields=id,title&sort=created_at_asc", headers={**headers, "Accept": MSGPACK})
+    assert r.status_code == 200
+    export = msgpack.unpackb(r.content)
+    assert export["fields"] == ["id", "title"]
+    assert export["total"] == 15
+    assert [title for _, title in export["items"]] == [f"T{i}" for i in range(15)]
+
+    shows = client.get("/v1/watchlists/export?type=show", headers=headers).json()
+    assert len(shows["items"]) == shows["total"] == 10
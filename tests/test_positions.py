@@ -0,0 +1,76 @@
+import random
+
+from app.db.positions import key_between, spaced_keys
+
+from tests.test_watchlists import auth_headers, login_and_token, register
+
+
+def test_key_between_always_finds_a_key_in_between():
+    rng = random.Random(42)
+    keys = [key_between(None, None)]
+    for _ in range(500):
+        i = rng.randrange(len(keys) + 1)
+        low = keys[i - 1] if i > 0 else None
+        high = keys[i] if i < len(keys) else None
+        new = key_between(low, high)
+        assert (low is None or low < new) and (high is None or new < high)
+        keys.insert(i, new)
+    assert keys == sorted(keys)
+
+    # always inserting at the front grows keys slowly
+    key = None
+    for _ in range(50):
+        key = key_between(None, key)
+    assert len(key) <= 50
+
+
+def test_appending_keeps_keys_short():
+    keys = [key_between(None, None)]
+    for _ in range(10_000):
+        keys.append(key_between(keys[-1], None))
+    assert keys == sorted(set(keys))
+    assert max(map(len, keys[:1001])) <= 2
+    assert max(map(len, keys)) <= 5
+
+    # a long key left by earlier inserts is cut back to its integer part
+    assert key_between("V" + "x" * 20, None) == "Vy"
+
+    # a list appended to past "z...": the next level, never a longer key
+    assert key_between("zzzz", None) == "zzzz01"
+    assert key_between("yzz", None) == "z"
+
+
+def test_spaced_keys_are_short_sorted_and_unique():
+    keys = spaced_keys(1000)
+    assert keys == sorted(set(keys)) and len(keys) == 1000
+    assert max(map(len, keys)) == 2
+    assert key_between(keys[0], keys[1])
+
+
+def test_move_item_and_sort_by_position(client):
+    register(client)
+    headers = auth_headers(login_and_token(client))
+    ids = []
+    for title in ("A", "B", "C", "D"):
+        r = client.post("/v1/watchlists/items", json={"title": title, "type": "movie"}, headers=headers)
+        ids.append(r.json()["item"]["id"])
+
+    def order():
+        r = client.get("/v1/watchlists/?sort=position&fields=title", headers=headers)
+        return "".join(i["title"] for i in r.json()["watchlist"])
+
+    assert order() == "ABCD"
+
+    r = client.post(f"/v1/watchlists/items/{ids[3]}/move", json={"before": ids[0]}, headers=headers)
+    assert r.status_code == 200
+    assert order() == "DABC"
+
+    client.post(f"/v1/watchlists/items/{ids[0]}/move", json={"after": ids[2]}, headers=headers)
+    assert order() == "DBCA"
+
+    client.post(f"/v1/watchlists/items/{ids[2]}/move", json={"after": ids[3], "before": ids[1]}, headers=headers)
+    assert order() == "DCBA"
+
+    assert client.post(f"/v1/watchlists/items/{ids[0]}/move", json={}, headers=headers).status_code == 400
+    assert client.post(f"/v1/watchlists/items/{ids[0]}/move", json={"after": ids[0]}, headers=headers).status_code == 400
+    assert client.post(f"/v1/watchlists/items/{ids[0]}/move", json={"after": 999999}, headers=headers).status_code == 404
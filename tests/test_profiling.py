@@ -0,0 +1,49 @@
+from app.core import profiling
+from app.core.config import settings
+
+from tests.test_audit import make_admin
+from tests.test_watchlists import auth_headers, login_and_token, register
+
+
+def test_admin_can_profile_a_request_and_download_it(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path / "profiles"))
+
+    register(client, "boss@test.com")
+    make_admin("boss@test.com")
+    headers = auth_headers(login_and_token(client, "boss@test.com"))
+
+    r = client.get("/v1/watchlists/", headers={**headers, "X-Profile": "1", "X-Request-ID": "slow-list-1"})
+    assert r.status_code == 200
+    assert (tmp_path / "profiles" / "slow-list-1.folded").exists()
+
+    # no header, or not an admin: nothing recorded
+    client.get("/v1/watchlists/", headers={**headers, "X-Request-ID": "plain"})
+    client.get("/v1/watchlists/", headers={"X-Profile": "1", "X-Request-ID": "anon", "Authorization": "Bearer x"})
+    register(client, "user@test.com")
+    user = auth_headers(login_and_token(client, "user@test.com"))
+    client.get("/v1/watchlists/", headers={**user, "X-Profile": "1", "X-Request-ID": "not-admin"})
+    assert [p.name for p in (tmp_path / "profiles").iterdir()] == ["slow-list-1.folded"]
+
+    listed = client.get("/v1/admin/profiles", headers=headers).json()["profiles"]
+    assert [p["request_id"] for p in listed] == ["slow-list-1"]
+
+    r = client.get("/v1/admin/profiles/slow-list-1", headers=headers)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    assert client.get("/v1/admin/profiles/missing", headers=headers).status_code == 404
+
+
+def test_sampler_records_folded_stacks():
+    import threading
+    import time
+
+    sampler = profiling.StackSampler(0.001, threading.get_ident())
+    sampler.start()
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+    sampler.stop()
+
+    lines = sampler.folded().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("test_sampler_records_folded_stacks" in line for line in lines)
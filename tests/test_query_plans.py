@@ -0,0 +1,18 @@
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import make_engine
+from benchmarks.datagen import generate
+from benchmarks.query_plans import HOT_QUERIES, check, context, problems
+
+
+def test_hot_queries_use_indexes_without_sorting(tmp_path):
+    url = f"sqlite:///{tmp_path / 'plans.db'}"
+    generate(url, users=500, items=10000)
+
+    engine = make_engine(url)
+    with sessionmaker(bind=engine)() as db:
+        plans = check(engine, db, context(db))
+    engine.dispose()
+
+    found = {q.name: problems(q, plans[q.name]) for q in HOT_QUERIES}
+    assert {name: steps for name, steps in found.items() if steps} == {}
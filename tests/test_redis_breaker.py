@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError, ResponseError
+
+from app.core.redis_client import CircuitBreaker, CircuitOpenError, GuardedRedis
+
+
+class FlakyRedis:
+    def __init__(self):
+        self.calls = 0
+        self.error = RedisConnectionError("refused")
+
+    async def incr(self, key):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return 1
+
+
+def test_breaker_opens_fails_fast_and_recovers_through_half_open():
+    async def scenario():
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05)
+        raw = FlakyRedis()
+        redis = GuardedRedis(raw, breaker)
+
+        for _ in range(3):
+            with pytest.raises(RedisConnectionError):
+                await redis.incr("k")
+        assert breaker.state == "open"
+
+        with pytest.raises(CircuitOpenError):
+            await redis.incr("k")
+        assert raw.calls == 3  # short-circuited, no network call
+
+        await asyncio.sleep(0.06)
+        assert breaker.state == "half_open"
+        raw.error = None
+        assert await redis.incr("k") == 1
+        assert breaker.state == "closed"
+        assert breaker.snapshot()["opened_total"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_failed_trial_reopens_and_redis_errors_do_not_count():
+    async def scenario():
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        raw = FlakyRedis()
+        redis = GuardedRedis(raw, breaker)
+
+        raw.error = ResponseError("WRONGTYPE")
+        for _ in range(5):
+            with pytest.raises(ResponseError):
+                await redis.incr("k")
+        assert breaker.state == "closed"
+
+        raw.error = RedisConnectionError("refused")
+        for _ in range(2):
+            with pytest.raises(RedisConnectionError):
+                await redis.incr("k")
+        await asyncio.sleep(0.06)
+        with pytest.raises(RedisConnectionError):
+            await redis.incr("k")  # the half-open trial fails
+        assert breaker.state == "open"
+
+    asyncio.run(scenario())
+
+
+def test_breaker_state_in_health_and_metrics(client):
+    for _ in range(10):
+        client.get("/v1/health/detailed")
+    body = client.get("/v1/health/detailed").json()
+    assert body["dependencies"]["redis"] == "down"
+    assert body["redis_breaker"]["state"] in ("open", "half_open")
+
+    text = client.get("/v1/metrics").text
+    assert 'redis_breaker_state{state="open"}' in text
+    assert "concurrency_limit " in text
@@ -0,0 +1,95 @@
+import shutil
+
+from sqlalchemy.orm import sessionmaker
+
+from app.db.migrations import upgrade
+from app.db.models import User
+from app.db.session import ReplicaPool, RoutingSession, make_engine
+
+
+def _emails(db):
+    return sorted(e for (e,) in db.query(User.email))
+
+
+def test_reads_go_to_replicas_and_writes_to_primary(tmp_path):
+    primary_path = tmp_path / "primary.db"
+    primary = make_engine(f"sqlite:///{primary_path}")
+    upgrade(primary)
+
+    Session = sessionmaker(class_=RoutingSession, bind=primary)
+    with Session() as db:
+        db.add(User(email="old@test.com", password_hash="x"))
+        db.commit()
+
+    # "replicate" by copying the file, then write something the replicas lack
+    shutil.copy(primary_path, tmp_path / "replica.db")
+    with Session() as db:
+        db.add(User(email="new@test.com", password_hash="x"))
+        db.commit()
+
+    broken = make_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    replica = make_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    pool = ReplicaPool([broken, replica], eject_seconds=60)
+    Session = sessionmaker(class_=RoutingSession, bind=primary, replicas=pool)
+
+    # first read lands on the broken replica, which gets ejected
+    db = Session(info={"read_only": True})
+    try:
+        _emails(db)
+    except Exception:
+        pass
+    db.close()
+    assert pool.healthy() == [replica]
+
+    with Session(info={"read_only": True}) as db:
+        assert _emails(db) == ["old@test.com"]
+
+    with Session() as db:
+        assert _emails(db) == ["new@test.com", "old@test.com"]
+
+    # writes inside a read-only session go to the primary and pin it there
+    with Session(info={"read_only": True}) as db:
+        db.add(User(email="third@test.com", password_hash="x"))
+        db.commit()
+        assert "third@test.com" in _emails(db)
+
+
+class ExpiringRedis:
+    def __init__(self):
+        self.keys = {}
+
+    async def set(self, key, value, px=None):
+        self.keys[key] = value
+
+    async def exists(self, key):
+        return int(key in self.keys)
+
+
+def test_read_your_writes_pin_is_shared_and_keyed_by_user(monkeypatch):
+    import asyncio
+
+    from starlette.requests import Request
+
+    from app.core.security import create_access_token
+    from app.db import deps, session
+
+    def request(token):
+        return Request({
+            "type": "http", "method": "GET", "path": "/", "query_string": b"", "client": ("10.0.0.1", 1),
+            "headers": [(b"authorization", f"Bearer {token}".encode())],
+        })
+
+    # two tokens of the same user, e.g. from two devices
+    first = deps.client_key(request(create_access_token("Pin@Test.com")))
+    second = deps.client_key(request(create_access_token("pin@test.com")))
+    assert first == second == "user:pin@test.com"
+
+    redis = ExpiringRedis()
+    monkeypatch.setattr(session, "get_redis", lambda: redis)
+    monkeypatch.setattr(session, "_sticky_until", {})
+    asyncio.run(session.pin_to_primary(first))
+
+    # another worker has nothing in memory but still sees the pin
+    monkeypatch.setattr(session, "_sticky_until", {})
+    assert asyncio.run(session.is_pinned_to_primary(second))
+    assert not asyncio.run(session.is_pinned_to_primary("user:other@test.com"))
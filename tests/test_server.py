@@ -0,0 +1,15 @@
+import os
+
+from app.core import redis_client
+from app.server import reset_after_fork, worker_count
+
+
+def test_worker_count_defaults_to_cpu_count():
+    assert worker_count(3) == 3
+    assert worker_count(0) == (os.cpu_count() or 1)
+
+
+def test_reset_after_fork_drops_inherited_clients():
+    redis_client.get_redis()
+    reset_after_fork()
+    assert redis_client._redis_client is None
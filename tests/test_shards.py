@@ -0,0 +1,68 @@
+from collections import Counter
+
+from sqlalchemy import func, select
+
+from app.db.migrations import upgrade
+from app.db.models import User, WatchlistItem
+from app.db.session import make_engine
+from app.db.shards import MAIN_SHARD, HashRing, ShardMap, misplaced_users, move_user
+
+
+def _shard_map(tmp_path, names):
+    engines = {}
+    for name in [MAIN_SHARD, *names]:
+        engines[name] = make_engine(f"sqlite:///{tmp_path / f'{name}.db'}")
+        upgrade(engines[name])
+    main = engines.pop(MAIN_SHARD)
+    return ShardMap(main, engines, vnodes=64, id_block=3)
+
+
+def test_ring_spreads_users_and_adding_a_shard_moves_few():
+    before = HashRing(["a", "b", "c"], vnodes=64)
+    after = HashRing(["a", "b", "c", "d"], vnodes=64)
+
+    spread = Counter(before.lookup(uid) for uid in range(3000))
+    assert min(spread.values()) > 600
+
+    moved = sum(before.lookup(uid) != after.lookup(uid) for uid in range(3000))
+    assert moved < 3000 * 0.4
+
+
+def test_item_ids_are_unique_across_blocks(tmp_path):
+    shards = _shard_map(tmp_path, ["a"])
+    ids = [shards.ids.next_id() for _ in range(10)]
+    assert ids == sorted(set(ids))
+
+    shards.ids.reset()  # e.g. a forked worker: gets a fresh block, never a reused one
+    assert shards.ids.next_id() > ids[-1]
+
+
+def test_move_user_between_shards(tmp_path):
+    shards = _shard_map(tmp_path, ["a", "b"])
+
+    with shards.session(MAIN_SHARD) as db:
+        user = User(email="s@test.com", password_hash="x", shard="a")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+
+    with shards.session("a") as db:
+        db.add_all([
+            WatchlistItem(id=shards.ids.next_id(), user_id=user_id, title=f"T{i}", media_type="movie")
+            for i in range(5)
+        ])
+        db.commit()
+
+    assert move_user(shards, user_id, "b", grace=0, batch=2) == 5
+
+    with shards.session("a") as db:
+        assert db.scalar(select(func.count()).select_from(WatchlistItem)) == 0
+    with shards.session("b") as db:
+        assert sorted(db.scalars(select(WatchlistItem.title))) == [f"T{i}" for i in range(5)]
+    with shards.session(MAIN_SHARD) as db:
+        user = db.get(User, user_id)
+        assert (user.shard, user.shard_moving) == ("b", False)
+
+    target = shards.placement(user_id)
+    expected = [] if target == "b" else [(user_id, "b", target)]
+    assert misplaced_users(shards) == expected
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import logging
+
+import httpx
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.redis_client import CircuitBreaker, GuardedRedis
+from app.core.tracing import (
+    TraceExporter,
+    TracingMiddleware,
+    TracingTransport,
+    parse_traceparent,
+    traced_dependency,
+)
+
+
+class Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.traces = []
+
+    def emit(self, record):
+        self.traces.append({s.name: s for s in record.spans})
+
+
+@pytest.fixture()
+def traces():
+    handler = Collect()
+    log = logging.getLogger("app.trace")
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    yield handler.traces
+    log.removeHandler(handler)
+
+
+class FakeRedis:
+    async def incr(self, key):
+        return 1
+
+
+def make_app(tmp_path, slow_ms=0.0, sample_rate=0.0, http_handler=None):
+    engine = create_engine(f"sqlite:///{tmp_path / 't.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS t (x INTEGER)"))
+    Session = sessionmaker(bind=engine)
+    redis = GuardedRedis(FakeRedis(), CircuitBreaker(5, 10))
+
+    @traced_dependency
+    def get_session():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @traced_dependency
+    async def get_user():
+        await redis.incr("k")
+        return 7
+
+    router = APIRouter()
+
+    @router.post("/things/{thing_id}")
+    def add_thing(thing_id: int, db=Depends(get_session), user=Depends(get_user)):
+        db.execute(text("INSERT INTO t VALUES (:x)"), {"x": thing_id})
+        db.commit()
+        return {"id": thing_id}
+
+    @router.get("/boom")
+    def boom():
+        raise RuntimeError("boom")
+
+    @router.get("/outbound")
+    async def outbound():
+        async with httpx.AsyncClient(transport=TracingTransport(httpx.MockTransport(http_handler))) as client:
+            r = await client.get("https://example.test/status?x=1")
+        return {"status": r.status_code}
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    app.add_middleware(TracingMiddleware, sample_rate=sample_rate, slow_ms=slow_ms)
+    return app, get_session
+
+
+def test_spans_for_dependencies_sql_commit_and_redis(tmp_path, traces):
+    app, _ = make_app(tmp_path)
+    client = TestClient(app)
+    assert client.post("/api/things/3").status_code == 200
+
+    (spans,) = traces
+    root = spans["POST /api/things/{thing_id}"]
+    assert root.parent_id is None
+    assert root.attributes["http.response.status_code"] == 200
+    assert len({s.trace.trace_id for s in spans.values()}) == 1
+
+    for name in ("dependency get_session", "dependency get_user", "db INSERT", "db commit"):
+        assert spans[name].parent_id == root.span_id
+        assert spans[name].end_ns >= spans[name].start_ns
+    # Redis ran inside the dependency, so it nests under it
+    assert spans["redis incr"].parent_id == spans["dependency get_user"].span_id
+    assert spans["db INSERT"].attributes["db.statement"].startswith("INSERT INTO t")
+
+
+def test_dependency_overrides_still_apply(tmp_path, traces):
+    app, get_session = make_app(tmp_path)
+
+    class FakeSession:
+        def execute(self, *args):
+            pass
+
+        def commit(self):
+            pass
+
+    app.dependency_overrides[get_session] = lambda: FakeSession()
+    assert TestClient(app).post("/api/things/1").status_code == 200
+    assert "db INSERT" not in traces[0]
+
+
+def test_tail_sampling_keeps_errors_and_upstream_sampled_only(tmp_path, traces):
+    app, _ = make_app(tmp_path, slow_ms=10_000)
+    client = TestClient(app, raise_server_exceptions=False)
+    for i in range(3):
+        client.post(f"/api/things/{i}")
+    assert client.get("/api/boom").status_code == 500
+    parent = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+    client.post("/api/things/9", headers={"traceparent": parent})
+
+    assert [next(iter(t)) for t in traces] == ["GET /api/boom", "POST /api/things/{thing_id}"]
+    assert traces[0]["GET /api/boom"].error.startswith("RuntimeError")
+    continued = traces[1]["POST /api/things/{thing_id}"]
+    assert continued.trace.trace_id == "0af7651916cd43dd8448eb211c80319c"
+    assert continued.parent_id == "b7ad6b7169203331"
+
+
+def test_outbound_http_span_propagates_traceparent(tmp_path, traces):
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("traceparent"))
+        return httpx.Response(503)
+
+    app, _ = make_app(tmp_path, http_handler=handler)
+    assert TestClient(app).get("/api/outbound").json() == {"status": 503}
+
+    http = traces[0]["HTTP GET"]
+    assert http.attributes["url.full"] == "https://example.test/status"
+    assert http.attributes["http.response.status_code"] == 503 and http.error == "HTTP 503"
+    trace_id, parent_id, _ = parse_traceparent(seen[0])
+    assert (trace_id, parent_id) == (http.trace.trace_id, http.span_id)
+
+
+def test_exporter_writes_otlp_json_lines(tmp_path, traces):
+    app, _ = make_app(tmp_path)
+    exporter = TraceExporter(str(tmp_path / "traces" / "t.jsonl"), max_bytes=1_000_000, backups=1)
+    exporter.start()
+    TestClient(app).post("/api/things/5")
+    exporter.stop()
+
+    (path,) = (tmp_path / "traces").iterdir()
+    (line,) = path.read_text().splitlines()
+    resource = json.loads(line)["resourceSpans"][0]
+    assert {"key": "service.name", "value": {"stringValue": "watchlist-api"}} in resource["resource"]["attributes"]
+    spans = resource["scopeSpans"][0]["spans"]
+    root = next(s for s in spans if "parentSpanId" not in s)
+    assert root["kind"] == 2 and len(root["traceId"]) == 32 and len(root["spanId"]) == 16
+    assert {"key": "http.response.status_code", "value": {"intValue": "200"}} in root["attributes"]
+    assert all(s["traceId"] == root["traceId"] for s in spans)
+    assert int(root["endTimeUnixNano"]) >= int(root["startTimeUnixNano"])
+
+
+def test_parse_traceparent_rejects_malformed():
+    assert parse_traceparent("00-" + "0" * 32 + "-b7ad6b7169203331-01") is None
+    assert parse_traceparent("00-abc-def-01") is None
+    assert parse_traceparent(None) is None
+
+
+def test_untraced_calls_are_no_ops():
+    redis = GuardedRedis(FakeRedis(), CircuitBreaker(5, 10))
+    assert asyncio.run(redis.incr("k")) == 1
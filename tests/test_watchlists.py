@@ -58,3 +58,49 @@ def test_add_list_update_delete_watchlist_flow(client):
     r = client.get("/v1/watchlists/?skip=0&limit=50", headers=headers)
     assert r.status_code == 200
     assert all(i["id"] != item_id for i in r.json()["watchlist"])
+
+
+def test_list_includes_denormalized_totals(client):
+    register(client)
+    headers = auth_headers(login_and_token(client))
+
+    ids = []
+    for title, kind in [("A", "movie"), ("B", "movie"), ("C", "show")]:
+        r = client.post("/v1/watchlists/items", json={"title": title, "type": kind}, headers=headers)
+        ids.append(r.json()["item"]["id"])
+
+    client.patch(f"/v1/watchlists/items/{ids[0]}", json={"type": "show"}, headers=headers)
+    client.delete(f"/v1/watchlists/items/{ids[2]}", headers=headers)
+
+    data = client.get("/v1/watchlists/?limit=1", headers=headers).json()
+    assert data["total"] == 2
+    assert data["totals"] == {"all": 2, "movie": 1, "show": 1}
+
+    data = client.get("/v1/watchlists/?type=movie", headers=headers).json()
+    assert data["total"] == 1
+
+
+def test_sparse_fields_and_multi_get(client):
+    register(client)
+    headers = auth_headers(login_and_token(client))
+
+    ids = [
+        client.post("/v1/watchlists/items", json={"title": t, "type": "movie"}, headers=headers).json()["item"]["id"]
+        for t in ("One", "Two", "Three")
+    ]
+
+    r = client.get("/v1/watchlists/?fields=id,title", headers=headers)
+    assert r.status_code == 200
+    assert all(set(i) == {"id", "title"} for i in r.json()["watchlist"])
+
+    assert client.get("/v1/watchlists/?fields=id,password", headers=headers).status_code == 400
+
+    r = client.get(f"/v1/watchlists/items?ids={ids[2]},{ids[0]},999999&fields=title", headers=headers)
+    assert r.status_code == 200
+    assert r.json() == {"items": [{"title": "Three"}, {"title": "One"}], "missing": [999999]}
+
+    # other users' ids are reported missing
+    register(client, email="other@test.com")
+    other = auth_headers(login_and_token(client, email="other@test.com"))
+    r = client.get(f"/v1/watchlists/items?ids={ids[0]}", headers=other)
+    assert r.json()["items"] == []